@@ -1,4 +1,6 @@
+import ctypes
 import json
+import os
 import subprocess
 
 UNLIMITED = -1
@@ -23,6 +25,80 @@ ERROR_DUP2_FAILED = -8
 ERROR_SETUID_FAILED = -9
 ERROR_EXECVE_FAILED = -10
 ERROR_SPJ_ERROR = -11
+ERROR_CGROUP_FAILED = -12
+
+JUDGER_PATH = "/usr/lib/judger/libjudger.so"
+JUDGER_CORE_PATH = os.getenv("JUDGER_CORE_PATH", "/usr/lib/judger/libjudger_core.so")
+
+# must match ARGS_MAX_NUMBER and ENV_MAX_NUMBER in runner.h
+ARGS_MAX_NUMBER = 256
+ENV_MAX_NUMBER = 256
+
+# defaults main.c applies to options left out of the command line
+_DEFAULTS = {"max_stack": 16 * 1024 * 1024, "uid": 65534, "gid": 65534, "memory_limit_check_only": 0,
+             "cpu_time_watchdog": 0}
+
+
+class _Config(ctypes.Structure):
+    # mirrors struct config in runner.h
+    _fields_ = [("max_cpu_time", ctypes.c_int),
+                ("max_real_time", ctypes.c_int),
+                ("max_memory", ctypes.c_long),
+                ("max_stack", ctypes.c_long),
+                ("max_process_number", ctypes.c_int),
+                ("max_output_size", ctypes.c_long),
+                ("memory_limit_check_only", ctypes.c_int),
+                ("exe_path", ctypes.c_char_p),
+                ("input_path", ctypes.c_char_p),
+                ("output_path", ctypes.c_char_p),
+                ("error_path", ctypes.c_char_p),
+                ("args", ctypes.c_char_p * ARGS_MAX_NUMBER),
+                ("env", ctypes.c_char_p * ENV_MAX_NUMBER),
+                ("log_path", ctypes.c_char_p),
+                ("seccomp_rule_name", ctypes.c_char_p),
+                ("uid", ctypes.c_uint),
+                ("gid", ctypes.c_uint),
+                ("cpu_time_watchdog", ctypes.c_int),
+                ("cgroup_path", ctypes.c_char_p)]
+
+
+class _Result(ctypes.Structure):
+    # mirrors struct result in runner.h
+    _fields_ = [("cpu_time", ctypes.c_int),
+                ("real_time", ctypes.c_int),
+                ("memory", ctypes.c_long),
+                ("signal", ctypes.c_int),
+                ("exit_code", ctypes.c_int),
+                ("error", ctypes.c_int),
+                ("result", ctypes.c_int)]
+
+
+def _load_core():
+    if os.getenv("JUDGER_NATIVE", "1") == "0":
+        return None
+    try:
+        core = ctypes.CDLL(JUDGER_CORE_PATH)
+    except OSError:
+        return None
+    core.run.argtypes = [ctypes.POINTER(_Config), ctypes.POINTER(_Result)]
+    core.run.restype = None
+    core.batch_open.argtypes = [ctypes.POINTER(_Config), ctypes.POINTER(_Result)]
+    core.batch_open.restype = ctypes.c_void_p
+    core.batch_run.argtypes = [ctypes.c_void_p, ctypes.POINTER(_Config), ctypes.POINTER(_Result)]
+    core.batch_run.restype = None
+    core.batch_close.argtypes = [ctypes.c_void_p]
+    core.batch_close.restype = None
+    return core
+
+
+_core = _load_core()
+
+_str_list_vars = ["args", "env"]
+_int_vars = ["max_cpu_time", "max_real_time",
+             "max_memory", "max_stack", "max_output_size",
+             "max_process_number", "uid", "gid", "memory_limit_check_only", "cpu_time_watchdog"]
+_str_vars = ["exe_path", "input_path", "output_path", "error_path", "log_path"]
+_path_vars = ["input_path", "output_path", "error_path"]
 
 
 def run(max_cpu_time,
@@ -41,44 +117,195 @@ def run(max_cpu_time,
         seccomp_rule_name,
         uid,
         gid,
-        memory_limit_check_only=0):
-    str_list_vars = ["args", "env"]
-    int_vars = ["max_cpu_time", "max_real_time",
-                "max_memory", "max_stack", "max_output_size",
-                "max_process_number", "uid", "gid", "memory_limit_check_only"]
-    str_vars = ["exe_path", "input_path", "output_path", "error_path", "log_path"]
+        memory_limit_check_only=0,
+        cpu_time_watchdog=0,
+        cgroup=None):
+    config = dict(vars())
+    _check_config(config)
+    if _core is not None:
+        return _run_native(config)
+    return _run_subprocess(config)
+
+
+def run_batch(cases,
+              max_cpu_time,
+              max_real_time,
+              max_memory,
+              max_stack,
+              max_output_size,
+              max_process_number,
+              exe_path,
+              args,
+              env,
+              log_path,
+              seccomp_rule_name,
+              uid,
+              gid,
+              memory_limit_check_only=0,
+              cpu_time_watchdog=0,
+              stop_on_failure=False,
+              cgroup=None):
+    """
+    runs (input_path, output_path, error_path) cases one after another in one runner and
+    yields a result per case; the next case only starts when the next result is asked for,
+    so closing the generator stops the batch
+    """
+    cases = list(cases)
+    config = dict(vars(), input_path="", output_path="", error_path="")
+    _check_config(config)
+    for case in cases:
+        if len(case) != 3 or not all(isinstance(path, str) and "\t" not in path and "\n" not in path
+                                     for path in case):
+            raise ValueError("a case must be (input_path, output_path, error_path) without tabs or newlines")
+    if _core is not None:
+        return _batch_native(config, cases, stop_on_failure)
+    return _batch_subprocess(config, cases, stop_on_failure)
+
+
+def _failed(result):
+    return result["error"] != 0 or result["result"] != RESULT_SUCCESS
 
-    proc_args = ["/usr/lib/judger/libjudger.so"]
 
-    for var in str_list_vars:
-        value = vars()[var]
+def _check_config(config):
+    for var in _str_list_vars:
+        value = config[var]
         if not isinstance(value, list):
             raise ValueError("{} must be a list".format(var))
         for item in value:
             if not isinstance(item, str):
                 raise ValueError("{} item must be a string".format(var))
-            proc_args.append("--{}={}".format(var, item))
 
-    for var in int_vars:
-        value = vars()[var]
-        if not isinstance(value, int):
+    for var in _int_vars:
+        if not isinstance(config[var], int):
             raise ValueError("{} must be a int".format(var))
-        if value != UNLIMITED:
-            proc_args.append("--{}={}".format(var, value))
 
-    for var in str_vars:
-        value = vars()[var]
-        if not isinstance(value, str):
+    for var in _str_vars:
+        if not isinstance(config[var], str):
             raise ValueError("{} must be a string".format(var))
-        proc_args.append("--{}={}".format(var, value))
 
+    seccomp_rule_name = config["seccomp_rule_name"]
     if not isinstance(seccomp_rule_name, str) and seccomp_rule_name is not None:
         raise ValueError("seccomp_rule_name must be a string or None")
-    if seccomp_rule_name:
-        proc_args.append("--seccomp_rule={}".format(seccomp_rule_name))
 
-    proc = subprocess.Popen(proc_args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if not isinstance(config["cgroup"], str) and config["cgroup"] is not None:
+        raise ValueError("cgroup must be a string or None")
+
+    if len(config["args"]) + 2 > ARGS_MAX_NUMBER or len(config["env"]) + 1 > ENV_MAX_NUMBER:
+        raise ValueError("too many args or env")
+
+
+def _native_config(config):
+    c_config = _Config()
+    for var in _int_vars:
+        value = config[var]
+        if value == UNLIMITED:
+            value = _DEFAULTS.get(var, UNLIMITED)
+        setattr(c_config, var, value)
+    c_config.memory_limit_check_only = 1 if c_config.memory_limit_check_only else 0
+    c_config.cpu_time_watchdog = 1 if c_config.cpu_time_watchdog else 0
+    for var in _str_vars:
+        setattr(c_config, var, config[var].encode("utf-8"))
+    # args[0] is the exe itself, both lists are NULL terminated
+    c_config.args[0] = c_config.exe_path
+    for i, item in enumerate(config["args"]):
+        c_config.args[i + 1] = item.encode("utf-8")
+    for i, item in enumerate(config["env"]):
+        c_config.env[i] = item.encode("utf-8")
+    if config["seccomp_rule_name"]:
+        c_config.seccomp_rule_name = config["seccomp_rule_name"].encode("utf-8")
+    if config["cgroup"]:
+        c_config.cgroup_path = config["cgroup"].encode("utf-8")
+    return c_config
+
+
+def _result_dict(c_result):
+    return {name: getattr(c_result, name) for name, _ in _Result._fields_}
+
+
+def _run_native(config):
+    c_config = _native_config(config)
+    c_result = _Result()
+    _core.run(ctypes.byref(c_config), ctypes.byref(c_result))
+    return _result_dict(c_result)
+
+
+def _batch_native(config, cases, stop_on_failure):
+    c_config = _native_config(config)
+    c_result = _Result()
+    log_fp = _core.batch_open(ctypes.byref(c_config), ctypes.byref(c_result))
+    try:
+        if c_result.error != 0:
+            yield _result_dict(c_result)
+            return
+        for input_path, output_path, error_path in cases:
+            c_config.input_path = input_path.encode("utf-8")
+            c_config.output_path = output_path.encode("utf-8")
+            c_config.error_path = error_path.encode("utf-8")
+            _core.batch_run(log_fp, ctypes.byref(c_config), ctypes.byref(c_result))
+            result = _result_dict(c_result)
+            yield result
+            if stop_on_failure and _failed(result):
+                return
+    finally:
+        _core.batch_close(log_fp)
+
+
+def _subprocess_args(config, paths=True):
+    proc_args = [JUDGER_PATH]
+
+    for var in _str_list_vars:
+        for item in config[var]:
+            proc_args.append("--{}={}".format(var, item))
+
+    for var in _int_vars:
+        value = config[var]
+        if value != UNLIMITED:
+            proc_args.append("--{}={}".format(var, value))
+
+    for var in _str_vars:
+        if paths or var not in _path_vars:
+            proc_args.append("--{}={}".format(var, config[var]))
+
+    if config["seccomp_rule_name"]:
+        proc_args.append("--seccomp_rule={}".format(config["seccomp_rule_name"]))
+    if config["cgroup"]:
+        proc_args.append("--cgroup={}".format(config["cgroup"]))
+    return proc_args
+
+
+def _run_subprocess(config):
+    proc = subprocess.Popen(_subprocess_args(config), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     out, err = proc.communicate()
     if err:
         raise ValueError("Error occurred while calling judger: {}".format(err))
     return json.loads(out.decode("utf-8"))
+
+
+def _batch_subprocess(config, cases, stop_on_failure):
+    # cases go to the runner's stdin one line at a time, each answered by a json line
+    proc_args = _subprocess_args(config, paths=False) + ["--batch"]
+    if stop_on_failure:
+        proc_args.append("--stop_on_failure")
+    proc = subprocess.Popen(proc_args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        for case in cases:
+            try:
+                proc.stdin.write(("\t".join(case) + "\n").encode("utf-8"))
+                proc.stdin.flush()
+            except BrokenPipeError:
+                # the runner refused the config and already answered
+                pass
+            line = proc.stdout.readline()
+            if not line:
+                return
+            result = json.loads(line.decode("utf-8"))
+            yield result
+            if stop_on_failure and _failed(result):
+                return
+    finally:
+        try:
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        proc.stdout.close()
+        proc.wait()
@@ -0,0 +1,64 @@
+# coding=utf-8
+# per-call overhead of the in-process runner vs. the libjudger.so subprocess, run as root:
+#   python3 benchmark.py --calls 500
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import _judger
+
+
+def bench(run, calls, workdir):
+    config = dict(max_cpu_time=1000,
+                  max_real_time=3000,
+                  max_memory=128 * 1024 * 1024,
+                  max_stack=32 * 1024 * 1024,
+                  max_output_size=1024 * 1024,
+                  max_process_number=_judger.UNLIMITED,
+                  exe_path="/bin/true",
+                  input_path="/dev/null",
+                  output_path=os.path.join(workdir, "out"),
+                  error_path=os.path.join(workdir, "out"),
+                  args=[],
+                  env=[],
+                  log_path=os.path.join(workdir, "judger.log"),
+                  seccomp_rule_name=None,
+                  uid=0,
+                  gid=0,
+                  memory_limit_check_only=0,
+                  cpu_time_watchdog=0,
+                  cgroup=None)
+    cost = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        result = run(config)
+        cost.append(time.perf_counter() - start)
+        assert result["result"] == _judger.RESULT_SUCCESS, result
+    return cost
+
+
+def report(name, cost):
+    cost = sorted(cost)
+    print("{:<12} mean {:8.1f}us  p50 {:8.1f}us  p99 {:8.1f}us".format(
+        name,
+        statistics.mean(cost) * 1e6,
+        cost[len(cost) // 2] * 1e6,
+        cost[int(len(cost) * 0.99)] * 1e6))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    options = parser.parse_args()
+    with tempfile.TemporaryDirectory() as workdir:
+        report("subprocess", bench(_judger._run_subprocess, options.calls, workdir))
+        if _judger._core is None:
+            print("in-process runner not available: {}".format(_judger.JUDGER_CORE_PATH))
+            return
+        report("in-process", bench(_judger._run_native, options.calls, workdir))
+
+
+if __name__ == "__main__":
+    main()
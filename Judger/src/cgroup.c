@@ -0,0 +1,155 @@
+#define _GNU_SOURCE
+#include <errno.h>
+#include <fcntl.h>
+#include <limits.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+#include <unistd.h>
+#include <sys/stat.h>
+#include <sys/syscall.h>
+
+#include "runner.h"
+#include "cgroup.h"
+
+// processes killed through cgroup.kill leave the group asynchronously, rmdir is retried this often
+#define REMOVE_RETRIES 100
+#define REMOVE_INTERVAL_NS 1000000
+
+
+static int write_file(const char *dir, const char *name, const char *value) {
+    // open and write only: cgroup_enter runs between fork and execve
+    char path[PATH_MAX];
+    if (snprintf(path, sizeof(path), "%s/%s", dir, name) >= (int) sizeof(path)) {
+        return -1;
+    }
+    int fd = open(path, O_WRONLY | O_CLOEXEC);
+    if (fd < 0) {
+        return -1;
+    }
+    ssize_t length = (ssize_t) strlen(value);
+    ssize_t written = write(fd, value, (size_t) length);
+    close(fd);
+    return written == length ? 0 : -1;
+}
+
+
+static int read_file(const char *dir, const char *name, char *buffer, size_t size) {
+    char path[PATH_MAX];
+    if (snprintf(path, sizeof(path), "%s/%s", dir, name) >= (int) sizeof(path)) {
+        return -1;
+    }
+    int fd = open(path, O_RDONLY | O_CLOEXEC);
+    if (fd < 0) {
+        return -1;
+    }
+    ssize_t length = read(fd, buffer, size - 1);
+    close(fd);
+    if (length < 0) {
+        return -1;
+    }
+    buffer[length] = '\0';
+    return 0;
+}
+
+
+static long keyed_value(const char *text, const char *key) {
+    // the value of a "key value" line of a flat keyed file such as cpu.stat, -1 if it has none
+    size_t length = strlen(key);
+    for (const char *line = text; line != NULL && *line != '\0'; line = strchr(line, '\n')) {
+        if (*line == '\n') {
+            line++;
+        }
+        if (strncmp(line, key, length) == 0 && line[length] == ' ') {
+            return atol(line + length + 1);
+        }
+    }
+    return -1;
+}
+
+
+long cgroup_memory_max(struct config *_config) {
+    // memory.max also charges the page cache the run causes, and the stdout and stderr files it writes
+    // to a tmpfs can not be reclaimed; RLIMIT_FSIZE bounds each of them, so that much comes on top of
+    // the limit. the verdict is decided on the usage without the cache (cgroup_read_usage).
+    // -1 if the group does not enforce the limit, a run that may write without bound keeps RLIMIT_AS
+    if (_config->max_memory == UNLIMITED || _config->memory_limit_check_only != 0 ||
+        _config->max_output_size == UNLIMITED) {
+        return -1;
+    }
+    return _config->max_memory + 2 * _config->max_output_size;
+}
+
+
+int cgroup_create(struct config *_config, char *path, size_t size) {
+    // a new group per run under the slot's group, so its counters start at zero;
+    // named after the calling thread, two runs of one thread never overlap
+    if (snprintf(path, size, "%s/run-%ld", _config->cgroup_path, (long) syscall(SYS_gettid)) >= (int) size) {
+        return -1;
+    }
+    if (mkdir(path, 0755) != 0) {
+        if (errno != EEXIST) {
+            return -1;
+        }
+        // left behind by a runner that died
+        cgroup_remove(path);
+        if (mkdir(path, 0755) != 0) {
+            return -1;
+        }
+    }
+    long memory_max = cgroup_memory_max(_config);
+    if (memory_max >= 0) {
+        char limit[32];
+        snprintf(limit, sizeof(limit), "%ld", memory_max);
+        if (write_file(path, "memory.max", limit) != 0) {
+            cgroup_remove(path);
+            return -1;
+        }
+        // a page swapped out would not count against memory.max, hosts without swap have no such file
+        write_file(path, "memory.swap.max", "0");
+    }
+    return 0;
+}
+
+
+int cgroup_enter(const char *path) {
+    // "0" is the writing process, the child moves itself before execve
+    return write_file(path, "cgroup.procs", "0");
+}
+
+
+void cgroup_read_usage(const char *path, struct cgroup_usage *usage) {
+    char buffer[8192];
+    usage->cpu_time = usage->memory = -1;
+    usage->oom_killed = 0;
+    if (read_file(path, "cpu.stat", buffer, sizeof(buffer)) == 0) {
+        long usec = keyed_value(buffer, "usage_usec");
+        usage->cpu_time = usec < 0 ? -1 : usec / 1000;
+    }
+    if (read_file(path, "memory.peak", buffer, sizeof(buffer)) == 0) {
+        usage->memory = atol(buffer);
+        // the page cache still charged after exit is the files the run wrote or read (tmpfs included),
+        // not memory the solution used; what is left is close to the old ru_maxrss
+        long cache = read_file(path, "memory.stat", buffer, sizeof(buffer)) == 0 ? keyed_value(buffer, "file") : -1;
+        if (cache > 0) {
+            usage->memory = usage->memory > cache ? usage->memory - cache : 0;
+        }
+    }
+    if (read_file(path, "memory.events", buffer, sizeof(buffer)) == 0) {
+        usage->oom_killed = keyed_value(buffer, "oom_kill") > 0;
+    }
+}
+
+
+void cgroup_remove(const char *path) {
+    // processes the solution forked may outlive it, kill them first (cgroup.kill is 5.14+)
+    write_file(path, "cgroup.kill", "1");
+    struct timespec interval = {0, REMOVE_INTERVAL_NS};
+    for (int i = 0; i < REMOVE_RETRIES; i++) {
+        if (rmdir(path) == 0 || errno != EBUSY) {
+            return;
+        }
+        nanosleep(&interval, NULL);
+    }
+}
@@ -0,0 +1,24 @@
+#ifndef JUDGER_CGROUP_H
+#define JUDGER_CGROUP_H
+
+#include <stddef.h>
+
+#include "runner.h"
+
+struct cgroup_usage {
+    long cpu_time;      // user + system time (ms) of every process of the run, -1 if unknown
+    long memory;        // memory.peak less the page cache left at exit (byte), -1 if the kernel has no memory.peak (before 5.19)
+    int oom_killed;     // memory.max was hit and the kernel killed a process for it
+};
+
+long cgroup_memory_max(struct config *_config);
+
+int cgroup_create(struct config *_config, char *path, size_t size);
+
+int cgroup_enter(const char *path);
+
+void cgroup_read_usage(const char *path, struct cgroup_usage *usage);
+
+void cgroup_remove(const char *path);
+
+#endif //JUDGER_CGROUP_H
@@ -19,7 +19,8 @@
 #include "runner.h"
 #include "child.h"
 #include "logger.h"
-#include "rules/seccomp_rules.h"
+#include "seccomp_cache.h"
+#include "cgroup.h"
 
 #include "killer.h"
 
@@ -31,9 +32,23 @@ void close_file(FILE *fp) {
 }
 
 
-void child_process(FILE *log_fp, struct config *_config) {
+void child_process(FILE *log_fp, struct config *_config, const char *cgroup) {
     FILE *input_file = NULL, *output_file = NULL, *error_file = NULL;
 
+    // when forked from an embedding process (e.g. the python binding), signal dispositions
+    // and mask are inherited; ignored signals survive execve, so restore the defaults
+    sigset_t empty_set;
+    sigemptyset(&empty_set);
+    if (sigprocmask(SIG_SETMASK, &empty_set, NULL) != 0 ||
+        signal(SIGPIPE, SIG_DFL) == SIG_ERR || signal(SIGXFSZ, SIG_DFL) == SIG_ERR) {
+        CHILD_ERROR_EXIT(FORK_FAILED);
+    }
+
+    // join the run's group while still root, before execve charges anything to it
+    if (cgroup != NULL && cgroup_enter(cgroup) != 0) {
+        CHILD_ERROR_EXIT(CGROUP_FAILED);
+    }
+
     if (_config->max_stack != UNLIMITED) {
         struct rlimit max_stack;
         max_stack.rlim_cur = max_stack.rlim_max = (rlim_t) (_config->max_stack);
@@ -44,7 +59,8 @@ void child_process(FILE *log_fp, struct config *_config) {
 
     // set memory limit
     // if memory_limit_check_only == 0, we only check memory usage number, because setrlimit(maxrss) will cause some crash issues
-    if (_config->memory_limit_check_only == 0) {
+    // in a cgroup, memory.max limits what the run really uses instead of its address space
+    if (_config->memory_limit_check_only == 0 && (cgroup == NULL || cgroup_memory_max(_config) < 0)) {
         if (_config->max_memory != UNLIMITED) {
             struct rlimit max_memory;
             max_memory.rlim_cur = max_memory.rlim_max = (rlim_t) (_config->max_memory) * 2;
@@ -136,28 +152,9 @@ void child_process(FILE *log_fp, struct config *_config) {
         CHILD_ERROR_EXIT(SETUID_FAILED);
     }
 
-    // load seccomp
-    if (_config->seccomp_rule_name != NULL) {
-        if (strcmp("c_cpp", _config->seccomp_rule_name) == 0) {
-            if (c_cpp_seccomp_rules(_config) != SUCCESS) {
-                CHILD_ERROR_EXIT(LOAD_SECCOMP_FAILED);
-            }
-        }
-        else if (strcmp("c_cpp_file_io", _config->seccomp_rule_name) == 0) {
-            if (c_cpp_file_io_seccomp_rules(_config) != SUCCESS) {
-                CHILD_ERROR_EXIT(LOAD_SECCOMP_FAILED);
-            }
-        }
-        else if (strcmp("general", _config->seccomp_rule_name) == 0) {
-            if (general_seccomp_rules(_config) != SUCCESS ) {
-                CHILD_ERROR_EXIT(LOAD_SECCOMP_FAILED);
-            }
-        }
-        // other rules
-        else {
-            // rule does not exist
-            CHILD_ERROR_EXIT(LOAD_SECCOMP_FAILED);
-        }
+    // load seccomp, compiled by the parent in batch_open
+    if (_config->seccomp_rule_name != NULL && seccomp_install(_config->seccomp_rule_name, _config->exe_path) != SUCCESS) {
+        CHILD_ERROR_EXIT(LOAD_SECCOMP_FAILED);
     }
 
     execve(_config->exe_path, _config->args, _config->env);
@@ -19,6 +19,6 @@
     }
 
 
-void child_process(FILE *log_fp, struct config *_config);
+void child_process(FILE *log_fp, struct config *_config, const char *cgroup);
 
 #endif //JUDGER_CHILD_H
@@ -1,33 +1,111 @@
-#define _POSIX_SOURCE
+#define _GNU_SOURCE
+#include <errno.h>
+#include <poll.h>
 #include <pthread.h>
-#include <unistd.h>
 #include <signal.h>
+#include <time.h>
+#include <unistd.h>
+#include <sys/syscall.h>
 
+#include "runner.h"
 #include "killer.h"
 
+#ifndef SYS_pidfd_open
+#define SYS_pidfd_open 434
+#endif
+
+// the cpu time of a multi-threaded child grows faster than the wall clock,
+// so the watchdog never sleeps longer than this
+#define WATCHDOG_INTERVAL 100
+
 
 int kill_pid(pid_t pid) {
     return kill(pid, SIGKILL);
 }
 
 
-void *timeout_killer(void *timeout_killer_args) {
-    // this is a new thread, kill the process if timeout
-    pid_t pid = ((struct timeout_killer_args *)timeout_killer_args)->pid;
-    int timeout = ((struct timeout_killer_args *)timeout_killer_args)->timeout;
-    // On success, pthread_detach() returns 0; on error, it returns an error number.
-    if (pthread_detach(pthread_self()) != 0) {
-        kill_pid(pid);
-        return NULL;
+static long elapsed_ms(const struct timespec *start) {
+    struct timespec now;
+    clock_gettime(CLOCK_MONOTONIC, &now);
+    return (now.tv_sec - start->tv_sec) * 1000 + (now.tv_nsec - start->tv_nsec) / 1000000;
+}
+
+
+static long process_cpu_ms(pid_t pid) {
+    // user + system time of every thread, readable until the child is reaped
+    clockid_t clock;
+    struct timespec cpu;
+    if (clock_getcpuclockid(pid, &clock) != 0 || clock_gettime(clock, &cpu) != 0) {
+        return -1;
+    }
+    return cpu.tv_sec * 1000 + cpu.tv_nsec / 1000000;
+}
+
+
+int check_limits(struct timeout_killer_args *killer_args) {
+    // kill the child if it is over a limit, otherwise return the ms it may run before it can be,
+    // returns -1 once the child was killed; at least one limit must be set
+    long wait = -1;
+    if (killer_args->timeout != UNLIMITED) {
+        wait = killer_args->timeout - elapsed_ms(&killer_args->start);
+        if (wait <= 0) {
+            killer_args->killed = KILLED_REAL_TIME;
+            kill_pid(killer_args->pid);
+            return -1;
+        }
+    }
+    if (killer_args->cpu_timeout != UNLIMITED) {
+        long cpu = process_cpu_ms(killer_args->pid);
+        long left = WATCHDOG_INTERVAL;
+        if (cpu > killer_args->cpu_timeout) {
+            killer_args->killed = KILLED_CPU_TIME;
+            killer_args->cpu_time = (int) cpu;
+            kill_pid(killer_args->pid);
+            return -1;
+        }
+        if (cpu >= 0 && killer_args->cpu_timeout - cpu + 1 < left) {
+            left = killer_args->cpu_timeout - cpu + 1;
+        }
+        if (wait < 0 || left < wait) {
+            wait = left;
+        }
     }
-    // usleep can't be used, for time args must < 1000ms
-    // this may sleep longer that expected, but we will have a check at the end
-    if (sleep((unsigned int)((timeout + 1000) / 1000)) != 0) {
-        kill_pid(pid);
-        return NULL;
+    return (int) wait;
+}
+
+
+int watch_pidfd(struct timeout_killer_args *killer_args) {
+    // wait until the child exits or is killed, it is left for the caller to reap.
+    // returns -1 if the kernel has no pidfd (before 5.3), then use timeout_killer
+    int pidfd = (int) syscall(SYS_pidfd_open, killer_args->pid, 0);
+    if (pidfd < 0) {
+        return -1;
     }
-    if (kill_pid(pid) != 0) {
-        return NULL;
+    struct pollfd exited = {pidfd, POLLIN, 0};
+    int wait;
+    while ((wait = check_limits(killer_args)) >= 0) {
+        int ret = poll(&exited, 1, wait);
+        if (ret > 0) {
+            break;
+        }
+        if (ret < 0 && errno != EINTR) {
+            close(pidfd);
+            return -1;
+        }
+    }
+    close(pidfd);
+    return 0;
+}
+
+
+void *timeout_killer(void *timeout_killer_args) {
+    // this is a new thread, kill the process if it is over a limit.
+    // the runner cancels and joins it once the child exits, nanosleep is a cancellation point
+    struct timeout_killer_args *killer_args = (struct timeout_killer_args *) timeout_killer_args;
+    int wait;
+    while ((wait = check_limits(killer_args)) >= 0) {
+        struct timespec interval = {wait / 1000, (wait % 1000) * 1000000L};
+        nanosleep(&interval, NULL);
     }
     return NULL;
-}
\ No newline at end of file
+}
@@ -1,13 +1,30 @@
 #ifndef JUDGER_KILLER_H
 #define JUDGER_KILLER_H
 
+#include <time.h>
+#include <sys/types.h>
+
+enum {
+    NOT_KILLED = 0,
+    KILLED_REAL_TIME = 1,
+    KILLED_CPU_TIME = 2
+};
+
 struct timeout_killer_args {
     int pid;
-    int timeout;
+    int timeout;            // real time limit (ms), UNLIMITED for none
+    int cpu_timeout;        // cpu time watchdog limit (ms), UNLIMITED for none
+    struct timespec start;  // CLOCK_MONOTONIC when the child was forked
+    int killed;             // which limit the child was killed for
+    int cpu_time;           // process cpu time (ms) seen by the watchdog when it killed
 };
 
 int kill_pid(pid_t pid);
 
+int check_limits(struct timeout_killer_args *killer_args);
+
+int watch_pidfd(struct timeout_killer_args *killer_args);
+
 void *timeout_killer(void *timeout_killer_args);
 
 #endif //JUDGER_KILLER_H
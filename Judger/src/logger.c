@@ -33,14 +33,16 @@ void log_write(int level, const char *source_filename, const int line, const FIL
         fprintf(stderr, "can not open log file");
         return;
     }
-    static char buffer[log_buffer_size];
-    static char log_buffer[log_buffer_size];
-    static char datetime[100];
-    static char line_str[20];
-    static time_t now;
-    now = time(NULL);
+    // per call, the in-process runner logs from several threads at once (and from children forked
+    // while another thread held a lock, so no mutex either)
+    char buffer[log_buffer_size];
+    char log_buffer[log_buffer_size];
+    char datetime[100];
+    char line_str[20];
+    struct tm tm;
+    time_t now = time(NULL);
 
-    strftime(datetime, 99, "%Y-%m-%d %H:%M:%S", localtime(&now));
+    strftime(datetime, 99, "%Y-%m-%d %H:%M:%S", localtime_r(&now, &tm));
     snprintf(line_str, 19, "%d", line);
     va_list ap;
     va_start(ap, fmt);
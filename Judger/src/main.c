@@ -1,15 +1,74 @@
+#define _POSIX_C_SOURCE 200809L
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
 #include "argtable3.h"
 #include "runner.h"
 
 #define INT_PLACE_HOLDER "<n>"
 #define STR_PLACE_HOLDER "<str>"
 
-struct arg_lit *verb, *help, *version;
+struct arg_lit *verb, *help, *version, *batch, *stop_on_failure;
 struct arg_int *max_cpu_time, *max_real_time, *max_memory, *max_stack, *memory_limit_check_only,
-        *max_process_number, *max_output_size, *uid, *gid;
-struct arg_str *exe_path, *input_path, *output_path, *error_path, *args, *env, *log_path, *seccomp_rule_name;
+        *max_process_number, *max_output_size, *uid, *gid, *cpu_time_watchdog;
+struct arg_str *exe_path, *input_path, *output_path, *error_path, *args, *env, *log_path, *seccomp_rule_name,
+        *cgroup_path;
 struct arg_end *end;
 
+void print_result_line(struct result *_result) {
+    printf("{\"cpu_time\": %d, \"real_time\": %d, \"memory\": %ld, \"signal\": %d, "
+           "\"exit_code\": %d, \"error\": %d, \"result\": %d}\n",
+           _result->cpu_time,
+           _result->real_time,
+           _result->memory,
+           _result->signal,
+           _result->exit_code,
+           _result->error,
+           _result->result);
+    // the caller waits for this line before sending the next case
+    fflush(stdout);
+}
+
+
+void run_batch(struct config *_config, struct result *_result, int stop_on_failure) {
+    // one runner for many cases: the config is parsed and checked and the log opened once
+    FILE *log_fp = batch_open(_config, _result);
+    if (_result->error != SUCCESS) {
+        print_result_line(_result);
+        batch_close(log_fp);
+        return;
+    }
+    char *line = NULL;
+    size_t size = 0;
+    ssize_t length;
+    while ((length = getline(&line, &size, stdin)) != -1) {
+        if (length > 0 && line[length - 1] == '\n') {
+            line[length - 1] = '\0';
+        }
+        char *output_path = strchr(line, '\t');
+        char *error_path = output_path != NULL ? strchr(output_path + 1, '\t') : NULL;
+        if (error_path == NULL) {
+            _result->error = INVALID_CONFIG;
+            print_result_line(_result);
+            break;
+        }
+        *output_path++ = '\0';
+        *error_path++ = '\0';
+        _config->input_path = line;
+        _config->output_path = output_path;
+        _config->error_path = error_path;
+        batch_run(log_fp, _config, _result);
+        print_result_line(_result);
+        if (stop_on_failure && (_result->error != SUCCESS || _result->result != SUCCESS)) {
+            break;
+        }
+    }
+    free(line);
+    batch_close(log_fp);
+}
+
+
 int main(int argc, char *argv[]) {
     void *arg_table[] = {
             help = arg_litn(NULL, "help", 0, 1, "Display This Help And Exit"),
@@ -21,6 +80,7 @@ int main(int argc, char *argv[]) {
             max_stack = arg_intn(NULL, "max_stack", INT_PLACE_HOLDER, 0, 1, "Max Stack (byte, default 16M)"),
             max_process_number = arg_intn(NULL, "max_process_number", INT_PLACE_HOLDER, 0, 1, "Max Process Number"),
             max_output_size = arg_intn(NULL, "max_output_size", INT_PLACE_HOLDER, 0, 1, "Max Output Size (byte)"),
+            cpu_time_watchdog = arg_intn(NULL, "cpu_time_watchdog", INT_PLACE_HOLDER, 0, 1, "kill as soon as Max CPU Time is exceeded, cpu_time is then user + system time (default False)"),
 
             exe_path = arg_str1(NULL, "exe_path", STR_PLACE_HOLDER, "Exe Path"),
             input_path = arg_strn(NULL, "input_path", STR_PLACE_HOLDER, 0, 1, "Input Path"),
@@ -36,6 +96,11 @@ int main(int argc, char *argv[]) {
             uid = arg_intn(NULL, "uid", INT_PLACE_HOLDER, 0, 1, "UID (default 65534)"),
             gid = arg_intn(NULL, "gid", INT_PLACE_HOLDER, 0, 1, "GID (default 65534)"),
 
+            cgroup_path = arg_strn(NULL, "cgroup", STR_PLACE_HOLDER, 0, 1, "cgroup v2 Group To Run In, Replaces The Memory rlimit"),
+
+            batch = arg_litn(NULL, "batch", 0, 1, "Read \"input\\toutput\\terror\" Lines From Stdin, Print One Result Line Each"),
+            stop_on_failure = arg_litn(NULL, "stop_on_failure", 0, 1, "Stop A Batch At The First Case That Fails"),
+
             end = arg_end(10),
     };
 
@@ -108,6 +173,12 @@ int main(int argc, char *argv[]) {
         _config.max_output_size = UNLIMITED;
     }
 
+    if (cpu_time_watchdog->count > 0) {
+        _config.cpu_time_watchdog = *cpu_time_watchdog->ival == 0 ? 0 : 1;
+    } else {
+        _config.cpu_time_watchdog = 0;
+    }
+
     _config.exe_path = (char *)*exe_path->sval;
 
     if (input_path->count > 0) {
@@ -167,6 +238,17 @@ int main(int argc, char *argv[]) {
         _config.gid = 65534;
     }
 
+    if (cgroup_path->count > 0) {
+        _config.cgroup_path = (char *)cgroup_path->sval[0];
+    } else {
+        _config.cgroup_path = NULL;
+    }
+
+    if (batch->count > 0) {
+        run_batch(&_config, &_result, stop_on_failure->count > 0);
+        goto exit;
+    }
+
     run(&_config, &_result);
 
     printf("{\n"
@@ -5,10 +5,10 @@
 #include <fcntl.h>
 #include <stdbool.h>
 
-#include "../runner.h"
+#include "seccomp_rules.h"
 
 
-int _c_cpp_seccomp_rules(struct config *_config, bool allow_write_file) {
+scmp_filter_ctx _c_cpp_seccomp_rules(scmp_datum_t exe, bool allow_write_file) {
     int syscalls_whitelist[] = {SCMP_SYS(read), SCMP_SYS(fstat),
                                 SCMP_SYS(mmap), SCMP_SYS(mprotect),
                                 SCMP_SYS(munmap), SCMP_SYS(uname),
@@ -21,50 +21,50 @@ int _c_cpp_seccomp_rules(struct config *_config, bool allow_write_file) {
 
     int syscalls_whitelist_length = sizeof(syscalls_whitelist) / sizeof(int);
     scmp_filter_ctx ctx = NULL;
-    // load seccomp rules
+    // build seccomp rules
     ctx = seccomp_init(SCMP_ACT_KILL);
     if (!ctx) {
-        return LOAD_SECCOMP_FAILED;
+        return NULL;
     }
     for (int i = 0; i < syscalls_whitelist_length; i++) {
         if (seccomp_rule_add(ctx, SCMP_ACT_ALLOW, syscalls_whitelist[i], 0) != 0) {
-            return LOAD_SECCOMP_FAILED;
+            goto failed;
         }
     }
     // add extra rule for execve
-    if (seccomp_rule_add(ctx, SCMP_ACT_ALLOW, SCMP_SYS(execve), 1, SCMP_A0(SCMP_CMP_EQ, (scmp_datum_t)(_config->exe_path))) != 0) {
-        return LOAD_SECCOMP_FAILED;
+    if (seccomp_rule_add(ctx, SCMP_ACT_ALLOW, SCMP_SYS(execve), 1, SCMP_A0(SCMP_CMP_EQ, exe)) != 0) {
+        goto failed;
     }
     if (!allow_write_file) {
         // do not allow "w" and "rw"
         if (seccomp_rule_add(ctx, SCMP_ACT_ALLOW, SCMP_SYS(open), 1, SCMP_CMP(1, SCMP_CMP_MASKED_EQ, O_WRONLY | O_RDWR, 0)) != 0) {
-            return LOAD_SECCOMP_FAILED;
+            goto failed;
         }
         if (seccomp_rule_add(ctx, SCMP_ACT_ALLOW, SCMP_SYS(openat), 1, SCMP_CMP(2, SCMP_CMP_MASKED_EQ, O_WRONLY | O_RDWR, 0)) != 0) {
-            return LOAD_SECCOMP_FAILED;
+            goto failed;
         }
     } else {
         if (seccomp_rule_add(ctx, SCMP_ACT_ALLOW, SCMP_SYS(open), 0) != 0) {
-            return LOAD_SECCOMP_FAILED;
+            goto failed;
         }
         if (seccomp_rule_add(ctx, SCMP_ACT_ALLOW, SCMP_SYS(dup), 0) != 0) {
-            return LOAD_SECCOMP_FAILED;
+            goto failed;
         }
         if (seccomp_rule_add(ctx, SCMP_ACT_ALLOW, SCMP_SYS(dup2), 0) != 0) {
-            return LOAD_SECCOMP_FAILED;
+            goto failed;
         }
         if (seccomp_rule_add(ctx, SCMP_ACT_ALLOW, SCMP_SYS(dup3), 0) != 0) {
-            return LOAD_SECCOMP_FAILED;
+            goto failed;
         }
     }
-    if (seccomp_load(ctx) != 0) {
-        return LOAD_SECCOMP_FAILED;
-    }
+    return ctx;
+
+failed:
     seccomp_release(ctx);
-    return 0;
+    return NULL;
 }
 
 
-int c_cpp_seccomp_rules(struct config *_config, bool allow_write_file) {
-    return _c_cpp_seccomp_rules(_config, false);
+scmp_filter_ctx c_cpp_seccomp_rules(scmp_datum_t exe) {
+    return _c_cpp_seccomp_rules(exe, false);
 }
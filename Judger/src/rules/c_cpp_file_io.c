@@ -2,6 +2,6 @@
 #include "seccomp_rules.h"
 
 
-int c_cpp_file_io_seccomp_rules(struct config *_config) {
-    return _c_cpp_seccomp_rules(_config, true);
+scmp_filter_ctx c_cpp_file_io_seccomp_rules(scmp_datum_t exe) {
+    return _c_cpp_seccomp_rules(exe, true);
 }
@@ -5,10 +5,10 @@
 #include <fcntl.h>
 #include <errno.h>
 
-#include "../runner.h"
+#include "seccomp_rules.h"
 
 
-int general_seccomp_rules(struct config *_config) {
+scmp_filter_ctx general_seccomp_rules(scmp_datum_t exe) {
     int syscalls_blacklist[] = {SCMP_SYS(clone),
                                 SCMP_SYS(fork), SCMP_SYS(vfork),
                                 SCMP_SYS(kill), 
@@ -18,42 +18,41 @@ int general_seccomp_rules(struct config *_config) {
                                };
     int syscalls_blacklist_length = sizeof(syscalls_blacklist) / sizeof(int);
     scmp_filter_ctx ctx = NULL;
-    // load seccomp rules
+    // build seccomp rules
     ctx = seccomp_init(SCMP_ACT_ALLOW);
     if (!ctx) {
-        return LOAD_SECCOMP_FAILED;
+        return NULL;
     }
     for (int i = 0; i < syscalls_blacklist_length; i++) {
         if (seccomp_rule_add(ctx, SCMP_ACT_KILL, syscalls_blacklist[i], 0) != 0) {
-            return LOAD_SECCOMP_FAILED;
+            goto failed;
         }
     }
     // use SCMP_ACT_KILL for socket, python will be killed immediately
     if (seccomp_rule_add(ctx, SCMP_ACT_ERRNO(EACCES), SCMP_SYS(socket), 0) != 0) {
-        return LOAD_SECCOMP_FAILED;
+        goto failed;
     }
     // add extra rule for execve
-    if (seccomp_rule_add(ctx, SCMP_ACT_KILL, SCMP_SYS(execve), 1, SCMP_A0(SCMP_CMP_NE, (scmp_datum_t)(_config->exe_path))) != 0) {
-        return LOAD_SECCOMP_FAILED;
+    if (seccomp_rule_add(ctx, SCMP_ACT_KILL, SCMP_SYS(execve), 1, SCMP_A0(SCMP_CMP_NE, exe)) != 0) {
+        goto failed;
     }
     // do not allow "w" and "rw" using open
     if (seccomp_rule_add(ctx, SCMP_ACT_KILL, SCMP_SYS(open), 1, SCMP_CMP(1, SCMP_CMP_MASKED_EQ, O_WRONLY, O_WRONLY)) != 0) {
-        return LOAD_SECCOMP_FAILED;
+        goto failed;
     }
     if (seccomp_rule_add(ctx, SCMP_ACT_KILL, SCMP_SYS(open), 1, SCMP_CMP(1, SCMP_CMP_MASKED_EQ, O_RDWR, O_RDWR)) != 0) {
-        return LOAD_SECCOMP_FAILED;
+        goto failed;
     }
     // do not allow "w" and "rw" using openat
     if (seccomp_rule_add(ctx, SCMP_ACT_KILL, SCMP_SYS(openat), 1, SCMP_CMP(2, SCMP_CMP_MASKED_EQ, O_WRONLY, O_WRONLY)) != 0) {
-        return LOAD_SECCOMP_FAILED;
+        goto failed;
     }
     if (seccomp_rule_add(ctx, SCMP_ACT_KILL, SCMP_SYS(openat), 1, SCMP_CMP(2, SCMP_CMP_MASKED_EQ, O_RDWR, O_RDWR)) != 0) {
-        return LOAD_SECCOMP_FAILED;
+        goto failed;
     }
+    return ctx;
 
-    if (seccomp_load(ctx) != 0) {
-        return LOAD_SECCOMP_FAILED;
-    }
+failed:
     seccomp_release(ctx);
-    return 0;
+    return NULL;
 }
@@ -1,11 +1,12 @@
 #ifndef JUDGER_SECCOMP_RULES_H
 #define JUDGER_SECCOMP_RULES_H
 #include <stdbool.h>
-#include "../runner.h"
+#include <seccomp.h>
 
-int _c_cpp_seccomp_rules(struct config *_config, bool allow_write_file);
-int c_cpp_seccomp_rules(struct config *_config);
-int general_seccomp_rules(struct config *_config);
-int c_cpp_file_io_seccomp_rules(struct config *_config);
+// the filter of a rule set, NULL on failure; execve is allowed for the address exe only
+scmp_filter_ctx _c_cpp_seccomp_rules(scmp_datum_t exe, bool allow_write_file);
+scmp_filter_ctx c_cpp_seccomp_rules(scmp_datum_t exe);
+scmp_filter_ctx general_seccomp_rules(scmp_datum_t exe);
+scmp_filter_ctx c_cpp_file_io_seccomp_rules(scmp_datum_t exe);
 
 #endif //JUDGER_SECCOMP_RULES_H
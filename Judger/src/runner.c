@@ -7,6 +7,8 @@
 #include <signal.h>
 #include <pthread.h>
 #include <errno.h>
+#include <limits.h>
+#include <time.h>
 #include <unistd.h>
 
 #include <sys/wait.h>
@@ -18,6 +20,8 @@
 #include "killer.h"
 #include "child.h"
 #include "logger.h"
+#include "cgroup.h"
+#include "seccomp_cache.h"
 
 void init_result(struct result *_result) {
     _result->result = _result->error = SUCCESS;
@@ -26,13 +30,7 @@ void init_result(struct result *_result) {
 }
 
 
-void run(struct config *_config, struct result *_result) {
-    // init log fp
-    FILE *log_fp = log_open(_config->log_path);
-
-    // init result
-    init_result(_result);
-
+static void check_config(FILE *log_fp, struct config *_config, struct result *_result) {
     // check whether current user is root
     uid_t uid = getuid();
     if (uid != 0) {
@@ -48,55 +46,109 @@ void run(struct config *_config, struct result *_result) {
         (_config->max_output_size < 1 && _config->max_output_size != UNLIMITED)) {
         ERROR_EXIT(INVALID_CONFIG);
     }
+}
+
+
+FILE *batch_open(struct config *_config, struct result *_result) {
+    // opens the log and checks the config once for a series of batch_run calls,
+    // the config was accepted if _result->error is SUCCESS
+    FILE *log_fp = log_open(_config->log_path);
+    init_result(_result);
+    check_config(log_fp, _config, _result);
+    // the children only patch and install the rule set, an unknown one fails in the child as before
+    if (_result->error == SUCCESS && _config->seccomp_rule_name != NULL) {
+        seccomp_prepare(_config->seccomp_rule_name);
+    }
+    return log_fp;
+}
+
+
+void batch_run(FILE *log_fp, struct config *_config, struct result *_result) {
+    // run one case of a batch, input_path, output_path and error_path may change between calls
+    init_result(_result);
 
     // record current time
     struct timeval start, end;
     gettimeofday(&start, NULL);
+    struct timeout_killer_args killer_args;
+    clock_gettime(CLOCK_MONOTONIC, &killer_args.start);
+
+    // with a slot group, the run gets a group of its own for accounting and memory.max
+    char cgroup[PATH_MAX];
+    int use_cgroup = _config->cgroup_path != NULL;
+    if (use_cgroup && cgroup_create(_config, cgroup, sizeof(cgroup)) != 0) {
+        ERROR_EXIT(CGROUP_FAILED);
+    }
 
     pid_t child_pid = fork();
 
     // pid < 0 shows clone failed
     if (child_pid < 0) {
+        if (use_cgroup) {
+            cgroup_remove(cgroup);
+        }
         ERROR_EXIT(FORK_FAILED);
     }
     else if (child_pid == 0) {
-        child_process(log_fp, _config);
+        child_process(log_fp, _config, use_cgroup ? cgroup : NULL);
     }
     else if (child_pid > 0){
-        // create new thread to monitor process running time
+        killer_args.pid = child_pid;
+        killer_args.timeout = _config->max_real_time;
+        killer_args.cpu_timeout = UNLIMITED;
+        if (_config->cpu_time_watchdog && _config->max_cpu_time != UNLIMITED) {
+            killer_args.cpu_timeout = _config->max_cpu_time;
+        }
+        killer_args.killed = NOT_KILLED;
+        killer_args.cpu_time = 0;
+
+        // monitor the limits through a pidfd, or from a new thread if the kernel has none
         pthread_t tid = 0;
-        if (_config->max_real_time != UNLIMITED) {
-            struct timeout_killer_args killer_args;
-
-            killer_args.timeout = _config->max_real_time;
-            killer_args.pid = child_pid;
-            if (pthread_create(&tid, NULL, timeout_killer, (void *) (&killer_args)) != 0) {
-                kill_pid(child_pid);
-                ERROR_EXIT(PTHREAD_FAILED);
+        int killer_thread = 0;
+        if (killer_args.timeout != UNLIMITED || killer_args.cpu_timeout != UNLIMITED) {
+            if (watch_pidfd(&killer_args) != 0) {
+                if (pthread_create(&tid, NULL, timeout_killer, (void *) (&killer_args)) != 0) {
+                    kill_pid(child_pid);
+                    if (use_cgroup) {
+                        cgroup_remove(cgroup);
+                    }
+                    ERROR_EXIT(PTHREAD_FAILED);
+                }
+                killer_thread = 1;
             }
         }
 
         int status;
         struct rusage resource_usage;
 
+        if (killer_thread) {
+            // stop the killer thread before reaping, so it can never signal a reused pid
+            siginfo_t info;
+            while (waitid(P_PID, child_pid, &info, WEXITED | WSTOPPED | WNOWAIT) == -1 && errno == EINTR);
+            pthread_cancel(tid);
+            pthread_join(tid, NULL);
+        }
+
         // wait for child process to terminate
         // on success, returns the process ID of the child whose state has changed;
         // On error, -1 is returned.
         if (wait4(child_pid, &status, WSTOPPED, &resource_usage) == -1) {
             kill_pid(child_pid);
+            if (use_cgroup) {
+                cgroup_remove(cgroup);
+            }
             ERROR_EXIT(WAIT_FAILED);
         }
+
+        struct cgroup_usage usage = {-1, -1, 0};
+        if (use_cgroup) {
+            cgroup_read_usage(cgroup, &usage);
+            cgroup_remove(cgroup);
+        }
         // get end time
         gettimeofday(&end, NULL);
         _result->real_time = (int) (end.tv_sec * 1000 + end.tv_usec / 1000 - start.tv_sec * 1000 - start.tv_usec / 1000);
 
-        // process exited, we may need to cancel timeout killer thread
-        if (_config->max_real_time != UNLIMITED) {
-            if (pthread_cancel(tid) != 0) {
-                // todo logging
-            };
-        }
-
         if (WIFSIGNALED(status) != 0) {
             _result->signal = WTERMSIG(status);
         }
@@ -108,14 +160,28 @@ void run(struct config *_config, struct result *_result) {
             _result->exit_code = WEXITSTATUS(status);
             _result->cpu_time = (int) (resource_usage.ru_utime.tv_sec * 1000 +
                                        resource_usage.ru_utime.tv_usec / 1000);
+            // the watchdog kills on user + system time, the verdict and cpu_time go by the same clock
+            if (killer_args.cpu_timeout != UNLIMITED) {
+                _result->cpu_time += (int) (resource_usage.ru_stime.tv_sec * 1000 +
+                                            resource_usage.ru_stime.tv_usec / 1000);
+            }
             _result->memory = resource_usage.ru_maxrss * 1024;
+            // the group counts user + system time and memory of every process of the run
+            if (usage.cpu_time >= 0) {
+                _result->cpu_time = (int) usage.cpu_time;
+            }
+            if (usage.memory >= 0) {
+                _result->memory = usage.memory;
+            }
+            int memory_exceeded = usage.oom_killed ||
+                                  (_config->max_memory != UNLIMITED && _result->memory > _config->max_memory);
 
             if (_result->exit_code != 0) {
                 _result->result = RUNTIME_ERROR;
             }
 
             if (_result->signal == SIGSEGV) {
-                if (_config->max_memory != UNLIMITED && _result->memory > _config->max_memory) {
+                if (memory_exceeded) {
                     _result->result = MEMORY_LIMIT_EXCEEDED;
                 }
                 else {
@@ -126,7 +192,7 @@ void run(struct config *_config, struct result *_result) {
                 if (_result->signal != 0) {
                     _result->result = RUNTIME_ERROR;
                 }
-                if (_config->max_memory != UNLIMITED && _result->memory > _config->max_memory) {
+                if (memory_exceeded) {
                     _result->result = MEMORY_LIMIT_EXCEEDED;
                 }
                 if (_config->max_real_time != UNLIMITED && _result->real_time > _config->max_real_time) {
@@ -136,8 +202,31 @@ void run(struct config *_config, struct result *_result) {
                     _result->result = CPU_TIME_LIMIT_EXCEEDED;
                 }
             }
+
+            // the rusage of a killed child may not have reached the limit it was killed for
+            if (killer_args.killed == KILLED_CPU_TIME) {
+                if (_result->cpu_time < killer_args.cpu_time) {
+                    _result->cpu_time = killer_args.cpu_time;
+                }
+                _result->result = CPU_TIME_LIMIT_EXCEEDED;
+            }
+            else if (killer_args.killed == KILLED_REAL_TIME && _result->result != CPU_TIME_LIMIT_EXCEEDED) {
+                _result->result = REAL_TIME_LIMIT_EXCEEDED;
+            }
         }
+    }
+}
 
-        log_close(log_fp);
+
+void batch_close(FILE *log_fp) {
+    log_close(log_fp);
+}
+
+
+void run(struct config *_config, struct result *_result) {
+    FILE *log_fp = batch_open(_config, _result);
+    if (_result->error == SUCCESS) {
+        batch_run(log_fp, _config, _result);
     }
+    batch_close(log_fp);
 }
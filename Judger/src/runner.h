@@ -15,7 +15,6 @@
     {\
         LOG_ERROR(error_code);  \
         _result->error = error_code; \
-        log_close(log_fp);  \
         return; \
     }
 
@@ -35,7 +34,8 @@ enum {
     DUP2_FAILED = -8,
     SETUID_FAILED = -9,
     EXECVE_FAILED = -10,
-    SPJ_ERROR = -11
+    SPJ_ERROR = -11,
+    CGROUP_FAILED = -12
 };
 
 
@@ -57,6 +57,8 @@ struct config {
     char *seccomp_rule_name;
     uid_t uid;
     gid_t gid;
+    int cpu_time_watchdog;
+    char *cgroup_path;  // slot group to account and limit each run in (cgroup v2), NULL for rlimits only
 };
 
 
@@ -82,4 +84,10 @@ struct result {
 
 
 void run(struct config *, struct result *);
+
+FILE *batch_open(struct config *, struct result *);
+
+void batch_run(FILE *, struct config *, struct result *);
+
+void batch_close(FILE *);
 #endif //JUDGER_RUNNER_H
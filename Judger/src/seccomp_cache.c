@@ -0,0 +1,236 @@
+#define _GNU_SOURCE
+#include <stdint.h>
+#include <stdlib.h>
+#include <string.h>
+#include <pthread.h>
+#include <unistd.h>
+#include <sys/mman.h>
+#include <sys/prctl.h>
+#include <sys/stat.h>
+#include <linux/filter.h>
+#include <linux/seccomp.h>
+#include <seccomp.h>
+
+#include "runner.h"
+#include "seccomp_cache.h"
+#include "rules/seccomp_rules.h"
+
+// stands in for the address of exe_path while a rule set is compiled, each child patches in its own
+#define EXE_HIGH 0x5ec0de5eU
+#define EXE_LOW 0xc0de5ec0U
+#define MAX_PATCHES 8
+
+
+struct rule_set {
+    const char *name;
+    scmp_filter_ctx (*build)(scmp_datum_t exe);
+    int ready;                      // set last, a child forked before sees 0 and compiles the rules itself
+    unsigned short length;
+    struct sock_filter *filter;
+    int high_count, low_count;      // the instructions comparing with EXE_HIGH and EXE_LOW
+    unsigned short high[MAX_PATCHES], low[MAX_PATCHES];
+};
+
+static struct rule_set rule_sets[] = {
+    {"c_cpp", c_cpp_seccomp_rules},
+    {"c_cpp_file_io", c_cpp_file_io_seccomp_rules},
+    {"general", general_seccomp_rules},
+};
+
+static pthread_mutex_t prepare_lock = PTHREAD_MUTEX_INITIALIZER;
+
+
+static int cache_disabled(void) {
+    // JUDGER_SECCOMP_CACHE=0 compiles the rules in every child, as when a rule set could not be
+    // compiled or patched; getenv does not allocate, the child may call it
+    const char *value = getenv("JUDGER_SECCOMP_CACHE");
+    return value != NULL && strcmp(value, "0") == 0;
+}
+
+
+static struct rule_set *find_rule_set(const char *rule_name) {
+    for (size_t i = 0; i < sizeof(rule_sets) / sizeof(rule_sets[0]); i++) {
+        if (strcmp(rule_sets[i].name, rule_name) == 0) {
+            return &rule_sets[i];
+        }
+    }
+    return NULL;
+}
+
+
+static scmp_datum_t exe_datum(const char *exe_path) {
+    // execve is checked against the address of exe_path, which a forked child shares with its parent
+    return (scmp_datum_t) (uintptr_t) exe_path;
+}
+
+
+static scmp_datum_t placeholder(void) {
+    // execve's argument has a single word on 32 bit hosts
+    return sizeof(void *) > 4 ? ((scmp_datum_t) EXE_HIGH << 32) | EXE_LOW : EXE_LOW;
+}
+
+
+static int export_program(scmp_filter_ctx ctx, struct sock_filter **filter) {
+    // libseccomp only writes the program to a file descriptor; the number of instructions, -1 on failure
+    int fd = memfd_create("seccomp", MFD_CLOEXEC);
+    if (fd < 0) {
+        return -1;
+    }
+    struct stat st;
+    int length = -1;
+    *filter = NULL;
+    if (seccomp_export_bpf(ctx, fd) == 0 && fstat(fd, &st) == 0 && lseek(fd, 0, SEEK_SET) == 0 &&
+        st.st_size > 0 && st.st_size % sizeof(struct sock_filter) == 0 && st.st_size <= BPF_MAXINSNS * sizeof(struct sock_filter)) {
+        *filter = malloc(st.st_size);
+        if (*filter != NULL && read(fd, *filter, st.st_size) == st.st_size) {
+            length = (int) (st.st_size / sizeof(struct sock_filter));
+        }
+    }
+    close(fd);
+    if (length < 0) {
+        free(*filter);
+        *filter = NULL;
+    }
+    return length;
+}
+
+
+static int find_patches(struct rule_set *rule_set, const struct sock_filter *filter, int length) {
+    rule_set->high_count = rule_set->low_count = 0;
+    for (int i = 0; i < length; i++) {
+        if (filter[i].code != (BPF_JMP | BPF_JEQ | BPF_K)) {
+            continue;
+        }
+        if (sizeof(void *) > 4 && filter[i].k == EXE_HIGH) {
+            if (rule_set->high_count == MAX_PATCHES) {
+                return -1;
+            }
+            rule_set->high[rule_set->high_count++] = (unsigned short) i;
+        }
+        else if (filter[i].k == EXE_LOW) {
+            if (rule_set->low_count == MAX_PATCHES) {
+                return -1;
+            }
+            rule_set->low[rule_set->low_count++] = (unsigned short) i;
+        }
+    }
+    // a 64 bit argument is compared a word at a time, both have to be found
+    if (rule_set->low_count == 0 || (sizeof(void *) > 4 && rule_set->high_count == 0)) {
+        return -1;
+    }
+    return 0;
+}
+
+
+static void patch(const struct rule_set *rule_set, struct sock_filter *filter, const char *exe_path) {
+    scmp_datum_t exe = exe_datum(exe_path);
+    for (int i = 0; i < rule_set->high_count; i++) {
+        filter[rule_set->high[i]].k = (uint32_t) (exe >> 32);
+    }
+    for (int i = 0; i < rule_set->low_count; i++) {
+        filter[rule_set->low[i]].k = (uint32_t) exe;
+    }
+}
+
+
+static int compile(struct rule_set *rule_set) {
+    scmp_filter_ctx ctx = rule_set->build(placeholder());
+    if (ctx == NULL) {
+        return LOAD_SECCOMP_FAILED;
+    }
+    struct sock_filter *filter;
+    int length = export_program(ctx, &filter);
+    seccomp_release(ctx);
+    if (length < 0) {
+        return LOAD_SECCOMP_FAILED;
+    }
+    if (find_patches(rule_set, filter, length) != 0) {
+        free(filter);
+        return LOAD_SECCOMP_FAILED;
+    }
+    rule_set->filter = filter;
+    rule_set->length = (unsigned short) length;
+    __atomic_store_n(&rule_set->ready, 1, __ATOMIC_RELEASE);
+    return SUCCESS;
+}
+
+
+int seccomp_prepare(const char *rule_name) {
+    // compiles a rule set to BPF once per process, called by the parent before it forks
+    struct rule_set *rule_set = find_rule_set(rule_name);
+    if (rule_set == NULL) {
+        return LOAD_SECCOMP_FAILED;
+    }
+    if (cache_disabled()) {
+        return LOAD_SECCOMP_FAILED;
+    }
+    if (__atomic_load_n(&rule_set->ready, __ATOMIC_ACQUIRE)) {
+        return SUCCESS;
+    }
+    pthread_mutex_lock(&prepare_lock);
+    int error = rule_set->ready ? SUCCESS : compile(rule_set);
+    pthread_mutex_unlock(&prepare_lock);
+    return error;
+}
+
+
+int seccomp_install(const char *rule_name, const char *exe_path) {
+    // runs in the child between fork and execve
+    struct rule_set *rule_set = find_rule_set(rule_name);
+    if (rule_set == NULL) {
+        return LOAD_SECCOMP_FAILED;
+    }
+    if (cache_disabled() || !__atomic_load_n(&rule_set->ready, __ATOMIC_ACQUIRE)) {
+        // not prepared by the parent, compile and load it here
+        scmp_filter_ctx ctx = rule_set->build(exe_datum(exe_path));
+        if (ctx == NULL) {
+            return LOAD_SECCOMP_FAILED;
+        }
+        int loaded = seccomp_load(ctx);
+        seccomp_release(ctx);
+        return loaded == 0 ? SUCCESS : LOAD_SECCOMP_FAILED;
+    }
+    struct sock_filter filter[rule_set->length];
+    memcpy(filter, rule_set->filter, sizeof(filter));
+    patch(rule_set, filter, exe_path);
+    struct sock_fprog program = {rule_set->length, filter};
+    // no_new_privs first, as seccomp_load does
+    if (prctl(PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0) != 0 || prctl(PR_SET_SECCOMP, SECCOMP_MODE_FILTER, &program) != 0) {
+        return LOAD_SECCOMP_FAILED;
+    }
+    return SUCCESS;
+}
+
+
+int seccomp_program(const char *rule_name, const char *exe_path, int cached, struct sock_filter *filter, int size) {
+    // for benchmarks and tests: with cached set the program a child installs for exe_path (patched from
+    // the cache, or compiled as seccomp_install falls back to), otherwise the one libseccomp compiles
+    // for it; the number of instructions, -1 on failure
+    struct rule_set *rule_set = find_rule_set(rule_name);
+    if (rule_set == NULL) {
+        return -1;
+    }
+    if (cached && seccomp_prepare(rule_name) == SUCCESS) {
+        if (rule_set->length > size) {
+            return -1;
+        }
+        memcpy(filter, rule_set->filter, rule_set->length * sizeof(struct sock_filter));
+        patch(rule_set, filter, exe_path);
+        return rule_set->length;
+    }
+    scmp_filter_ctx ctx = rule_set->build(exe_datum(exe_path));
+    if (ctx == NULL) {
+        return -1;
+    }
+    struct sock_filter *compiled;
+    int length = export_program(ctx, &compiled);
+    seccomp_release(ctx);
+    if (length > size) {
+        length = -1;
+    }
+    if (length > 0) {
+        memcpy(filter, compiled, length * sizeof(struct sock_filter));
+    }
+    free(compiled);
+    return length;
+}
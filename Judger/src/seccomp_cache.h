@@ -0,0 +1,12 @@
+#ifndef JUDGER_SECCOMP_CACHE_H
+#define JUDGER_SECCOMP_CACHE_H
+
+#include <linux/filter.h>
+
+int seccomp_prepare(const char *rule_name);
+
+int seccomp_install(const char *rule_name, const char *exe_path);
+
+int seccomp_program(const char *rule_name, const char *exe_path, int cached, struct sock_filter *filter, int size);
+
+#endif //JUDGER_SECCOMP_CACHE_H
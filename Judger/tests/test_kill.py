@@ -0,0 +1,72 @@
+# how late the runner kills a solution past its limit, run as root with the runner installed
+# (or JUDGER_CORE_PATH pointing at a build):
+#   python3 -m pytest Judger/tests
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bindings", "Python"))
+import _judger  # noqa: E402
+
+LIMIT = 1000
+# the watchdog looks at the cpu time at least every 100ms
+LATE = 300
+
+SPIN = "int main() { volatile unsigned long x = 0; for (;;) x++; }\n"
+IDLE = "#include <unistd.h>\nint main() { for (;;) pause(); }\n"
+
+pytestmark = pytest.mark.skipif(os.geteuid() != 0, reason="the runner needs root")
+
+
+@pytest.fixture(scope="module")
+def exes(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp("kill")
+    paths = {}
+    for name, source in (("spin", SPIN), ("idle", IDLE)):
+        (workdir / (name + ".c")).write_text(source)
+        subprocess.check_call(["gcc", "-O0", name + ".c", "-o", name], cwd=workdir)
+        paths[name] = str(workdir / name)
+    return paths
+
+
+def run(exe, tmp_path, max_real_time, watchdog):
+    return _judger.run(max_cpu_time=LIMIT,
+                       max_real_time=max_real_time,
+                       max_memory=_judger.UNLIMITED,
+                       max_stack=32 * 1024 * 1024,
+                       max_output_size=_judger.UNLIMITED,
+                       max_process_number=_judger.UNLIMITED,
+                       exe_path=exe,
+                       input_path="/dev/null",
+                       output_path="/dev/null",
+                       error_path="/dev/null",
+                       args=[],
+                       env=[],
+                       log_path=str(tmp_path / "judger.log"),
+                       seccomp_rule_name=None,
+                       uid=0,
+                       gid=0,
+                       cpu_time_watchdog=watchdog)
+
+
+def test_sleeper_killed_at_real_time_limit(exes, tmp_path):
+    result = run(exes["idle"], tmp_path, LIMIT, 0)
+    assert result["result"] == _judger.RESULT_REAL_TIME_LIMIT_EXCEEDED, result
+    assert LIMIT <= result["real_time"] < LIMIT + LATE, result
+
+
+def test_spinner_killed_by_watchdog(exes, tmp_path):
+    result = run(exes["spin"], tmp_path, LIMIT * 3, 1)
+    assert result["result"] == _judger.RESULT_CPU_TIME_LIMIT_EXCEEDED, result
+    assert result["real_time"] < LIMIT + LATE, result
+    # reported on the clock it was killed by, never below the limit
+    assert LIMIT < result["cpu_time"] < LIMIT + LATE, result
+
+
+def test_spinner_killed_by_rlimit(exes, tmp_path):
+    # RLIMIT_CPU has whole seconds, the kill comes within the next one
+    result = run(exes["spin"], tmp_path, LIMIT * 3, 0)
+    assert result["result"] == _judger.RESULT_CPU_TIME_LIMIT_EXCEEDED, result
+    assert result["real_time"] < LIMIT + 1000 + LATE, result
@@ -0,0 +1,109 @@
+# the seccomp programs the runner caches against the ones libseccomp compiles per run, and what
+# the sandbox lets a solution do with either; the runs need root:
+#   python3 -m pytest Judger/tests
+import ctypes
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bindings", "Python"))
+import _judger  # noqa: E402
+
+RULES = ("c_cpp", "c_cpp_file_io", "general")
+BPF_MAXINSNS = 4096
+
+# r only writes to stdout, w opens a file for writing, e runs another program
+PROBE = r'''#include <fcntl.h>
+#include <stdio.h>
+#include <unistd.h>
+int main(int argc, char **argv) {
+    if (argv[1][0] == 'w') open(argv[2], O_WRONLY | O_CREAT, 0644);
+    if (argv[1][0] == 'e') execl("/bin/true", "true", (char *) NULL);
+    puts("ok");
+    return 0;
+}
+'''
+
+pytestmark = pytest.mark.skipif(_judger._core is None, reason="needs the in-process runner library")
+
+
+def program(rule, exe, cached):
+    # what seccomp_export_bpf gives for the rule set, from the cache or compiled for exe from scratch
+    buffer = (ctypes.c_uint64 * BPF_MAXINSNS)()
+    length = _judger._core.seccomp_program(rule.encode(), exe, cached, buffer, BPF_MAXINSNS)
+    assert length > 0, rule
+    return bytes(buffer)[:length * 8]
+
+
+@pytest.mark.parametrize("rule", RULES)
+def test_cached_program_is_the_compiled_one(rule):
+    # execve is checked against the address of exe_path, each buffer has another one
+    exes = [ctypes.create_string_buffer(b"/usr/bin/true") for _ in range(4)]
+    programs = []
+    for exe in exes:
+        compiled = program(rule, exe, 0)
+        assert program(rule, exe, 1) == compiled
+        programs.append(compiled)
+    # the address really is patched in, not left at the placeholder or the first one
+    assert len(set(programs)) == len(exes)
+
+
+@pytest.mark.parametrize("rule", RULES)
+def test_fallback_program_is_the_compiled_one(rule, monkeypatch):
+    # without the cache a child compiles the rules for its own exe_path
+    monkeypatch.setenv("JUDGER_SECCOMP_CACHE", "0")
+    exe = ctypes.create_string_buffer(b"/usr/bin/true")
+    assert program(rule, exe, 1) == program(rule, exe, 0)
+
+
+def test_unknown_rule_has_no_program():
+    buffer = (ctypes.c_uint64 * BPF_MAXINSNS)()
+    assert _judger._core.seccomp_program(b"nope", b"/bin/true", 1, buffer, BPF_MAXINSNS) == -1
+
+
+@pytest.fixture(scope="module")
+def probe(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp("seccomp")
+    (workdir / "probe.c").write_text(PROBE)
+    subprocess.check_call(["gcc", "-O2", "probe.c", "-o", "probe"], cwd=workdir)
+    return workdir
+
+
+def run_all(workdir):
+    verdicts = {}
+    for rule in RULES:
+        for action in "rwe":
+            result = _judger.run(max_cpu_time=1000,
+                                 max_real_time=3000,
+                                 max_memory=128 * 1024 * 1024,
+                                 max_stack=32 * 1024 * 1024,
+                                 max_output_size=1024 * 1024,
+                                 max_process_number=_judger.UNLIMITED,
+                                 exe_path=str(workdir / "probe"),
+                                 input_path="/dev/null",
+                                 output_path="/dev/null",
+                                 error_path="/dev/null",
+                                 args=[action, str(workdir / "written")],
+                                 env=[],
+                                 log_path=str(workdir / "judger.log"),
+                                 seccomp_rule_name=rule,
+                                 uid=0,
+                                 gid=0)
+            assert result["error"] == 0, result
+            verdicts[rule, action] = (result["result"], result["signal"])
+    return verdicts
+
+
+@pytest.mark.skipif(os.geteuid() != 0, reason="the runner needs root")
+def test_fallback_enforces_the_same_policy(probe, monkeypatch):
+    cached = run_all(probe)
+    # every child compiles and loads the rules itself, as when a rule set could not be patched
+    monkeypatch.setenv("JUDGER_SECCOMP_CACHE", "0")
+    assert run_all(probe) == cached
+    killed = (_judger.RESULT_RUNTIME_ERROR, 31)  # SIGSYS
+    assert cached["general", "r"] == (_judger.RESULT_SUCCESS, 0)
+    assert cached["general", "w"] == killed
+    assert cached["general", "e"] == killed
+    assert cached["c_cpp", "e"] == killed
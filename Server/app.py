@@ -1,24 +1,38 @@
+import functools
 import json
 import logging
 import multiprocessing
 import os
-import shutil
+from concurrent.futures import ThreadPoolExecutor
+import socket
+import time
 import zipfile
 from pathlib import Path
-from time import sleep
 
 import flask
 import psutil
-import requests
 from flask import request, redirect, session, url_for, render_template
 from tornado.httpserver import HTTPServer
 from tornado.ioloop import IOLoop
-from tornado.wsgi import WSGIContainer
 from werkzeug.utils import secure_filename
 
-from cleaner import delfile
-from exception import CompileError
-from judger import Judger, Compiler
+import _judger
+
+from cache import CompileCache, DataCache, VerdictCache
+from callback import CallbackDispatcher, Outbox
+from cgroups import CgroupSlots
+from cluster import ClusterQueue, ClusterNode
+from datasync import DataStore
+from exception import CompileError, QueueFullError, DataSyncError
+from frontend import make_app
+from judger import Judger, Compiler, CoreBudget, init_worker, acquire_core, release_core, verdict_name, \
+    reproducible, default_env
+from metrics import Gauge, VERDICT_TOTAL, exposition
+from runtime import RuntimeCalibration
+from scheduler import JudgePipeline, JudgeScheduler
+import tracing
+from testdata import CaseTimings, load_manifest, read_policy
+from workspace import WorkspacePool
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(filename)s %(lineno)d %(levelname)s : %(message)s')
 
@@ -26,10 +40,70 @@ app = flask.Flask(__name__)
 
 SERVICE_PORT = int(os.getenv('SERVICE_PORT', "5001"))
 BASE_DIR = '/ojdata'
-TMP_DIR = "/tmp/judger"
+TMP_DIR = os.getenv('WORKSPACE_DIR', "/tmp/judger")
 PASSWORD = os.getenv('PASSWORD', 'iAMaPASSWORD')
 OJ_BACKEND_CALLBACK = os.getenv('OJ_BACKEND_CALLBACK', None)
 assert OJ_BACKEND_CALLBACK is not None, "ENV: OJ_BACKEND_CALLBACK must be set!"
+MAX_QUEUE_LENGTH = int(os.getenv('MAX_QUEUE_LENGTH', "1000"))
+COMPILE_QUEUE_LENGTH = int(os.getenv('COMPILE_QUEUE_LENGTH', str(MAX_QUEUE_LENGTH)))
+CGROUP_ROOT = os.getenv('CGROUP_ROOT', '')  # e.g. /sys/fs/cgroup/judger, unset judges with rlimits only
+RUN_WORKERS = int(os.getenv('RUN_WORKERS', "0"))  # 0 is one more than the cores
+COMPILE_WORKERS = int(os.getenv('COMPILE_WORKERS', "0"))  # 0 is half the cores
+RETRY_AFTER = int(os.getenv('RETRY_AFTER', "10"))  # seconds, sent with 503 when the queue is full
+MAX_CASE_PARALLELISM = int(os.getenv('MAX_CASE_PARALLELISM', "4"))
+CALLBACK_OUTBOX = os.getenv('CALLBACK_OUTBOX', '/tmp/judger_outbox.db')
+CALLBACK_CONCURRENCY = int(os.getenv('CALLBACK_CONCURRENCY', "16"))
+CALLBACK_BATCH_SIZE = int(os.getenv('CALLBACK_BATCH_SIZE', "1"))  # > 1 posts a json list of results
+COMPILE_CACHE_DIR = os.getenv('COMPILE_CACHE_DIR', '/tmp/judger_cache')
+COMPILE_CACHE_SIZE = int(os.getenv('COMPILE_CACHE_SIZE', str(512 * 1024 * 1024)))  # 0 disables the cache
+DATA_CACHE_DIR = os.getenv('DATA_CACHE_DIR', '/dev/shm/judger_data')
+DATA_CACHE_SIZE = int(os.getenv('DATA_CACHE_SIZE', "0"))  # 0 disables the cache
+VERDICT_CACHE_DIR = os.getenv('VERDICT_CACHE_DIR', '/tmp/judger_verdicts')
+VERDICT_CACHE_SIZE = int(os.getenv('VERDICT_CACHE_SIZE', "0"))  # 0 disables the cache
+STREAM_OUTPUT = os.getenv('STREAM_OUTPUT', "0") == "1"  # compare output through a pipe instead of a file
+CASE_TIMINGS_DIR = os.getenv('CASE_TIMINGS_DIR', '/tmp/judger_timings')  # per case run times for cheapest-first
+TRACE_FILE = os.getenv('TRACE_FILE', '/tmp/judger_trace.jsonl')  # json lines, one span per line
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', "0.01"))  # share of submissions traced
+TRACE_MAX_SIZE = int(os.getenv('TRACE_MAX_SIZE', str(64 * 1024 * 1024)))  # bytes before the file is rotated
+RUNTIME_CALIBRATION = os.getenv('RUNTIME_CALIBRATION', '/tmp/judger_runtime.json')
+# interpreters measured at start up, kind=path
+CALIBRATE_RUNTIMES = os.getenv('CALIBRATE_RUNTIMES', 'python=/usr/bin/python3,java=/usr/bin/java')
+CLUSTER_QUEUE = os.getenv('CLUSTER_QUEUE', None)  # sqlite database shared by the nodes, unset runs standalone
+CLUSTER_NODE = os.getenv('CLUSTER_NODE', f"{socket.gethostname()}:{SERVICE_PORT}")
+CLUSTER_LEASE = float(os.getenv('CLUSTER_LEASE', "60"))  # seconds a node may go silent before its jobs move
+INTAKE_THREADS = int(os.getenv('INTAKE_THREADS', "8"))  # threads writing judge requests to disk
+HTTP_THREADS = int(os.getenv('HTTP_THREADS', "4"))  # threads serving uploads and the other flask routes
+MAX_DATA_FILE_SIZE = int(os.getenv('MAX_DATA_FILE_SIZE', str(4 * 1024 * 1024 * 1024)))  # one PUT /data file
+WORKSPACE_SLOTS = int(os.getenv('WORKSPACE_SLOTS', "0"))  # judge dirs made at start up, 0 is twice the workers
+WORKSPACE_RETAIN_SIZE = int(os.getenv('WORKSPACE_RETAIN_SIZE', str(1024 * 1024 * 1024)))  # 0 keeps nothing
+WORKSPACE_RETAIN_SECONDS = int(os.getenv('WORKSPACE_RETAIN_SECONDS', str(24 * 60 * 60)))
+DATA_VERSION_RETAIN = int(os.getenv('DATA_VERSION_RETAIN', "3600"))  # seconds a replaced data version is kept
+
+compile_cache = CompileCache(COMPILE_CACHE_DIR, COMPILE_CACHE_SIZE)
+data_cache = DataCache(DATA_CACHE_DIR, DATA_CACHE_SIZE)
+verdict_cache = VerdictCache(VERDICT_CACHE_DIR, VERDICT_CACHE_SIZE)
+runtimes = RuntimeCalibration(RUNTIME_CALIBRATION, default_env)
+data_store = DataStore(BASE_DIR, DATA_VERSION_RETAIN)
+case_timings = CaseTimings(CASE_TIMINGS_DIR)
+tracer = tracing.Tracer(TRACE_FILE, TRACE_SAMPLE_RATE, TRACE_MAX_SIZE)
+cluster_queue = None
+
+# read when /metrics is scraped, scheduler and dispatcher exist by then
+Gauge('judger_pool_jobs', 'Judge jobs waiting in the queue or running in the pool, per stage.',
+      lambda: [({'stage': stage, 'state': state}, stats[state])
+               for stage, stats in scheduler.stats()['stages'].items() for state in ('queued', 'running')])
+Gauge('judger_pool_workers', 'Judge pool processes, per stage.',
+      lambda: [({'stage': 'compile'}, scheduler.compile.workers), ({'stage': 'run'}, scheduler.run.workers)])
+Gauge('judger_cache_requests_total', 'Compile, test data and verdict cache lookups.',
+      lambda: [({'cache': name, 'result': result}, value)
+               for name, cache in (('compile', compile_cache), ('data', data_cache), ('verdict', verdict_cache))
+               for result, value in (('hit', cache.stats()['hits']), ('miss', cache.stats()['misses']))],
+      kind='counter')
+Gauge('judger_workspaces', 'Judge directories by state.',
+      lambda: [({'state': state}, value) for state, value in workspaces.stats().items()
+               if state in ('free', 'busy', 'dirty', 'retained')])
+Gauge('judger_callback_backlog', 'Results waiting for delivery to the backend.',
+      lambda: [({'where': 'memory'}, dispatcher.backlog()), ({'where': 'outbox'}, len(dispatcher.outbox))])
 
 app.config['MAX_CONTENT_LENGTH'] = 256 * 1024 * 1024  # 256MB
 app.config['SESSION_TYPE'] = 'memcached'
@@ -58,63 +132,128 @@ def start_up():
     if not os.path.exists(TMP_DIR):
         logging.info(f"mkdir {TMP_DIR}")
         os.makedirs(TMP_DIR)
-    p = multiprocessing.Process(target=delfile, args=(TMP_DIR,))
-    p.start()
-
-
-def run(judger, compiler):
+    workspaces.start()
+    if not os.path.exists(CASE_TIMINGS_DIR):
+        logging.info(f"mkdir {CASE_TIMINGS_DIR}")
+        os.makedirs(CASE_TIMINGS_DIR)
+    for cache in (compile_cache, data_cache, verdict_cache):
+        if cache.enabled and not os.path.exists(cache.cache_dir):
+            logging.info(f"mkdir {cache.cache_dir}")
+            os.makedirs(cache.cache_dir)
+    for runtime in filter(None, CALIBRATE_RUNTIMES.split(',')):
+        kind, exe = runtime.split('=')
+        runtimes.calibrate(kind, exe)
+
+
+def _queued(trace, stage):
+    if trace is not None and trace.queued_at is not None:
+        trace.record('queue', trace.queued_at, time.time(), trace.root_id, stage=stage)
+
+
+def compile_stage(judger, compiler, verdict_key=None):
+    # None once compiled, or the final result of a submission that never needs the run pool
+    slot = acquire_core()
+    _queued(judger.trace, 'compile')
     try:
-        res = {"submit_id": judger.submit_id}
-        try:
-            compiler()
-        except CompileError as ce:
-            res['err'] = "CE"
-            res['info'] = ce.message
-            return res
-        try:
-            res['results'] = judger()
-            if len(res['results']) == 0:
-                res["err"] = "ERR"
-                res['info'] = "No Data"
-                logging.warning(f"No data: {res}")
-                print(res, "No data ERROR")
-        except Exception as e:
-            logging.error(str(e))
-            res['err'] = "ERR"
-            res['info'] = "System Broken"
-        return res
-    except KeyboardInterrupt:
-        pass
+        if verdict_key is not None:
+            cached = verdict_cache.get(verdict_key)
+            if cached is not None:
+                return dict(cached, submit_id=judger.submit_id, cached=True)
+        with tracing.activate(judger.trace):
+            try:
+                with tracing.span('compile') as compile_span:
+                    try:
+                        compile_cache(compiler)
+                    finally:
+                        compile_span.set(cached=compiler.result is None)
+            except CompileError as ce:
+                return {"submit_id": judger.submit_id, 'err': "CE", 'info': ce.message}
+        return None
+    finally:
+        release_core(slot)
 
 
-def send_callback(run_result):
+def run(judger, problem_id=None, verdict_key=None):
+    slot = acquire_core()
+    _queued(judger.trace, 'run')
     try:
-        for i in range(5):
+        with tracing.activate(judger.trace):
+            res = {"submit_id": judger.submit_id}
             try:
-                if i > 0:
-                    logging.info("http retry...")
-                headers = {'Content-Type': 'application/json'}
-                with requests.post(OJ_BACKEND_CALLBACK, headers=headers, data=json.dumps(run_result)) as r:
-                    logging.info(json.dumps(run_result))
-                    assert r.content.decode('utf-8') == 'success'
-                    return
+                with data_cache.resolve(judger.data_dir, judger.manifest, problem_id) as judger.data_dir:
+                    res['results'] = judger()
+                if len(res['results']) == 0:
+                    res["err"] = "ERR"
+                    res['info'] = "No Data"
+                    logging.warning(f"No data: {res}")
+                    print(res, "No data ERROR")
+                else:
+                    res.update(judger.scoring(res['results']))
+                    if verdict_key is not None and reproducible(res):
+                        verdict_cache.put(verdict_key, {k: v for k, v in res.items() if k != 'submit_id'})
             except Exception as e:
-                logging.error("callback failed:" + str(e))
-                sleep(10)
+                logging.error(str(e))
+                res['err'] = "ERR"
+                res['info'] = "System Broken"
+            return res
     except KeyboardInterrupt:
         pass
+    finally:
+        release_core(slot)
 
 
 def callback(run_result):
-    network_pool.apply_async(send_callback, (run_result,))
+    if run_result is not None:
+        VERDICT_TOTAL.inc(verdict_name(run_result))
+        trace = tracer.get(run_result.get('submit_id'))
+        if trace is not None:
+            trace.callback_at = time.time()
+        dispatcher.submit(run_result)
+
+
+def delivered(run_result, attempts=0):
+    # the backend has the result, the judge dir can go
+    workspaces.release(run_result.get('submit_id'), run_result)
+    trace = tracer.pop(run_result.get('submit_id'))
+    if trace is not None:
+        if trace.callback_at is not None:
+            trace.record('callback', trace.callback_at, time.time(), trace.root_id, retries=attempts)
+        trace.finish(verdict=verdict_name(run_result), score=run_result.get('score'),
+                     cached=bool(run_result.get('cached')))
 
 @app.route('/info')
 def sys_info():
     d={
-        'cpu':psutil.cpu_count()
+        'cpu':psutil.cpu_count(),
+        'node': node_info(),
+        'compile_cache': compile_cache.stats(),
+        'data_cache': data_cache.stats(),
+        'verdict_cache': verdict_cache.stats(),
+        'workspaces': workspaces.stats(),
+        'callback_backlog': dispatcher.backlog()
     }
+    if cluster_queue is not None:
+        d['cluster'] = cluster_queue.stats()
     return json.dumps(d)
 
+@app.route('/trace/<submit_id>')
+def trace_view(submit_id):
+    timeline = tracer.timeline(submit_id)
+    if timeline is None:
+        return "no trace", 404
+    return json.dumps(timeline), 200, {'Content-Type': 'application/json'}
+
+
+@app.route('/queue')
+def queue_info():
+    return json.dumps(scheduler.stats())
+
+
+@app.route('/metrics')
+def metrics():
+    return exposition(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
 @app.route('/favicon.ico')
 @app.route('/ping')
 def ping():
@@ -135,35 +274,115 @@ def login():
     '''
 
 
-@app.route('/judge', methods=['POST'])
-def judge():
-    data = request.json
-    logging.info(f"recieve{data}")
+def prepare_job(data):
+    # write the source into its judge directory, the compile and run half of a judge job
     submit_id = data['submit_id']
     problem_id = data['problem_id']
     logging.info(f"run problem id: {problem_id}")
     source = data['source']
-    judge_dir = os.path.join(TMP_DIR, str(submit_id))  # temp directory for running
-    data_dir = os.path.join(BASE_DIR, str(problem_id))  # standard input output file, read only
-    if os.path.exists(judge_dir):
-        shutil.rmtree(judge_dir)
-    os.makedirs(judge_dir)
-    with open(os.path.join(judge_dir, data['src']), mode='w+', encoding='utf-8') as f:
-        f.write(source)
-    compiler = Compiler(data['compile_command'], judge_dir)
-    spj = False
-    if os.path.exists(os.path.join(data_dir, "spj")) or \
-            os.path.exists(os.path.join(data_dir, "spj.py")):
-        spj = True
-    judger = Judger(data['max_cpu_time'],
-                    data['max_memory'],
-                    data['run_command'],
-                    data.get('seccomp_rule'),
-                    judge_dir,
-                    1 if data.get('memory_limit_check_only') else 0
-                    , data_dir, submit_id, spj)
-    judge_pool.apply_async(run, (judger, compiler), callback=callback)
-    return "success"
+    trace = tracer.start(submit_id, bool(data.get('trace')))
+    prepared_at = time.time()
+    # standard input output file, read only; the version current now, an upload does not change it under us
+    data_dir = data_store.resolve(problem_id)
+    # temp directory for running, kept after judging for debug submissions
+    judge_dir = workspaces.acquire(submit_id, bool(data.get('debug') or data.get('keep_output')))
+    try:
+        with open(os.path.join(judge_dir, data['src']), mode='w+', encoding='utf-8') as f:
+            f.write(source)
+        compiler = Compiler(data['compile_command'], judge_dir,
+                            CompileCache.key(source, data['src'], data['compile_command']))
+        manifest = load_manifest(data_dir)
+        spj = manifest['spj'] is not None
+        parallelism = min(int(data.get('parallel_cases', 1)), MAX_CASE_PARALLELISM)
+        judger = Judger(data['max_cpu_time'],
+                        data['max_memory'],
+                        data['run_command'],
+                        data.get('seccomp_rule'),
+                        judge_dir,
+                        1 if data.get('memory_limit_check_only') else 0
+                        , data_dir, submit_id, spj, parallelism,
+                        bool(data.get('report_diff')), manifest,
+                        bool(data.get('stream_output', STREAM_OUTPUT)), bool(data.get('keep_output')),
+                        runtimes.startup(data['run_command']), case_timings, trace)
+    except BaseException:
+        # a malformed request must not keep its workspace slot
+        workspaces.release(submit_id, path=judge_dir)
+        tracer.pop(submit_id)
+        raise
+    if trace is not None:
+        trace.record('prepare', prepared_at, time.time(), trace.root_id, problem_id=problem_id,
+                     version=manifest['version'], workspace=judge_dir)
+    return judger, compiler
+
+
+def submit_local(data, on_result=callback, on_error=None):
+    judger, compiler = prepare_job(data)
+
+    def failed(error):
+        # no result will be delivered for it
+        workspaces.release(judger.submit_id, path=judger.judge_dir)
+        tracer.pop(judger.submit_id)
+        if on_error is not None:
+            on_error(error)
+
+    def queued():
+        if judger.trace is not None:
+            judger.trace.queued_at = time.time()
+
+    try:
+        verdict_key = None
+        # rerun asks for a real judge, e.g. to measure a timing sensitive submission again
+        if verdict_cache.enabled and judger.manifest['version'] and \
+                not (data.get('rerun') or data.get('debug') or data.get('keep_output')):
+            runner = [_judger.VERSION, 'cgroup' if runtimes.cgroup else 'rlimit']
+            verdict_key = VerdictCache.key(data, judger.manifest['version'], judger.startup, runner)
+        queued()
+        scheduler.submit((compile_stage, (judger, compiler, verdict_key)),
+                         (run, (judger, data['problem_id'], verdict_key)), on_result,
+                         priority=int(data.get('priority', 0)),
+                         key=data.get('tenant', data['problem_id']),
+                         error_callback=failed, on_compiled=queued)
+    except BaseException:
+        # the queue is full or the request is malformed (e.g. its priority), nothing runs for it
+        workspaces.release(judger.submit_id, path=judger.judge_dir)
+        tracer.pop(judger.submit_id)
+        raise
+
+
+def node_info():
+    # what this node advertises to the cluster
+    stats = scheduler.stats()
+    return {
+        'cpu': psutil.cpu_count(),
+        'workers': scheduler.workers,
+        'running': stats['running'],
+        'queued': stats['queued'],
+        'load': os.getloadavg()[0],
+    }
+
+
+def accept_job(data):
+    # (body, status, headers) answering a judge request, blocks on the file system
+    if cluster_queue is None and scheduler.full():
+        return "queue full", 503, {'Retry-After': str(RETRY_AFTER)}
+    logging.info(f"recieve{data}")
+    try:
+        if cluster_queue is not None:
+            # any node with an idle worker picks it up, see cluster.ClusterNode
+            cluster_queue.submit(data, priority=int(data.get('priority', 0)),
+                                 key=data.get('tenant', data['problem_id']))
+        else:
+            submit_local(data)
+    except QueueFullError as e:
+        logging.warning(e.message)
+        return "queue full", 503, {'Retry-After': str(RETRY_AFTER)}
+    return "success", 200, {}
+
+
+@app.route('/judge', methods=['POST'])
+def judge():
+    # served by frontend.JudgeHandler under tornado
+    return accept_job(request.json)
 
 
 def allowed_file(filename):
@@ -202,21 +421,39 @@ def check_spj(upload_dir):
     for filename in dir.glob("spj.*"):
         if filename.suffix not in ['.c', '.cpp', '.py']:
             continue
+        # absolute paths, uploads are checked on several threads of one process and so share its cwd
+        source, target = filename.resolve(), filename.resolve().with_suffix('')
         compile_command = {
-            ".c": "/usr/bin/g++ -fno-tree-ch -O2 -Wall -std=c++14 spj.c -lm -o spj",
-            ".cpp": "/usr/bin/g++ -fno-tree-ch -O2 -Wall -std=c++14 spj.cpp -lm -o spj",
-            ".py": "/usr/bin/python3 -m py_compile spj.py"
+            ".c": f"/usr/bin/g++ -fno-tree-ch -O2 -Wall -std=c++14 {source} -lm -o {target}",
+            ".cpp": f"/usr/bin/g++ -fno-tree-ch -O2 -Wall -std=c++14 {source} -lm -o {target}",
+            # spj.pyc is what special_judge runs, saving the compile on every case
+            ".py": f"/usr/bin/python3 -m compileall -q -b {source}"
         }
+        # the previous version's build may be a hard link here, never write through it
+        for output in ("spj", "spj.pyc"):
+            if os.path.exists(os.path.join(upload_dir, output)):
+                os.remove(os.path.join(upload_dir, output))
         compiler = Compiler(compile_command.get(filename.suffix),
                             upload_dir)
         try:
-            compiler()
+            compile_cache(compiler)
         except CompileError as ce:
             return ce.message
         break
     return "ok"
 
 
+def prepare_data(stage_dir):
+    compile_out = check_spj(stage_dir)
+    if compile_out != 'ok':
+        return "compile error:" + compile_out
+    try:
+        read_policy(stage_dir)
+    except ValueError as e:
+        return "policy error:" + str(e)
+    return None
+
+
 @app.route('/upload/<int:post_id>', methods=['GET', 'POST'])
 def upload_view(post_id):
     if session.get('is_login', False) == False:
@@ -227,36 +464,124 @@ def upload_view(post_id):
         print(file.filename)
         suffix = file.filename.split('.')[-1]
         if file and suffix in ['zip']:
-            upload_dir = os.path.join(BASE_DIR, str(post_id))
-            file_name = os.path.join(upload_dir, secure_filename(file.filename))
-            if os.path.exists(upload_dir):
-                shutil.rmtree(upload_dir)
-            os.makedirs(upload_dir)
-            file.save(file_name)
-            unzip_file(file_name, upload_dir)
-            os.remove(file_name)
-            compile_out = check_spj(upload_dir)
-            if compile_out != 'ok':
-                return "compile error:" + compile_out
+            def fill(upload_dir):
+                file_name = os.path.join(upload_dir, secure_filename(file.filename))
+                file.save(file_name)
+                unzip_file(file_name, upload_dir)
+                os.remove(file_name)
+
+            # judges keep reading the old version until the new one is complete
+            try:
+                data_store.publish(post_id, fill, prepare_data)
+            except DataSyncError as e:
+                return e.message
             return redirect('/upload')
         else:
             return "文件格式错误"
     return render_template('upload.html')
 
 
+def authorized():
+    return session.get('is_login', False) or request.headers.get('X-Password') == PASSWORD
+
+
+def authorized_headers(headers):
+    # authorized() for a request tornado serves itself (frontend.DataFileHandler), session cookie included
+    with app.test_request_context(headers=headers):
+        return authorized()
+
+
+def data_api(func):
+    # the incremental upload api, see "Test data" in the README
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not authorized():
+            return "unauthorized", 401
+        try:
+            return func(*args, **kwargs)
+        except DataSyncError as e:
+            return json.dumps({'error': e.message}), 400
+    return wrapper
+
+
+@app.route('/data/<int:problem_id>')
+@data_api
+def data_files(problem_id):
+    manifest = load_manifest(data_store.resolve(problem_id))
+    return json.dumps({'version': manifest['version'],
+                       'files': {name: f['sha256'] for name, f in manifest['files'].items()}})
+
+
+@app.route('/data/<int:problem_id>/stage', methods=['POST'])
+@data_api
+def data_begin(problem_id):
+    options = request.get_json(silent=True) or {}
+    return json.dumps({'stage': data_store.begin(problem_id, bool(options.get('empty')))})
+
+
+@app.route('/data/<int:problem_id>/stage/<stage>/<name>', methods=['PUT', 'DELETE'])
+@data_api
+def data_file(problem_id, stage, name):
+    if request.method == 'DELETE':
+        data_store.delete(problem_id, stage, name)
+        return json.dumps({})
+    return json.dumps(data_store.put(problem_id, stage, name, request.stream, request.headers.get('X-Sha256')))
+
+
+@app.route('/data/<int:problem_id>/stage/<stage>', methods=['DELETE'])
+@data_api
+def data_abort(problem_id, stage):
+    data_store.abort(problem_id, stage)
+    return json.dumps({})
+
+
+@app.route('/data/<int:problem_id>/stage/<stage>/commit', methods=['POST'])
+@data_api
+def data_commit(problem_id, stage):
+    expect = (request.get_json(silent=True) or {}).get('files')
+    manifest = data_store.commit(problem_id, stage, prepare_data, expect)
+    return json.dumps({'version': manifest['version'], 'cases': len(manifest['cases'])})
+
+
 if __name__ == "__main__":
-    judge_pool = multiprocessing.Pool(psutil.cpu_count() + 1)
-    network_pool = multiprocessing.Pool(100)
+    judge_workers = RUN_WORKERS or psutil.cpu_count() + 1
+    compile_workers = COMPILE_WORKERS or max(1, psutil.cpu_count() // 2)
+    cgroups = None
+    if CGROUP_ROOT:
+        # before the pools fork, setting up may move this process to another group
+        cgroups = CgroupSlots(CGROUP_ROOT, sorted(os.sched_getaffinity(0)))
+        if not cgroups.setup():
+            cgroups = None
+        else:
+            runtimes.cgroup = cgroups.path(0)
+    # both pools draw from one budget, a compile holds a core like a test run does;
+    # pinned slots are one per cpu, without them one extra keeps the cores busy
+    core_budget = CoreBudget(len(cgroups.cpus) if cgroups is not None else psutil.cpu_count() + 1)
+    compile_pool = multiprocessing.Pool(compile_workers, initializer=init_worker, initargs=(core_budget, cgroups))
+    judge_pool = multiprocessing.Pool(judge_workers, initializer=init_worker, initargs=(core_budget, cgroups))
+    scheduler = JudgePipeline(JudgeScheduler(compile_pool, compile_workers, COMPILE_QUEUE_LENGTH, 'compile_queue'),
+                              JudgeScheduler(judge_pool, judge_workers, MAX_QUEUE_LENGTH))
+    workspaces = WorkspacePool(TMP_DIR, WORKSPACE_SLOTS or scheduler.workers * 2,
+                               WORKSPACE_RETAIN_SIZE, WORKSPACE_RETAIN_SECONDS)
     try:
         start_up()
-        http_server = HTTPServer(WSGIContainer(app))
+        dispatcher = CallbackDispatcher(OJ_BACKEND_CALLBACK, Outbox(CALLBACK_OUTBOX),
+                                        CALLBACK_CONCURRENCY, CALLBACK_BATCH_SIZE, on_delivered=delivered)
+        dispatcher.start()
+        if CLUSTER_QUEUE:
+            cluster_queue = ClusterQueue(CLUSTER_QUEUE, CLUSTER_NODE, CLUSTER_LEASE, MAX_QUEUE_LENGTH)
+            ClusterNode(cluster_queue, scheduler, submit_local, callback, node_info,
+                        discard=delivered).start()
+            logging.info(f"cluster node {CLUSTER_NODE} on {CLUSTER_QUEUE}")
+        http_server = HTTPServer(make_app(app, accept_job, data_store, authorized_headers,
+                                          ThreadPoolExecutor(INTAKE_THREADS), ThreadPoolExecutor(HTTP_THREADS),
+                                          app.config['MAX_CONTENT_LENGTH'], MAX_DATA_FILE_SIZE))
         http_server.listen(SERVICE_PORT)
         IOLoop.instance().start()
     except KeyboardInterrupt as e:
         pass
     finally:
         IOLoop.instance().stop()
-        judge_pool.close()
-        judge_pool.join()
-        network_pool.close()
-        network_pool.join()
+        for pool in (compile_pool, judge_pool):
+            pool.close()
+            pool.join()
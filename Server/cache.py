@@ -0,0 +1,261 @@
+import contextlib
+import fcntl
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+
+from exception import CompileError
+from testdata import MANIFEST
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(filename)s %(lineno)d %(levelname)s : %(message)s')
+
+
+class DirectoryCache:
+    # size-bounded LRU of directories, an entry's mtime is its last use
+    META = ".meta.json"
+
+    def __init__(self, cache_dir: str, max_size: int):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        # created before the judge pool forks, so every worker shares them
+        self._hits = multiprocessing.Value('L', 0)
+        self._misses = multiprocessing.Value('L', 0)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def stats(self):
+        return {'hits': self._hits.value, 'misses': self._misses.value}
+
+    @staticmethod
+    def _count(counter):
+        with counter.get_lock():
+            counter.value += 1
+
+    def _read_meta(self, entry):
+        with open(os.path.join(entry, self.META), encoding='utf-8') as f:
+            return json.load(f)
+
+    def _publish(self, entry, fill) -> bool:
+        # fill(tmp) copies the content and returns (size, extra meta), the entry appears atomically
+        tmp = f"{entry}.tmp-{os.getpid()}"
+        try:
+            os.makedirs(tmp)
+            size, meta = fill(tmp)
+            meta['size'] = size
+            with open(os.path.join(tmp, self.META), mode='w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            os.rename(tmp, entry)
+        except OSError as e:
+            # another worker stored the same key first
+            logging.info(f"cache store skipped: {e}")
+            shutil.rmtree(tmp, ignore_errors=True)
+            return False
+        return True
+
+    def _remove(self, path) -> bool:
+        shutil.rmtree(path, ignore_errors=True)
+        return True
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                size = self._read_meta(path)['size']
+                mtime = os.path.getmtime(path)
+            except (OSError, ValueError, KeyError):
+                continue
+            entries.append((mtime, size, path))
+            total += size
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_size:
+                break
+            if self._remove(path):
+                total -= size
+
+
+class CompileCache(DirectoryCache):
+
+    @staticmethod
+    def key(source: str, src: str, compile_command: str) -> str:
+        h = hashlib.sha256()
+        for part in (source, src, compile_command):
+            h.update(part.encode('utf-8'))
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def __call__(self, compiler) -> None:
+        if not self.enabled or compiler.cache_key is None:
+            return compiler()
+        entry = os.path.join(self.cache_dir, compiler.cache_key)
+        meta = self._restore(entry, compiler.base_dir)
+        if meta is not None:
+            self._count(self._hits)
+            if meta['error'] is not None:
+                raise CompileError(meta['error'])
+            return
+        self._count(self._misses)
+        before = set(os.listdir(compiler.base_dir))
+        try:
+            compiler()
+        except CompileError as ce:
+            # only keep real diagnostics, not limits hit on a busy host
+            result = compiler.result
+            if result is not None and result['exit_code'] != 0 and result['signal'] == 0:
+                self._store(entry, compiler.base_dir, before, ce.message)
+            raise
+        self._store(entry, compiler.base_dir, before, None)
+
+    def _restore(self, entry, base_dir):
+        try:
+            meta = self._read_meta(entry)
+            for name in meta['files']:
+                src = os.path.join(entry, name)
+                dst = os.path.join(base_dir, name)
+                if os.path.exists(dst):
+                    os.remove(dst)
+                # a copy, not a link: the solution runs in base_dir and could rewrite a shared inode
+                shutil.copy2(src, dst)
+            os.utime(entry)  # mark as recently used
+        except (OSError, ValueError, KeyError):
+            return None
+        return meta
+
+    def _store(self, entry, base_dir, before, error):
+        files = [name for name in os.listdir(base_dir)
+                 if name not in before and os.path.isfile(os.path.join(base_dir, name))]
+
+        def fill(tmp):
+            size = 0
+            for name in files:
+                shutil.copy2(os.path.join(base_dir, name), os.path.join(tmp, name))
+                size += os.path.getsize(os.path.join(tmp, name))
+            return size, {'files': files, 'error': error}
+
+        if self._publish(entry, fill):
+            self._evict()
+
+
+class DataCache(DirectoryCache):
+    # mirror of hot problems' test data on fast local storage (e.g. tmpfs)
+
+    # every judge reading an entry holds a shared lock on it, an entry is only removed under an exclusive one
+    LOCK = ".lock"
+
+    @contextlib.contextmanager
+    def resolve(self, data_dir: str, manifest, problem=None):
+        # the directory to read the test data from, kept in the cache until the block ends
+        entry = self._lookup(data_dir, manifest, problem)
+        pin = self._pin(entry) if entry is not None else None
+        if pin is not None:
+            os.utime(entry)  # mark as recently used
+            self._evict()
+        try:
+            yield entry if pin is not None else data_dir
+        finally:
+            if pin is not None:
+                os.close(pin)
+
+    def _lookup(self, data_dir, manifest, problem):
+        size = sum(f['size'] for f in manifest['files'].values())
+        if not self.enabled or not manifest['version'] or size > self.max_size:
+            return None
+        if problem is None:
+            problem = os.path.basename(os.path.normpath(data_dir))
+        name = f"{problem}-{manifest['version'][:16]}"
+        entry = os.path.join(self.cache_dir, name)
+        if os.path.isdir(entry):
+            self._count(self._hits)
+            return entry
+        self._count(self._misses)
+        # the manifest changed, older copies of this problem are useless now unless still being read
+        for old in os.listdir(self.cache_dir):
+            if old.startswith(f"{problem}-") and old != name and '.tmp-' not in old:
+                self._remove(os.path.join(self.cache_dir, old))
+
+        def fill(tmp):
+            for filename in list(manifest['files']) + [MANIFEST]:
+                shutil.copy2(os.path.join(data_dir, filename), os.path.join(tmp, filename))
+            open(os.path.join(tmp, self.LOCK), mode='w').close()
+            return size, {'version': manifest['version']}
+
+        if not self._publish(entry, fill) and not os.path.isdir(entry):
+            return None
+        return entry
+
+    def _pin(self, entry):
+        # a shared lock on the entry, None if it was removed before we got it
+        lock = os.path.join(entry, self.LOCK)
+        try:
+            fd = os.open(lock, os.O_RDONLY)
+        except OSError:
+            return None
+        fcntl.flock(fd, fcntl.LOCK_SH)
+        try:
+            # removed while we waited, maybe stored again since: only our inode counts
+            pinned = os.stat(lock).st_ino == os.fstat(fd).st_ino
+        except OSError:
+            pinned = False
+        if not pinned:
+            os.close(fd)
+            return None
+        return fd
+
+    def _remove(self, path) -> bool:
+        try:
+            fd = os.open(os.path.join(path, self.LOCK), os.O_RDONLY)
+        except OSError:
+            # already gone, or being removed by another worker
+            shutil.rmtree(path, ignore_errors=True)
+            return True
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            # a judge is still reading it
+            os.close(fd)
+            return False
+        shutil.rmtree(path, ignore_errors=True)
+        os.close(fd)
+        return True
+
+
+class VerdictCache(DirectoryCache):
+    # results of earlier judges, replayed for rejudges and resubmissions of the same code on the same data
+
+    @staticmethod
+    def key(data, version: str, startup=None, runner=None) -> str:
+        # everything the verdict depends on; version fingerprints the test data, policy included,
+        # runner the sandbox build and how it accounts time and memory (cgroup or rlimit)
+        h = hashlib.sha256()
+        for part in (data['source'], data['src'], data['compile_command'], data['run_command'],
+                     data['max_cpu_time'], data['max_memory'], data.get('seccomp_rule'),
+                     bool(data.get('memory_limit_check_only')), bool(data.get('report_diff')), startup, version,
+                     runner):
+            h.update(json.dumps(part).encode('utf-8'))
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def get(self, key):
+        entry = os.path.join(self.cache_dir, key)
+        try:
+            result = self._read_meta(entry)['result']
+            os.utime(entry)  # mark as recently used
+        except (OSError, ValueError, KeyError):
+            self._count(self._misses)
+            return None
+        self._count(self._hits)
+        return result
+
+    def put(self, key, result) -> None:
+        def fill(tmp):
+            return len(json.dumps(result)), {'result': result}
+
+        if self._publish(os.path.join(self.cache_dir, key), fill):
+            self._evict()
@@ -0,0 +1,134 @@
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+
+import aiohttp
+
+from metrics import STAGE_SECONDS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(filename)s %(lineno)d %(levelname)s : %(message)s')
+
+
+class Outbox:
+    # results the backend has not accepted yet, kept on disk so a restart replays them
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS outbox ("
+                         "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                         "payload TEXT NOT NULL, "
+                         "created REAL NOT NULL)")
+
+    def append(self, result) -> int:
+        with self._lock:
+            cursor = self._db.execute("INSERT INTO outbox (payload, created) VALUES (?, ?)",
+                                      (json.dumps(result), time.time()))
+            return cursor.lastrowid
+
+    def remove(self, ids) -> None:
+        with self._lock:
+            self._db.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids])
+
+    def pending(self):
+        with self._lock:
+            rows = self._db.execute("SELECT id, payload FROM outbox ORDER BY id").fetchall()
+        return [(row_id, json.loads(payload)) for row_id, payload in rows]
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+
+class _Delivery:
+    def __init__(self, row_id, result):
+        self.row_id = row_id
+        self.result = result
+        self.attempts = 0
+
+
+class CallbackDispatcher:
+    '''
+    posts judge results to the backend from the event loop, with a shared keep-alive
+    connection pool, at most `concurrency` requests in flight and exponential backoff
+    '''
+
+    def __init__(self, url: str, outbox: Outbox, concurrency: int = 16, batch_size: int = 1,
+                 max_backoff: float = 300, on_delivered=None):
+        self.url = url
+        self.on_delivered = on_delivered  # on_delivered(result, retries) once the backend accepted it
+        self.outbox = outbox
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        self._loop = None
+        self._queue = None
+        self._session = None
+
+    def start(self, loop=None) -> None:
+        self._loop = loop or asyncio.get_event_loop()
+        self._queue = asyncio.Queue()
+        pending = self.outbox.pending()
+        if pending:
+            logging.info(f"replay {len(pending)} undelivered results")
+        for row_id, result in pending:
+            self._queue.put_nowait(_Delivery(row_id, result))
+        self._loop.create_task(self._serve())
+
+    def submit(self, run_result) -> None:
+        # called from the judge pool's result thread
+        row_id = self.outbox.append(run_result)
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, _Delivery(row_id, run_result))
+
+    def backlog(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _serve(self):
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        self._session = aiohttp.ClientSession(connector=connector)
+        await asyncio.gather(*[self._worker() for _ in range(self.concurrency)])
+
+    async def _worker(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await self._deliver(batch)
+
+    async def _deliver(self, batch):
+        if self.batch_size > 1:
+            payload = [delivery.result for delivery in batch]
+        else:
+            payload = batch[0].result
+        try:
+            headers = {'Content-Type': 'application/json'}
+            with STAGE_SECONDS.time('callback'):
+                async with self._session.post(self.url, headers=headers, data=json.dumps(payload)) as r:
+                    body = await r.text()
+            assert body == 'success', f"backend answered {r.status}: {body[:100]}"
+        except Exception as e:
+            logging.error("callback failed:" + str(e))
+            for delivery in batch:
+                self._retry(delivery)
+            return
+        logging.info(json.dumps(payload))
+        self.outbox.remove([delivery.row_id for delivery in batch])
+        if self.on_delivered is not None:
+            for delivery in batch:
+                # a failing hook must not take this worker down with it
+                try:
+                    self.on_delivered(delivery.result, delivery.attempts)
+                except Exception:
+                    logging.exception(f"after delivering submit {delivery.result.get('submit_id')}")
+
+    def _retry(self, delivery):
+        # jitter keeps a recovering backend from being hit by every result at once
+        delay = min(self.max_backoff, 2 ** delivery.attempts) * random.uniform(0.5, 1)
+        delivery.attempts += 1
+        logging.info(f"http retry submit {delivery.result.get('submit_id')} in {delay:.1f}s")
+        self._loop.call_later(delay, self._queue.put_nowait, delivery)
@@ -0,0 +1,91 @@
+import errno
+import logging
+import os
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(filename)s %(lineno)d %(levelname)s : %(message)s')
+
+CONTROLLERS = ('cpuset', 'memory')
+SERVER = "server"
+
+
+def _read(path, name) -> str:
+    with open(os.path.join(path, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def _write(path, name, value) -> None:
+    with open(os.path.join(path, name), mode='w', encoding='utf-8') as f:
+        f.write(value)
+
+
+class CgroupSlots:
+    '''
+    a cgroup v2 group per core slot of the CoreBudget, pinned to one cpu. the runner gives every run a
+    group of its own below its slot's, which counts user + system time and the memory of all its
+    processes, page cache of the files it wrote or read left out, and bounds it with memory.max
+    (see Judger/src/cgroup.c). setup() returns False when the host has no cgroup v2 with these
+    controllers for us, judging then stays on rlimits
+    '''
+
+    def __init__(self, root: str, cpus):
+        self.root = root
+        self.cpus = list(cpus)
+
+    def path(self, slot) -> str:
+        return os.path.join(self.root, f"slot-{slot}")
+
+    def setup(self) -> bool:
+        try:
+            self._setup()
+        except OSError as e:
+            logging.warning(f"no cgroup slots under {self.root}, judging with rlimits: {e}")
+            return False
+        logging.info(f"{len(self.cpus)} cgroup slots under {self.root} on cpus {self.cpus}")
+        return True
+
+    def _setup(self):
+        parent = os.path.dirname(self.root)
+        missing = set(CONTROLLERS) - set(_read(parent, 'cgroup.controllers').split())
+        if missing:
+            raise OSError(f"controllers {', '.join(sorted(missing))} are not delegated to {parent}")
+        os.makedirs(self.root, exist_ok=True)
+        try:
+            self._delegate(parent)
+        except OSError as e:
+            if e.errno != errno.EBUSY:
+                raise
+            # a group with processes can not hand controllers down, e.g. the root group of a container
+            self._move_processes(parent)
+            self._delegate(parent)
+        self._delegate(self.root)
+        for slot, cpu in enumerate(self.cpus):
+            path = self.path(slot)
+            os.makedirs(path, exist_ok=True)
+            for entry in os.scandir(path):
+                if entry.is_dir() and entry.name.startswith('run-'):
+                    self._remove(entry.path)
+            _write(path, 'cpuset.cpus', str(cpu))
+            _write(path, 'cgroup.subtree_control', '+memory')
+
+    @staticmethod
+    def _delegate(path):
+        _write(path, 'cgroup.subtree_control', ' '.join('+' + c for c in CONTROLLERS))
+
+    def _move_processes(self, parent):
+        server = os.path.join(self.root, SERVER)
+        os.makedirs(server, exist_ok=True)
+        for pid in _read(parent, 'cgroup.procs').split():
+            try:
+                _write(server, 'cgroup.procs', pid)
+            except ProcessLookupError:
+                pass  # gone meanwhile
+        logging.info(f"moved the processes of {parent} to {server}")
+
+    @staticmethod
+    def _remove(path):
+        # a group left by a runner that died, whatever still runs in it is killed first
+        try:
+            _write(path, 'cgroup.kill', '1')
+            os.rmdir(path)
+        except OSError as e:
+            logging.warning(f"can not remove {path}: {e}")
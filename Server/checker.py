@@ -0,0 +1,81 @@
+import logging
+import os
+import threading
+
+from fifo import FifoReader, make_fifo, open_writer
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(filename)s %(lineno)d %(levelname)s : %(message)s')
+
+
+class CheckerSession:
+    '''
+    one sandboxed special judge serving every case of a submission:
+    for each case it reads "<input path> <user output path>\\n" from stdin
+    and answers with one line, 0 for AC, anything else for WA
+    '''
+
+    def __init__(self, judge_dir: str, run_checker):
+        self.requests_path = os.path.join(judge_dir, "spj.requests")
+        self.replies_path = os.path.join(judge_dir, "spj.replies")
+        make_fifo(self.requests_path)
+        make_fifo(self.replies_path)
+        self.result = None
+        self.usable = True
+        self._lock = threading.Lock()
+        self._buffer = b""
+        self._writer = None
+        # open our read end first, so the checker never blocks opening its stdout
+        self._reader = FifoReader(self.replies_path, self.alive)
+        self._thread = threading.Thread(target=self._serve, args=(run_checker,), daemon=True)
+        self._thread.start()
+
+    def _serve(self, run_checker):
+        self.result = run_checker(self.requests_path, self.replies_path)
+
+    def alive(self) -> bool:
+        return self._thread.is_alive()
+
+    def check(self, input_path: str, output_path: str, timeout: float):
+        # True/False is the verdict, None means the checker broke and the case has to be judged again
+        with self._lock:
+            if not self.usable:
+                return None
+            try:
+                if self._writer is None:
+                    self._writer = open_writer(self.requests_path, self.alive)
+                    if self._writer is None:
+                        raise OSError("checker exited before reading")
+                os.write(self._writer, f"{input_path} {output_path}\n".encode('utf-8'))
+                line = self._readline(timeout)
+            except OSError as e:
+                logging.warning(f"checker session failed: {e}")
+                line = None
+            if line is None:
+                self.usable = False
+                return None
+            try:
+                return int(line) == 0
+            except ValueError:
+                return False
+
+    def _readline(self, timeout):
+        while b"\n" not in self._buffer:
+            data = self._reader.read(4096, timeout)
+            if not data:
+                return None
+            self._buffer += data
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return line
+
+    def close(self) -> None:
+        if self._writer is None and self.alive():
+            self._writer = open_writer(self.requests_path, self.alive)
+        if self._writer is not None:
+            os.close(self._writer)  # EOF tells the checker to exit
+            self._writer = None
+        # a stuck checker is left to the sandbox's real time limit
+        self._thread.join(None if self.usable else 0)
+        self._reader.close()
+        for path in (self.requests_path, self.replies_path):
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,219 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from functools import partial
+
+from exception import QueueFullError
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(filename)s %(lineno)d %(levelname)s : %(message)s')
+
+
+class ClusterQueue:
+    '''
+    judge jobs shared by every node through one sqlite database: a node leases jobs, keeps the
+    leases alive while it judges them and deletes a job once it is done. a lease that is not
+    renewed in time (the node died) goes back to the queue
+    '''
+
+    def __init__(self, path: str, node_id: str, lease_seconds: float = 60, max_queue: int = 1000,
+                 max_attempts: int = 3):
+        self.node_id = node_id
+        self.lease_seconds = lease_seconds
+        self.max_queue = max_queue
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("CREATE TABLE IF NOT EXISTS jobs ("
+                         "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                         "payload TEXT NOT NULL, "
+                         "priority INTEGER NOT NULL, "
+                         "key TEXT NOT NULL, "
+                         "created REAL NOT NULL, "
+                         "node TEXT, "
+                         "lease_until REAL, "
+                         "attempts INTEGER NOT NULL DEFAULT 0)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_waiting ON jobs (node, priority, id)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS nodes ("
+                         "id TEXT PRIMARY KEY, "
+                         "info TEXT NOT NULL, "
+                         "heartbeat REAL NOT NULL)")
+
+    def _transaction(self, func):
+        # BEGIN IMMEDIATE takes the write lock up front, so two nodes never lease the same job
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = func()
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return result
+
+    def submit(self, data, priority=0, key=None) -> int:
+        def insert():
+            queued = self._db.execute("SELECT COUNT(*) FROM jobs WHERE node IS NULL").fetchone()[0]
+            if queued >= self.max_queue:
+                raise QueueFullError(f"cluster queue is full ({queued} waiting)")
+            return self._db.execute("INSERT INTO jobs (payload, priority, key, created) VALUES (?, ?, ?, ?)",
+                                    (json.dumps(data), priority, str(key), time.time())).lastrowid
+
+        return self._transaction(insert)
+
+    def lease(self, limit: int):
+        # [(job id, request data)], higher priority first, then keys with fewer jobs being judged
+        if limit <= 0:
+            return []
+
+        def take():
+            # one at a time, each lease changes which key is least served
+            jobs = []
+            for _ in range(limit):
+                row = self._db.execute(
+                    "SELECT id, payload FROM jobs AS j WHERE node IS NULL "
+                    "ORDER BY priority DESC, "
+                    "(SELECT COUNT(*) FROM jobs WHERE key = j.key AND node IS NOT NULL), id "
+                    "LIMIT 1").fetchone()
+                if row is None:
+                    break
+                self._db.execute("UPDATE jobs SET node = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                                 (self.node_id, time.time() + self.lease_seconds, row[0]))
+                jobs.append((row[0], json.loads(row[1])))
+            return jobs
+
+        return self._transaction(take)
+
+    def renew(self, job_ids) -> None:
+        if not job_ids:
+            return
+        with self._lock:
+            self._db.executemany("UPDATE jobs SET lease_until = ? WHERE id = ? AND node = ?",
+                                 [(time.time() + self.lease_seconds, job_id, self.node_id) for job_id in job_ids])
+
+    def release(self, job_id):
+        # give a job back, e.g. when it could not be started here. a job leased max_attempts times is
+        # dropped instead and its request data returned, so it is reported rather than retried forever
+        def give_back():
+            row = self._db.execute("SELECT payload, attempts FROM jobs WHERE id = ? AND node = ?",
+                                   (job_id, self.node_id)).fetchone()
+            if row is None:
+                return None
+            if row[1] >= self.max_attempts:
+                self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+                return json.loads(row[0])
+            self._db.execute("UPDATE jobs SET node = NULL, lease_until = NULL WHERE id = ?", (job_id,))
+            return None
+
+        return self._transaction(give_back)
+
+    def complete(self, job_id) -> bool:
+        # False if the job is gone, its result has been reported by another node already
+        with self._lock:
+            return self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,)).rowcount > 0
+
+    def requeue_expired(self):
+        # returns the request data of jobs that lost too many leases, they are dropped from the queue
+        def requeue():
+            now = time.time()
+            dead = self._db.execute("SELECT id, payload FROM jobs WHERE node IS NOT NULL AND lease_until < ? "
+                                    "AND attempts >= ?", (now, self.max_attempts)).fetchall()
+            self._db.executemany("DELETE FROM jobs WHERE id = ?", [(row[0],) for row in dead])
+            requeued = self._db.execute("UPDATE jobs SET node = NULL, lease_until = NULL "
+                                        "WHERE node IS NOT NULL AND lease_until < ?", (now,)).rowcount
+            if requeued:
+                logging.warning(f"requeued {requeued} jobs of lost nodes")
+            return [json.loads(payload) for _, payload in dead]
+
+        return self._transaction(requeue)
+
+    def heartbeat(self, info) -> None:
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO nodes (id, info, heartbeat) VALUES (?, ?, ?)",
+                             (self.node_id, json.dumps(info), time.time()))
+
+    def stats(self):
+        with self._lock:
+            queued, leased = self._db.execute(
+                "SELECT COUNT(*) - COUNT(node), COUNT(node) FROM jobs").fetchone()
+            rows = self._db.execute("SELECT id, info, heartbeat FROM nodes WHERE heartbeat > ?",
+                                    (time.time() - self.lease_seconds,)).fetchall()
+        return {
+            'queued': queued,
+            'leased': leased,
+            'nodes': {node_id: dict(json.loads(info), heartbeat=round(heartbeat, 3))
+                      for node_id, info, heartbeat in rows},
+        }
+
+
+class ClusterNode:
+    '''
+    leases jobs from the cluster queue whenever the local judge pool has an idle worker,
+    keeps their leases alive while they run and reports each result once
+    '''
+
+    def __init__(self, queue: ClusterQueue, scheduler, submit, deliver, info, poll_interval: float = 1,
+                 discard=None):
+        self.queue = queue
+        self.scheduler = scheduler
+        self.submit = submit  # submit(data, callback, error_callback) starts a job on the local pool
+        self.deliver = deliver  # deliver(result) sends a result to the backend
+        self.info = info  # info() -> what the node advertises
+        self.discard = discard  # discard(result) for a result another node reported first
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._running = set()
+
+    def start(self) -> None:
+        threading.Thread(target=self._loop, daemon=True).start()
+
+    def _loop(self):
+        while True:
+            try:
+                self._tick()
+            except Exception as e:
+                logging.error(f"cluster node: {e}")
+            time.sleep(self.poll_interval)
+
+    def _tick(self):
+        with self._lock:
+            running = list(self._running)
+        self.queue.renew(running)
+        self.queue.heartbeat(dict(self.info(), leased=len(running)))
+        for data in self.queue.requeue_expired():
+            logging.error(f"submit {data.get('submit_id')} lost {self.queue.max_attempts} judge nodes")
+            self.deliver({'submit_id': data.get('submit_id'), 'err': 'ERR', 'info': 'Judge Node Lost'})
+        stats = self.scheduler.stats()
+        idle = stats['workers'] - stats['running'] - stats['queued']
+        for job_id, data in self.queue.lease(idle):
+            with self._lock:
+                self._running.add(job_id)
+            try:
+                self.submit(data, partial(self._done, job_id), partial(self._failed, job_id))
+            except Exception as e:
+                logging.error(f"can not start job {job_id}: {e}")
+                self._give_back(job_id, e)
+
+    def _forget(self, job_id):
+        with self._lock:
+            self._running.discard(job_id)
+
+    def _done(self, job_id, result):
+        self._forget(job_id)
+        if self.queue.complete(job_id):
+            self.deliver(result)
+        else:
+            logging.warning(f"job {job_id} was judged elsewhere, result dropped")
+            if self.discard is not None:
+                self.discard(result)
+
+    def _failed(self, job_id, error):
+        self._give_back(job_id, error)
+
+    def _give_back(self, job_id, error):
+        self._forget(job_id)
+        data = self.queue.release(job_id)
+        if data is not None:
+            logging.error(f"submit {data.get('submit_id')} failed {self.queue.max_attempts} times: {error}")
+            self.deliver({'submit_id': data.get('submit_id'), 'err': 'ERR', 'info': str(error)})
@@ -0,0 +1,169 @@
+import hashlib
+
+CHUNK_SIZE = 64 * 1024
+# bytes str.strip() removes inside a line, line ends are handled apart
+WHITESPACE = b" \t\x0b\x0c\x1c\x1d\x1e\x1f"
+# longer blank runs are kept as a digest so memory stays bounded
+MAX_PENDING_WHITESPACE = 4096
+
+
+class _Normalizer:
+    # turns raw output into "line.strip() + \n" for every line readlines() would return,
+    # with \r, \n and \r\n as line ends, one chunk at a time
+
+    def __init__(self):
+        self._line_open = False
+        self._at_start = True
+        self._skip_lf = False
+        self._pending = b""
+        self._pending_digest = None
+        self._pending_length = 0
+
+    def feed(self, data: bytes) -> bytes:
+        if self._skip_lf and data[:1] == b"\n":
+            data = data[1:]
+        self._skip_lf = False
+        if not data:
+            return b""
+        self._skip_lf = data[-1:] == b"\r"
+        parts = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n").split(b"\n")
+        out = []
+        for part in parts[:-1]:
+            self._add(part, out)
+            out.append(b"\n")
+            self._reset()
+        if parts[-1]:
+            self._line_open = True
+            self._add(parts[-1], out)
+        return b"".join(out)
+
+    def finish(self) -> bytes:
+        if self._line_open:
+            self._reset()
+            return b"\n"
+        return b""
+
+    def _add(self, part, out):
+        if self._at_start:
+            part = part.lstrip(WHITESPACE)
+            if not part:
+                return
+            self._at_start = False
+        content = part.rstrip(WHITESPACE)
+        if content:
+            self._flush_pending(out)
+            out.append(content)
+        self._hold(part[len(content):])
+
+    def _hold(self, blank):
+        if not blank:
+            return
+        self._pending_length += len(blank)
+        if self._pending_digest is not None:
+            self._pending_digest.update(blank)
+        elif self._pending_length > MAX_PENDING_WHITESPACE:
+            self._pending_digest = hashlib.sha256(self._pending + blank)
+            self._pending = b""
+        else:
+            self._pending += blank
+
+    def _flush_pending(self, out):
+        if self._pending_digest is not None:
+            # a marker can never equal real whitespace, and equal runs give equal markers
+            out.append(b"\0" + self._pending_digest.digest() + str(self._pending_length).encode() + b"\0")
+        elif self._pending:
+            out.append(self._pending)
+        self._pending = b""
+        self._pending_digest = None
+        self._pending_length = 0
+
+    def _reset(self):
+        self._line_open = False
+        self._at_start = True
+        self._pending = b""
+        self._pending_digest = None
+        self._pending_length = 0
+
+
+class OutputComparator:
+    # compares output fed in chunks against an answer file, stopping at the first difference
+
+    def __init__(self, answer_path: str, chunk_size: int = CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.difference = None  # (line, column) of the first difference, 1-based
+        self._answer = open(answer_path, 'rb')
+        self._answer_done = False
+        self._expected = _Normalizer()
+        self._actual = _Normalizer()
+        self._buffer = b""
+        self._line = 1
+        self._column = 1
+
+    def feed(self, data: bytes) -> bool:
+        if self.difference is None:
+            self._match(self._actual.feed(data))
+        return self.difference is None
+
+    def finish(self) -> bool:
+        if self.difference is None and self._match(self._actual.finish()):
+            # the answer has to end here as well
+            self._fill()
+            if self._buffer:
+                self.difference = (self._line, self._column)
+        self.close()
+        return self.difference is None
+
+    def close(self) -> None:
+        self._answer.close()
+
+    def _match(self, actual: bytes) -> bool:
+        offset = 0
+        while offset < len(actual):
+            if not self._buffer:
+                self._fill()
+                if not self._buffer:
+                    self.difference = (self._line, self._column)
+                    return False
+            n = min(len(self._buffer), len(actual) - offset)
+            expected = self._buffer[:n]
+            if expected != actual[offset:offset + n]:
+                i = 0
+                while expected[i] == actual[offset + i]:
+                    i += 1
+                self._advance(expected[:i])
+                self.difference = (self._line, self._column)
+                return False
+            self._advance(expected)
+            self._buffer = self._buffer[n:]
+            offset += n
+        return True
+
+    def _fill(self):
+        while not self._buffer and not self._answer_done:
+            data = self._answer.read(self.chunk_size)
+            if data:
+                self._buffer = self._expected.feed(data)
+            else:
+                self._buffer = self._expected.finish()
+                self._answer_done = True
+
+    def _advance(self, matched: bytes):
+        lines = matched.count(b"\n")
+        if lines:
+            self._line += lines
+            self._column = len(matched) - matched.rfind(b"\n")
+        else:
+            self._column += len(matched)
+
+
+def first_difference(answer_path: str, output_path: str, chunk_size: int = CHUNK_SIZE):
+    comparator = OutputComparator(answer_path, chunk_size)
+    try:
+        with open(output_path, 'rb') as f:
+            data = f.read(chunk_size)
+            while data and comparator.feed(data):
+                data = f.read(chunk_size)
+        comparator.finish()
+    finally:
+        comparator.close()
+    return comparator.difference
@@ -0,0 +1,192 @@
+import hashlib
+import logging
+import os
+import shutil
+import time
+import uuid
+
+from exception import DataSyncError
+from testdata import MANIFEST, write_manifest
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(filename)s %(lineno)d %(levelname)s : %(message)s')
+
+VERSIONS = ".versions"
+
+
+class StagedFile:
+    # written to a temp file and renamed over the old hard link at commit, never written through it
+
+    def __init__(self, stage_dir: str, name: str):
+        self.name = name
+        self.path = os.path.join(stage_dir, name)
+        self.tmp = os.path.join(stage_dir, f".{name}.{os.getpid()}.{uuid.uuid4().hex[:8]}")
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._file = open(self.tmp, mode='wb')
+
+    def write(self, chunk: bytes) -> None:
+        self._hash.update(chunk)
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def commit(self, sha256=None):
+        self._file.close()
+        if sha256 is not None and self._hash.hexdigest() != sha256.lower():
+            raise DataSyncError(f"{self.name}: sha256 is {self._hash.hexdigest()}, expected {sha256}")
+        os.rename(self.tmp, self.path)
+        return {'size': self.size, 'sha256': self._hash.hexdigest()}
+
+    def abort(self) -> None:
+        # safe after commit and more than once
+        self._file.close()
+        if os.path.exists(self.tmp):
+            os.remove(self.tmp)
+
+
+class DataStore:
+    '''
+    versioned test data: BASE_DIR/<problem> is a symlink to BASE_DIR/.versions/<problem>/<n>.
+    an update is staged in a new directory seeded with hard links of the current files, only changed
+    files are written, and the symlink is flipped at commit. a judge resolves the link once, so it
+    keeps reading the version it started with; superseded versions are removed after `retain` seconds
+    '''
+
+    def __init__(self, base_dir: str, retain: float = 60 * 60):
+        self.base_dir = base_dir
+        self.retain = retain
+
+    def path(self, problem) -> str:
+        return os.path.join(self.base_dir, str(problem))
+
+    def resolve(self, problem) -> str:
+        # the directory of the current version, stable for as long as a judge needs it
+        return os.path.realpath(self.path(problem))
+
+    def _versions_dir(self, problem):
+        return os.path.join(self.base_dir, VERSIONS, str(problem))
+
+    def _stage_dir(self, problem, stage):
+        if not stage or os.path.basename(stage) != stage or stage.startswith('.'):
+            raise DataSyncError(f"bad stage {stage}")
+        path = os.path.join(self._versions_dir(problem), f"stage-{stage}")
+        if not os.path.isdir(path):
+            raise DataSyncError(f"no stage {stage} for problem {problem}")
+        return path
+
+    @staticmethod
+    def _check_name(name):
+        if not name or os.path.basename(name) != name or name.startswith('.') or name == MANIFEST:
+            raise DataSyncError(f"bad file name {name}")
+
+    def begin(self, problem, empty=False) -> str:
+        # a stage holds the next version, unchanged files are hard links into the current one
+        stage = uuid.uuid4().hex
+        stage_dir = os.path.join(self._versions_dir(problem), f"stage-{stage}")
+        os.makedirs(stage_dir)
+        current = self.resolve(problem)
+        if not empty and os.path.isdir(current):
+            for name in os.listdir(current):
+                src = os.path.join(current, name)
+                if name != MANIFEST and os.path.isfile(src):
+                    os.link(src, os.path.join(stage_dir, name))
+        return stage
+
+    def open(self, problem, stage, name):
+        # a file of the stage written chunk by chunk, see StagedFile
+        self._check_name(name)
+        return StagedFile(self._stage_dir(problem, stage), name)
+
+    def put(self, problem, stage, name, stream, sha256=None, chunk_size=1024 * 1024):
+        # stream is read in chunks, a file never sits in memory
+        staged = self.open(problem, stage, name)
+        try:
+            for chunk in iter(lambda: stream.read(chunk_size), b""):
+                staged.write(chunk)
+            return staged.commit(sha256)
+        finally:
+            staged.abort()
+
+    def delete(self, problem, stage, name) -> None:
+        self._check_name(name)
+        path = os.path.join(self._stage_dir(problem, stage), name)
+        if not os.path.isfile(path):
+            raise DataSyncError(f"no file {name}")
+        os.remove(path)
+
+    def abort(self, problem, stage) -> None:
+        shutil.rmtree(self._stage_dir(problem, stage))
+
+    def commit(self, problem, stage, prepare=None, expect=None):
+        '''
+        prepare(stage_dir) may compile the special judge and returns an error message or None.
+        expect, {name: sha256}, is what the client believes the new version holds
+        '''
+        stage_dir = self._stage_dir(problem, stage)
+        if prepare is not None:
+            error = prepare(stage_dir)
+            if error is not None:
+                raise DataSyncError(error)
+        manifest = write_manifest(stage_dir)
+        if expect is not None:
+            got = {name: f['sha256'] for name, f in manifest['files'].items()}
+            missing = sorted(name for name in expect if got.get(name) != expect[name])
+            if missing:
+                raise DataSyncError(f"files differ from the expected version: {', '.join(missing)}")
+        version_dir = self._claim_version(problem, stage_dir)
+        self._flip(problem, version_dir)
+        self._retire(problem, version_dir)
+        logging.info(f"problem {problem} now at {version_dir}")
+        return manifest
+
+    def publish(self, problem, fill, prepare=None):
+        # a whole new version at once, fill(stage_dir) writes every file
+        stage = self.begin(problem, empty=True)
+        try:
+            fill(self._stage_dir(problem, stage))
+            return self.commit(problem, stage, prepare)
+        except BaseException:
+            shutil.rmtree(self._stage_dir(problem, stage), ignore_errors=True)
+            raise
+
+    def _claim_version(self, problem, stage_dir):
+        versions_dir = self._versions_dir(problem)
+        numbers = [int(name) for name in os.listdir(versions_dir) if name.isdigit()]
+        number = max(numbers, default=0) + 1
+        while True:
+            version_dir = os.path.join(versions_dir, str(number))
+            try:
+                # rename refuses an existing non-empty directory, a concurrent commit took that number
+                os.rename(stage_dir, version_dir)
+                return version_dir
+            except OSError:
+                if not os.path.isdir(version_dir):
+                    raise
+                number += 1
+
+    def _flip(self, problem, version_dir):
+        link = self.path(problem)
+        previous = self.resolve(problem) if os.path.exists(link) else None
+        if os.path.isdir(link) and not os.path.islink(link):
+            # data uploaded before versioning becomes version 0, the problem is missing for one rename
+            previous = os.path.join(self._versions_dir(problem), "0")
+            os.rename(link, previous)
+        tmp = os.path.join(self.base_dir, f".{problem}.link-{os.getpid()}")
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        os.symlink(os.path.relpath(version_dir, self.base_dir), tmp)
+        os.replace(tmp, link)
+        if previous is not None:
+            # a version's mtime is when it stopped being current
+            os.utime(previous)
+
+    def _retire(self, problem, current):
+        # judges that started on an old version finish within `retain`, abandoned stages within a day
+        versions_dir = self._versions_dir(problem)
+        now = time.time()
+        for name in os.listdir(versions_dir):
+            path = os.path.join(versions_dir, name)
+            if path == current or not os.path.isdir(path):
+                continue
+            keep = self.retain if name.isdigit() else 24 * 60 * 60
+            if now - os.path.getmtime(path) > keep:
+                shutil.rmtree(path, ignore_errors=True)
@@ -22,3 +22,11 @@ class JudgeClientError(JudgeServerException):
 
 class JudgeServiceError(JudgeServerException):
     pass
+
+
+class QueueFullError(JudgeServerException):
+    pass
+
+
+class DataSyncError(JudgeServerException):
+    pass
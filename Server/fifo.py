@@ -0,0 +1,62 @@
+import errno
+import os
+import select
+import time
+
+POLL_INTERVAL = 0.01
+
+
+def make_fifo(path: str) -> None:
+    if os.path.exists(path):
+        os.remove(path)
+    os.mkfifo(path, 0o600)
+
+
+def open_writer(path: str, alive):
+    # the sandbox opens its end after fork, wait for it unless the sandbox is already gone
+    while True:
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+            os.set_blocking(fd, True)
+            return fd
+        except OSError as e:
+            if e.errno != errno.ENXIO:
+                raise
+        if not alive():
+            return None
+        time.sleep(POLL_INTERVAL)
+
+
+class FifoReader:
+    # reads a fifo whose writer lives in the sandbox, without blocking forever if it never shows up
+
+    def __init__(self, path: str, alive):
+        self.fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+        self._alive = alive
+        self._poll = select.poll()
+        self._poll.register(self.fd, select.POLLIN)
+
+    def read(self, size: int, timeout=None):
+        # b"" at end of stream, None on timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = 0.1
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    return None
+            if self._poll.poll(wait * 1000):
+                try:
+                    return os.read(self.fd, size)
+                except BlockingIOError:
+                    continue
+            if not self._alive():
+                # the writer may have written right before leaving
+                if self._poll.poll(0):
+                    continue
+                return b""
+
+    def close(self) -> None:
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
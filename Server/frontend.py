@@ -0,0 +1,161 @@
+import json
+import logging
+import tempfile
+
+from tornado.ioloop import IOLoop
+from tornado.web import Application, HTTPError, RequestHandler, stream_request_body
+from tornado.wsgi import WSGIContainer
+
+from exception import DataSyncError
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(filename)s %(lineno)d %(levelname)s : %(message)s')
+
+# request bodies up to this size stay in memory before they go to disk
+SPOOL_SIZE = 1024 * 1024
+
+
+def _call_wsgi(wsgi_app, environ):
+    # (status, headers, body) of one wsgi request, runs on an executor thread
+    started = {}
+    body = []
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = status
+        started['headers'] = headers
+        return body.append
+
+    response = wsgi_app(environ, start_response)
+    try:
+        body.extend(response)
+    finally:
+        if hasattr(response, 'close'):
+            response.close()
+    return started['status'], started['headers'], b"".join(body)
+
+
+class JudgeHandler(RequestHandler):
+    # judge intake: the IOLoop only parses json, writing the judge dir happens on the intake executor
+
+    def initialize(self, accept, executor):
+        self.accept = accept  # accept(data) -> (body, status, headers)
+        self.executor = executor
+
+    async def post(self):
+        try:
+            data = json.loads(self.request.body)
+        except ValueError:
+            raise HTTPError(400)
+        body, status, headers = await IOLoop.current().run_in_executor(self.executor, self.accept, data)
+        self.set_status(status)
+        for name, value in headers.items():
+            self.set_header(name, value)
+        self.finish(body)
+
+
+@stream_request_body
+class DataFileHandler(RequestHandler):
+    # PUT of one test data file, written into the stage as it arrives; the next chunk is only
+    # read once the previous one is on disk
+
+    def initialize(self, data_store, authorize, executor, max_body_size):
+        self.data_store = data_store
+        self.authorize = authorize  # authorize(headers) -> bool, the check of the flask data routes
+        self.executor = executor
+        self.max_body_size = max_body_size
+        self._file = None
+
+    async def prepare(self):
+        if not await IOLoop.current().run_in_executor(self.executor, self.authorize,
+                                                      list(self.request.headers.get_all())):
+            raise HTTPError(401)
+        self.request.connection.set_max_body_size(self.max_body_size)
+        if self.request.method == 'PUT':
+            try:
+                self._file = await IOLoop.current().run_in_executor(self.executor, self.data_store.open,
+                                                                    *self.path_args)
+            except DataSyncError as e:
+                self._error(e)
+
+    def data_received(self, chunk):
+        if self._file is not None:
+            return IOLoop.current().run_in_executor(self.executor, self._file.write, chunk)
+
+    async def put(self, problem_id, stage, name):
+        try:
+            info = await IOLoop.current().run_in_executor(self.executor, self._file.commit,
+                                                          self.request.headers.get('X-Sha256'))
+        except DataSyncError as e:
+            return self._error(e)
+        self.finish(json.dumps(info))
+
+    async def delete(self, problem_id, stage, name):
+        try:
+            await IOLoop.current().run_in_executor(self.executor, self.data_store.delete, problem_id, stage, name)
+        except DataSyncError as e:
+            return self._error(e)
+        self.finish(json.dumps({}))
+
+    def _error(self, e):
+        self.set_status(400)
+        self.finish(json.dumps({'error': e.message}))
+
+    def on_finish(self):
+        if self._file is not None:
+            self._file.abort()
+
+    def on_connection_close(self):
+        if self._file is not None:
+            self._file.abort()
+
+
+@stream_request_body
+class WSGIHandler(RequestHandler):
+    # every other route of the flask app, run on an executor with the body spooled to disk,
+    # so an upload never holds the IOLoop
+    SUPPORTED_METHODS = ("GET", "HEAD", "POST", "DELETE", "PATCH", "PUT", "OPTIONS")
+
+    def initialize(self, container, executor, max_body_size):
+        self.container = container
+        self.executor = executor
+        self.max_body_size = max_body_size
+        self._body = None
+
+    def prepare(self):
+        self.request.connection.set_max_body_size(self.max_body_size)
+        self._body = tempfile.SpooledTemporaryFile(SPOOL_SIZE)
+
+    def data_received(self, chunk):
+        return IOLoop.current().run_in_executor(self.executor, self._body.write, chunk)
+
+    async def _serve(self, *args):
+        self._body.seek(0)
+        environ = self.container.environ(self.request)
+        environ['wsgi.input'] = self._body
+        status, headers, body = await IOLoop.current().run_in_executor(
+            self.executor, _call_wsgi, self.container.wsgi_application, environ)
+        code, reason = status.split(' ', 1)
+        self.set_status(int(code), reason)
+        self.clear_header('Content-Type')
+        for name, value in headers:
+            self.add_header(name, value)
+        self.finish(body)
+
+    get = head = post = delete = patch = put = options = _serve
+
+    def on_finish(self):
+        if self._body is not None:
+            self._body.close()
+
+
+def make_app(wsgi_app, accept, data_store, authorize, intake_executor, http_executor,
+             max_body_size, max_data_file_size):
+    wsgi = dict(container=WSGIContainer(wsgi_app), executor=http_executor, max_body_size=max_body_size)
+    return Application([
+        (r"/judge", JudgeHandler, dict(accept=accept, executor=intake_executor)),
+        # a file named commit is served by flask
+        (r"/data/(\d+)/stage/([^/]+)/commit", WSGIHandler, wsgi),
+        (r"/data/(\d+)/stage/([^/]+)/([^/]+)", DataFileHandler,
+         dict(data_store=data_store, authorize=authorize, executor=http_executor,
+              max_body_size=max_data_file_size)),
+        (r".*", WSGIHandler, wsgi),
+    ])
@@ -1,15 +1,104 @@
 import logging
+import multiprocessing
 import os
-import pathlib
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List
 
 import _judger
 
+from checker import CheckerSession
+from comparator import CHUNK_SIZE, OutputComparator, first_difference
 from exception import CompileError, JudgeServiceError
+from fifo import FifoReader, make_fifo
+import tracing
+from metrics import STAGE_SECONDS
+from testdata import default_policy, load_manifest
 
 default_env = ["PATH=/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin"]
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(filename)s %(lineno)d %(levelname)s : %(message)s')
 
+
+VERDICT_NAMES = {
+    _judger.RESULT_SUCCESS: 'accepted',
+    _judger.RESULT_WRONG_ANSWER: 'wrong_answer',
+    _judger.RESULT_CPU_TIME_LIMIT_EXCEEDED: 'cpu_time_limit_exceeded',
+    _judger.RESULT_REAL_TIME_LIMIT_EXCEEDED: 'real_time_limit_exceeded',
+    _judger.RESULT_MEMORY_LIMIT_EXCEEDED: 'memory_limit_exceeded',
+    _judger.RESULT_RUNTIME_ERROR: 'runtime_error',
+    _judger.RESULT_SYSTEM_ERROR: 'system_error',
+}
+
+
+def verdict_name(res) -> str:
+    # final verdict of a run() result
+    if res.get('err') == 'CE':
+        return 'compile_error'
+    if 'err' in res or not res.get('results'):
+        return 'judge_error'
+    # the first failure, not the last case, when judging went on after it
+    failed = [r for r in res['results'] if r['result'] != _judger.RESULT_SUCCESS]
+    final = failed[0] if failed else res['results'][-1]
+    return VERDICT_NAMES.get(final['result'], 'system_error')
+
+
+def reproducible(res) -> bool:
+    # a rerun would give the same: no judge error, and no verdict the load of the host may have caused
+    if 'err' in res or not res.get('results'):
+        return False
+    return all(r['result'] not in (_judger.RESULT_SYSTEM_ERROR, _judger.RESULT_REAL_TIME_LIMIT_EXCEEDED)
+               for r in res['results'])
+
+
+class CoreBudget:
+    # one slot per core, shared by every judge worker and their parallel test cases
+    def __init__(self, cores: int):
+        self._slots = multiprocessing.Queue()
+        for slot in range(cores):
+            self._slots.put(slot)
+
+    def acquire(self, block=True):
+        try:
+            return self._slots.get(block)
+        except queue.Empty:
+            return None
+
+    def release(self, slot) -> None:
+        self._slots.put(slot)
+
+
+_core_budget = None
+_cgroups = None
+_slot = threading.local()  # the core slot the thread judges on
+
+
+def init_worker(core_budget: CoreBudget, cgroups=None) -> None:
+    global _core_budget, _cgroups
+    _core_budget = core_budget
+    _cgroups = cgroups
+
+
+def acquire_core():
+    slot = _core_budget.acquire() if _core_budget is not None else None
+    _slot.current = slot
+    return slot
+
+
+def release_core(slot) -> None:
+    _slot.current = None
+    if slot is not None:
+        _core_budget.release(slot)
+
+
+def slot_cgroup():
+    # the cgroup.CgroupSlots group of the thread's slot, None to judge with rlimits only
+    slot = getattr(_slot, 'current', None)
+    if _cgroups is None or slot is None:
+        return None
+    return _cgroups.path(slot)
+
+
 class JudgerBridge:
     def __init__(self):
         self._max_output_size = 32 * 1024 * 1024  # 30M
@@ -32,7 +121,7 @@ class JudgerBridge:
 
 
 class Compiler(JudgerBridge):
-    def __init__(self, command: str, base_dir: str):
+    def __init__(self, command: str, base_dir: str, cache_key: str = None):
         super().__init__()
         self._max_cpu_time = 10000
         self._max_memory = 256 * 1024 * 1024  # 128MB
@@ -43,28 +132,35 @@ class Compiler(JudgerBridge):
             self._max_memory = -1
             self._max_cpu_time *= 2
         self.base_dir = base_dir
+        self.cache_key = cache_key
+        self.result = None
 
     def __call__(self) -> None:
+        # relative names in a submission's command are taken from the cwd, but the logs are not: the web
+        # process compiles special judges from several threads, each naming its own directory in full
         os.chdir(self.base_dir)
-        compiler_out = "compiler_output.log"
+        compiler_out = os.path.join(self.base_dir, "compiler_output.log")
         _command = self.command.split(" ")
-        result = _judger.run(max_cpu_time=self._max_cpu_time,
-                             max_real_time=self._max_real_time,
-                             max_memory=self._max_memory,
-                             max_stack=256 * 1024 * 1024,
-                             max_output_size=-1,
-                             max_process_number=-1,
-                             exe_path=_command[0],
-                             # /dev/null is best, but in some system, this will call ioctl system call
-                             input_path='/dev/null',
-                             output_path=compiler_out,
-                             error_path=compiler_out,
-                             args=_command[1::],
-                             env=default_env,
-                             log_path='compiler.log',
-                             seccomp_rule_name=None,
-                             uid=0,
-                             gid=0)
+        with STAGE_SECONDS.time('compile'):
+            result = _judger.run(max_cpu_time=self._max_cpu_time,
+                                 max_real_time=self._max_real_time,
+                                 max_memory=self._max_memory,
+                                 max_stack=256 * 1024 * 1024,
+                                 max_output_size=-1,
+                                 max_process_number=-1,
+                                 exe_path=_command[0],
+                                 # /dev/null is best, but in some system, this will call ioctl system call
+                                 input_path='/dev/null',
+                                 output_path=compiler_out,
+                                 error_path=compiler_out,
+                                 args=_command[1::],
+                                 env=default_env,
+                                 log_path=os.path.join(self.base_dir, 'compiler.log'),
+                                 seccomp_rule_name=None,
+                                 uid=0,
+                                 gid=0,
+                                 cgroup=slot_cgroup())
+        self.result = result
         if result["result"] != _judger.RESULT_SUCCESS:
             if os.path.exists(compiler_out):
                 with open(compiler_out, encoding="utf-8") as f:
@@ -84,15 +180,23 @@ class Judger(JudgerBridge):
                  judge_dir,
                  memory_limit_check_only,
                  data_dir, submit_id,
-                 spj):
+                 spj, parallelism=1, report_diff=False, manifest=None,
+                 stream_output=False, keep_output=False, startup=None, timings=None, trace=None):
         super().__init__()
         self.submit_id = submit_id
         self.judge_dir = judge_dir
         self.data_dir = data_dir
         self._max_cpu_time = max_cpu_time
         self._max_memory = max_memory
+        # calibrated interpreter startup (runtime.py), added to the limits and taken off the results
+        self.startup = startup
         if str(command).find('java') >= 0:
             self._max_memory = -1
+        if startup is not None:
+            self._max_cpu_time += startup['cpu_time']
+            if self._max_memory != -1:
+                self._max_memory += startup['memory']
+        elif str(command).find('java') >= 0:
             self._max_cpu_time *= 2
         elif str(command).find('py') >= 0:
             self._max_memory *= 2
@@ -100,101 +204,371 @@ class Judger(JudgerBridge):
         command = command.split(' ')
         self._exe_path = command[0]
         self._args = command[1:]
+        if os.path.basename(self._exe_path) == 'java' and not any(a.startswith('-Xshare') for a in self._args):
+            # class data sharing archive dumped into the image, ignored when it is missing
+            self._args.insert(0, '-Xshare:auto')
         self._args.append('-XX:MaxRAM=' + str(max_memory))
         self._seccomp_rule_name = seccomp_rule
         self._memory_limit_check_only = memory_limit_check_only
         self.spj = spj
+        self.parallelism = parallelism
+        self.report_diff = report_diff
+        self.manifest = manifest if manifest is not None else load_manifest(data_dir)
+        # special judges read the output from a file, so only plain comparison streams it
+        self.stream_output = stream_output and not spj
+        self.keep_output = keep_output
+        # manifests written before policies existed have none
+        self.policy = self.manifest.get('policy') or default_policy()
+        self.timings = timings  # testdata.CaseTimings, for cheapest-first order
+        self.trace = trace  # tracing.Trace of a sampled submission
+        self._checker = None
 
     def __call__(self) -> List[Dict]:
+        with tracing.stage('judge', cases=len(self.manifest['cases']), mode=self.policy['mode']):
+            return self._without_startup(self._judge())
+
+    def _without_startup(self, results) -> List[Dict]:
+        # report what the submission used on top of an empty program
+        if self.startup is not None:
+            for run_result in results:
+                run_result['cpu_time'] = max(0, run_result['cpu_time'] - self.startup['cpu_time'])
+                run_result['memory'] = max(0, run_result['memory'] - self.startup['memory'])
+        return results
+
+    def _judge(self) -> List[Dict]:
         os.chdir(self.judge_dir)
-        datas = pathlib.Path(self.data_dir)
+        cases = self.manifest['cases']
+        cheapest_first = self.policy['order'] == 'cheapest_first' and self.timings is not None
+        if cheapest_first:
+            cases = self.timings.order(self.manifest['version'], cases)
+        self._checker = self._start_checker(len(cases))
         results = []
-        for data in datas.glob("*.in"):
-            case_id = data.stem
-            output_path = case_id + ".out"
-            err_path = case_id + ".err"
-            input_path = str(data.absolute())
-            run_result = _judger.run(max_cpu_time=self._max_cpu_time,
-                                     max_real_time=self._max_real_time,
-                                     max_memory=self._max_memory,
-                                     max_stack=256 * 1024 * 1024,
-                                     max_output_size=self._max_output_size,
-                                     max_process_number=1,
-                                     exe_path=self._exe_path,
-                                     input_path=input_path,
-                                     output_path=output_path,
-                                     error_path=err_path,
-                                     args=self._args,
-                                     env=default_env,
-                                     log_path="judger.log",
-                                     seccomp_rule_name=self._seccomp_rule_name,
-                                     uid=0,
-                                     gid=0,
-                                     memory_limit_check_only=self._memory_limit_check_only,
-                                     )
-            if run_result['result'] != _judger.RESULT_SUCCESS:
-                results.append(run_result)
-                return results
-            if not self.compare(case_id, input_path if self.spj else None):
-                run_result['result'] = _judger.RESULT_WRONG_ANSWER
+        try:
+            for run_cases, stop_on_failure in self._plan(cases):
+                for case_id, run_result in zip(run_cases, self._run_cases(run_cases, stop_on_failure)):
+                    run_result['case'] = case_id
+                    results.append(run_result)
+        finally:
+            if self._checker is not None:
+                self._checker.close()
+                self._checker = None
+        if cheapest_first:
+            self.timings.record(self.manifest['version'], {r['case']: r['real_time'] for r in results})
+        return results
+
+    def _plan(self, cases):
+        # [(cases, stop at the first failure)] in the order they run
+        mode = self.policy['mode']
+        if mode == 'acm':
+            return [(cases, True)]
+        if mode == 'full':
+            return [(cases, False)]
+        # subtask: a failing case skips the rest of its group, not the other groups
+        position = {case_id: index for index, case_id in enumerate(cases)}
+        return [(sorted(group['cases'], key=position.get), True) for group in self.policy['groups']]
+
+    def _run_cases(self, cases, stop_on_failure) -> List[Dict]:
+        if self.parallelism > 1 and len(cases) > 1:
+            return self._run_parallel(cases, stop_on_failure)
+        if self.stream_output:
+            return self._run_each(cases, stop_on_failure)
+        return self._run_batch(cases, stop_on_failure)
+
+    def scoring(self, results) -> Dict:
+        # groups and score for a policy with groups, nothing for acm
+        groups = self.policy['groups']
+        if self.policy['mode'] == 'acm' or not groups:
+            return {}
+        by_case = {r['case']: r for r in results}
+        summary = []
+        for group in groups:
+            ran = [by_case[case_id] for case_id in group['cases'] if case_id in by_case]
+            passed = len(ran) == len(group['cases']) and all(r['result'] == _judger.RESULT_SUCCESS for r in ran)
+            summary.append({'name': group['name'],
+                            'passed': passed,
+                            'score': group['score'] if passed else 0,
+                            'max_score': group['score'],
+                            'skipped': [case_id for case_id in group['cases'] if case_id not in by_case]})
+        return {'groups': summary, 'score': sum(group['score'] for group in summary)}
+
+    def _run_config(self):
+        # everything but the paths of a case
+        return dict(max_cpu_time=self._max_cpu_time,
+                    max_real_time=self._max_real_time,
+                    max_memory=self._max_memory,
+                    max_stack=256 * 1024 * 1024,
+                    max_output_size=self._max_output_size,
+                    max_process_number=1,
+                    exe_path=self._exe_path,
+                    args=self._args,
+                    env=default_env,
+                    log_path="judger.log",
+                    seccomp_rule_name=self._seccomp_rule_name,
+                    uid=0,
+                    gid=0,
+                    memory_limit_check_only=self._memory_limit_check_only,
+                    # an endless loop ends at max_cpu_time instead of 3x it
+                    cpu_time_watchdog=1,
+                    cgroup=slot_cgroup())
+
+    def _case_paths(self, case_id):
+        input_path = os.path.join(os.path.abspath(self.data_dir), case_id + ".in")
+        return input_path, case_id + ".out", case_id + ".err"
+
+    def _run_case(self, case_id) -> Dict:
+        with tracing.span('case', case=case_id) as case_span:
+            if self.stream_output:
+                run_result = self._run_streamed(case_id)
+            else:
+                input_path, output_path, err_path = self._case_paths(case_id)
+                with tracing.stage('run'):
+                    run_result = _judger.run(input_path=input_path,
+                                             output_path=output_path,
+                                             error_path=err_path,
+                                             **self._run_config())
+                run_result = self._check_case(case_id, run_result)
+            self._describe(case_span, case_id, run_result)
+        return run_result
+
+    @staticmethod
+    def _describe(case_span, case_id, run_result):
+        if tracing.current() is None:
+            return
+        output_path = case_id + ".out"
+        case_span.set(result=run_result['result'],
+                      cpu_time=run_result['cpu_time'],
+                      real_time=run_result['real_time'],
+                      memory=run_result['memory'],
+                      exit_code=run_result['exit_code'],
+                      signal=run_result['signal'],
+                      output_size=os.path.getsize(output_path) if os.path.exists(output_path) else None)
+
+    def _run_batch(self, cases, stop_on_failure=True) -> List[Dict]:
+        # every case in one runner, which can stop at the first case that fails to run
+        results = []
+        batch = _judger.run_batch([self._case_paths(case_id) for case_id in cases],
+                                  stop_on_failure=stop_on_failure, **self._run_config())
+        try:
+            for case_id in cases:
+                with tracing.span('case', case=case_id) as case_span:
+                    with tracing.stage('run'):
+                        run_result = next(batch, None)
+                    if run_result is not None:
+                        run_result = self._check_case(case_id, run_result)
+                        self._describe(case_span, case_id, run_result)
+                if run_result is None:
+                    break
                 results.append(run_result)
-                return results
+                if stop_on_failure and run_result['result'] != _judger.RESULT_SUCCESS:
+                    break
+        finally:
+            batch.close()
+        return results
+
+    def _run_each(self, cases, stop_on_failure=True) -> List[Dict]:
+        results = []
+        for case_id in cases:
+            run_result = self._run_case(case_id)
             results.append(run_result)
+            if stop_on_failure and run_result['result'] != _judger.RESULT_SUCCESS:
+                break
+        return results
+
+    def _run_streamed(self, case_id) -> Dict:
+        # the output goes through a fifo into the comparator while the solution runs, nothing
+        # touches the disk unless keep_output is set. the fifo is closed at the first difference,
+        # the solution's next write fails
+        input_path, output_path, err_path = self._case_paths(case_id)
+        comparator = OutputComparator(os.path.join(self.data_dir, case_id + ".out"))
+        pipe_path = os.path.join(self.judge_dir, case_id + ".pipe")
+        make_fifo(pipe_path)
+        run_result = {}
+        # taken here, the runner thread has no slot of its own
+        config = self._run_config()
+        runner = threading.Thread(target=lambda: run_result.update(_judger.run(
+            input_path=input_path,
+            output_path=pipe_path,
+            error_path=err_path if self.keep_output else os.devnull,
+            **config)))
+        # our end is open before the runner starts, so the solution never blocks opening stdout
+        reader = FifoReader(pipe_path, runner.is_alive)
+        kept = open(output_path, 'wb') if self.keep_output else None
+        overflow = False
+        # we closed the fifo before the solution was done writing
+        cut_off = False
+        try:
+            with tracing.stage('run'):
+                runner.start()
+                size = 0
+                data = reader.read(CHUNK_SIZE)
+                while data:
+                    size += len(data)
+                    if kept is not None:
+                        kept.write(data)
+                    if size > self._max_output_size:
+                        overflow = cut_off = True
+                        break
+                    if not comparator.feed(data):
+                        cut_off = True
+                        break
+                    data = reader.read(CHUNK_SIZE)
+                else:
+                    comparator.finish()
+                reader.close()
+                runner.join()
+        finally:
+            reader.close()
+            comparator.close()
+            if kept is not None:
+                kept.close()
+            os.remove(pipe_path)
+        if not run_result:
+            raise JudgeServiceError(f"runner failed on case {case_id}")
+        # whatever a solution we cut off did next (died of SIGPIPE, exited on EPIPE as CPython does,
+        # or ran on), its verdict is the difference or the overflow
+        if run_result['result'] != _judger.RESULT_SUCCESS and not cut_off:
+            return run_result
+        if overflow:
+            # what RLIMIT_FSIZE does to a file
+            run_result['result'] = _judger.RESULT_RUNTIME_ERROR
+        elif comparator.difference is not None:
+            run_result['result'] = _judger.RESULT_WRONG_ANSWER
+            if self.report_diff:
+                line, column = comparator.difference
+                run_result['diff'] = {'line': line, 'column': column}
+        return run_result
+
+    def _check_case(self, case_id, run_result) -> Dict:
+        if run_result['result'] != _judger.RESULT_SUCCESS:
+            return run_result
+        input_path = self._case_paths(case_id)[0]
+        if not self.compare(case_id, input_path if self.spj else None):
+            run_result['result'] = _judger.RESULT_WRONG_ANSWER
+            if self.report_diff and not self.spj:
+                try:
+                    line, column = self.difference(case_id)
+                    run_result['diff'] = {'line': line, 'column': column}
+                except Exception:
+                    pass
+        return run_result
+
+    def _run_parallel(self, cases, stop_on_failure=True) -> List[Dict]:
+        # the worker already holds one core, only borrow the ones nobody uses
+        borrowed = []
+        while _core_budget is not None and len(borrowed) < self.parallelism - 1:
+            slot = _core_budget.acquire(block=False)
+            if slot is None:
+                break
+            borrowed.append(slot)
+        first_failure = [len(cases)]
+        lock = threading.Lock()
+        context = tracing.current()
+        # one per thread of the executor, a case runs in the cgroup of the slot it holds
+        slots = queue.Queue()
+        for slot in [getattr(_slot, 'current', None)] + borrowed:
+            slots.put(slot)
+
+        def work(index, case_id):
+            if index > first_failure[0]:
+                return None  # an earlier case already failed
+            _slot.current = slots.get()
+            try:
+                with tracing.attach(context):
+                    run_result = self._run_case(case_id)
+            finally:
+                slots.put(_slot.current)
+            if stop_on_failure and run_result['result'] != _judger.RESULT_SUCCESS:
+                with lock:
+                    first_failure[0] = min(first_failure[0], index)
+            return run_result
+
+        results = []
+        try:
+            with ThreadPoolExecutor(max_workers=len(borrowed) + 1) as executor:
+                futures = [executor.submit(work, i, case_id) for i, case_id in enumerate(cases)]
+                # collect in case order, so results stop at the first failing case
+                for future in futures:
+                    run_result = future.result()
+                    results.append(run_result)
+                    if stop_on_failure and run_result['result'] != _judger.RESULT_SUCCESS:
+                        for rest in futures:
+                            rest.cancel()
+                        break
+        finally:
+            for slot in borrowed:
+                _core_budget.release(slot)
         return results
 
     def compare(self, case_id, input_path=None):
         os.chdir(self.judge_dir)
         if self.spj and input_path is not None:
-            return self.special_judge(case_id, input_path)
+            with tracing.stage('spj'):
+                return self.special_judge(case_id, input_path)
         try:
-            with open(os.path.join(self.data_dir, case_id + ".out")) as ans:
-                with open(case_id + ".out") as uans:
-                    line1 = ans.readlines()
-                    line2 = uans.readlines()
-                    if len(line1) != len(line2):
-                        return False
-                    for i, answer in enumerate(line1):
-                        if answer.strip() != line2[i].strip():
-                            return False
+            with tracing.stage('compare'):
+                return self.difference(case_id) is None
         except Exception:
             return False
-        return True
+
+    def difference(self, case_id):
+        # (line, column) of the first mismatch against the answer, None when accepted
+        return first_difference(os.path.join(self.data_dir, case_id + ".out"),
+                                os.path.join(self.judge_dir, case_id + ".out"))
+
+    @property
+    def _spj_cpu_time(self):
+        return self._max_cpu_time * 5
+
+    def _spj_command(self) -> List[str]:
+        spj_path = os.path.join(self.data_dir, 'spj')
+        if self.manifest['spj'] == 'binary':
+            return [spj_path]
+        if self.manifest['spj'] == 'python':
+            if 'spj.pyc' in self.manifest['files']:
+                # byte-compiled by check_spj at upload time
+                return ['/usr/bin/python3', spj_path + '.pyc']
+            return ['/usr/bin/python3', spj_path + '.py']
+        raise JudgeServiceError("no spj found")
+
+    def _run_spj(self, args, input_path, output_path, error_path, cases=1):
+        run_command = self._spj_command() + args
+        return _judger.run(max_cpu_time=self._spj_cpu_time * cases,
+                           max_real_time=self._spj_cpu_time * 3 * cases,
+                           max_memory=1024 * 1024 * 1024,  # 1G
+                           max_stack=256 * 1024 * 1024,
+                           max_output_size=self._max_output_size,
+                           max_process_number=-1,
+                           exe_path=run_command[0],
+                           input_path=input_path,
+                           output_path=output_path,
+                           error_path=error_path,
+                           args=run_command[1:],
+                           env=default_env,
+                           log_path="spj.log",
+                           uid=0,
+                           gid=0,
+                           seccomp_rule_name='',
+                           memory_limit_check_only=0,
+                           cgroup=slot_cgroup(),
+                           )
+
+    def _start_checker(self, cases):
+        if not self.spj or not self.manifest['spj_persistent']:
+            return None
+        return CheckerSession(self.judge_dir,
+                              lambda requests, replies: self._run_spj(['--persistent'], requests, replies,
+                                                                      'spj.err', cases))
 
     def special_judge(self, case_id, data_input_path):
-        spj_cpu_time = self._max_cpu_time * 5
-        spj_real_time = spj_cpu_time * 3
-        spj_memory = 1024 * 1024 * 1024  # 1G
+        if self._checker is not None:
+            accepted = self._checker.check(data_input_path,
+                                           os.path.join(self.judge_dir, case_id + ".out"),
+                                           self._spj_cpu_time * 3 / 1000)
+            if accepted is not None:
+                return accepted
         input_path = case_id + ".out"
         output_path = case_id + ".spj"
-        spj_path = os.path.join(self.data_dir, 'spj')
-        run_command = spj_path
-        if not os.path.exists(spj_path):
-            spj_path += '.py'
-            run_command = '/usr/bin/python3 ' + spj_path
-        run_command += ' ' + data_input_path
-        if not os.path.exists(spj_path):
-            raise JudgeServiceError("no spj found")
-        run_command = run_command.split(' ')
-        exe_path = run_command[0]
-        args = run_command[1:]
-        run_result = _judger.run(max_cpu_time=spj_cpu_time,
-                                 max_real_time=spj_real_time,
-                                 max_memory=spj_memory,
-                                 max_stack=256 * 1024 * 1024,
-                                 max_output_size=self._max_output_size,
-                                 max_process_number=-1,
-                                 exe_path=exe_path,
-                                 input_path=input_path,
-                                 output_path=output_path,
-                                 error_path=output_path,
-                                 args=args,
-                                 env=default_env,
-                                 log_path="spj.log",
-                                 uid=0,
-                                 gid=0,
-                                 seccomp_rule_name='',
-                                 memory_limit_check_only=0,
-                                 )
+        run_result = self._run_spj([data_input_path], input_path, output_path, output_path)
         if run_result['result'] != _judger.RESULT_SUCCESS:
             return False
         if not os.path.exists(output_path):
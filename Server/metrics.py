@@ -0,0 +1,115 @@
+import multiprocessing
+import time
+from contextlib import contextmanager
+
+# values live in shared memory created at import, before the judge pool forks,
+# so observations from every worker add up in the web process
+
+STAGES = ('compile_queue', 'queue', 'compile', 'judge', 'run', 'compare', 'spj', 'callback')
+VERDICTS = ('accepted', 'wrong_answer', 'cpu_time_limit_exceeded', 'real_time_limit_exceeded',
+            'memory_limit_exceeded', 'runtime_error', 'system_error', 'compile_error', 'judge_error')
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_registry = []
+
+
+def _labels(**labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, label_name, label_values):
+        self.name = name
+        self.documentation = documentation
+        self.label_name = label_name
+        self.label_values = tuple(label_values)
+        self._values = multiprocessing.Array('d', len(self.label_values))
+        _registry.append(self)
+
+    def inc(self, label, amount=1) -> None:
+        i = self.label_values.index(label)
+        with self._values.get_lock():
+            self._values[i] += amount
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        with self._values.get_lock():
+            values = list(self._values)
+        for label, value in zip(self.label_values, values):
+            yield f"{self.name}{_labels(**{self.label_name: label})} {value:g}"
+
+
+class Histogram:
+    def __init__(self, name, documentation, label_name, label_values, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_name = label_name
+        self.label_values = tuple(label_values)
+        self.buckets = tuple(buckets)
+        # per label: one slot per bucket, then +Inf, then the sum
+        self._width = len(self.buckets) + 2
+        self._values = multiprocessing.Array('d', len(self.label_values) * self._width)
+        _registry.append(self)
+
+    def observe(self, label, value: float) -> None:
+        base = self.label_values.index(label) * self._width
+        slot = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                slot = i
+                break
+        with self._values.get_lock():
+            self._values[base + slot] += 1
+            self._values[base + self._width - 1] += value
+
+    @contextmanager
+    def time(self, label):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(label, time.perf_counter() - start)
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._values.get_lock():
+            values = list(self._values)
+        for n, label in enumerate(self.label_values):
+            row = values[n * self._width:(n + 1) * self._width]
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), row):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(**{self.label_name: label, 'le': bound})} {cumulative:g}"
+            yield f"{self.name}_sum{_labels(**{self.label_name: label})} {row[-1]:g}"
+            yield f"{self.name}_count{_labels(**{self.label_name: label})} {cumulative:g}"
+
+
+class Gauge:
+    # read at scrape time in the web process, fn returns [(labels dict, value)]
+    def __init__(self, name, documentation, fn, kind='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.fn = fn
+        self.kind = kind
+        _registry.append(self)
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for labels, value in self.fn():
+            yield f"{self.name}{_labels(**labels)} {value:g}"
+
+
+def exposition() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = Histogram('judger_stage_seconds', 'Time spent per judging stage.', 'stage', STAGES)
+VERDICT_TOTAL = Counter('judger_verdicts_total', 'Submissions judged, by final verdict.', 'verdict', VERDICTS)
@@ -0,0 +1,133 @@
+import json
+import logging
+import os
+import statistics
+import subprocess
+import tempfile
+import threading
+
+import _judger
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(filename)s %(lineno)d %(levelname)s : %(message)s')
+
+# an empty program per runtime, run the way submissions are, {dir} is where its files are
+PROBES = {
+    'python': {'files': {'main.py': ''}, 'args': ['{dir}/main.py']},
+    'java': {'files': {'Main.java': 'public class Main { public static void main(String[] args) { } }'},
+             'compile': ['javac', 'Main.java'], 'args': ['-Xshare:auto', '-cp', '{dir}', 'Main']},
+}
+
+
+def runtime_kind(command: str):
+    if command.find('java') >= 0:
+        return 'java'
+    if command.find('py') >= 0:
+        return 'python'
+    return None
+
+
+class RuntimeCalibration:
+    '''
+    what starting an interpreter costs in the sandbox: the median cpu time and memory of an empty
+    program over `runs` runs, measured once per interpreter binary and kept in a json file
+    '''
+
+    def __init__(self, path: str, env, runs: int = 5):
+        self.path = path
+        self.env = env
+        self.runs = runs
+        self.cgroup = None  # a CgroupSlots group when judging in cgroups, they also count system time
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def startup(self, command: str):
+        # calibrated cost for the runtime of a run command, None if it has not been measured
+        kind = runtime_kind(command)
+        key = self._key(kind, command.split(' ')[0]) if kind else None
+        if key is None:
+            return None
+        with self._lock:
+            return self._load().get(key)
+
+    def calibrate(self, kind: str, exe: str):
+        key = self._key(kind, exe)
+        if key is None:
+            logging.info(f"no {kind} runtime at {exe}")
+            return None
+        with self._lock:
+            entries = self._load()
+            if key not in entries:
+                measured = self._measure(kind, exe)
+                if measured is None:
+                    return None
+                entries[key] = measured
+                self._save(entries)
+                logging.info(f"{kind} startup at {exe}: {measured}")
+            return entries[key]
+
+    def _key(self, kind, exe):
+        # a new binary at the same path gets measured again, and so does one judged the other way
+        try:
+            st = os.stat(exe)
+        except OSError:
+            return None
+        accounting = 'cgroup' if self.cgroup else 'watchdog'
+        return f"{kind}:{os.path.realpath(exe)}:{st.st_mtime_ns}:{st.st_size}:{accounting}"
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self, entries):
+        tmp = f"{self.path}.{os.getpid()}"
+        with open(tmp, mode='w', encoding='utf-8') as f:
+            json.dump(entries, f)
+        os.rename(tmp, self.path)
+
+    def _measure(self, kind, exe):
+        probe = PROBES[kind]
+        with tempfile.TemporaryDirectory() as work_dir:
+            for name, content in probe['files'].items():
+                with open(os.path.join(work_dir, name), mode='w', encoding='utf-8') as f:
+                    f.write(content)
+            if 'compile' in probe:
+                # the compiler sits next to the runtime, e.g. javac next to java
+                compiler = os.path.join(os.path.dirname(os.path.realpath(exe)), probe['compile'][0])
+                try:
+                    subprocess.run([compiler] + probe['compile'][1:], cwd=work_dir, check=True,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=60)
+                except (OSError, subprocess.SubprocessError) as e:
+                    logging.warning(f"can not compile the {kind} probe: {e}")
+                    return None
+            output_path = os.path.join(work_dir, 'probe.out')
+            results = []
+            for _ in range(self.runs):
+                result = _judger.run(max_cpu_time=10000,
+                                     max_real_time=30000,
+                                     max_memory=_judger.UNLIMITED,
+                                     max_stack=256 * 1024 * 1024,
+                                     max_output_size=_judger.UNLIMITED,
+                                     max_process_number=_judger.UNLIMITED,
+                                     exe_path=exe,
+                                     input_path='/dev/null',
+                                     output_path=output_path,
+                                     error_path=output_path,
+                                     args=[arg.format(dir=work_dir) for arg in probe['args']],
+                                     env=self.env,
+                                     log_path=os.path.join(work_dir, 'probe.log'),
+                                     seccomp_rule_name=None,
+                                     uid=0,
+                                     gid=0,
+                                     cpu_time_watchdog=1,
+                                     cgroup=self.cgroup)
+                if result['result'] != _judger.RESULT_SUCCESS:
+                    logging.warning(f"{kind} probe failed: {result}")
+                    return None
+                results.append(result)
+        return {'cpu_time': int(statistics.median(r['cpu_time'] for r in results)),
+                'memory': int(statistics.median(r['memory'] for r in results))}
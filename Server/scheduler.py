@@ -0,0 +1,161 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from functools import partial
+
+from exception import QueueFullError
+from metrics import STAGE_SECONDS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(filename)s %(lineno)d %(levelname)s : %(message)s')
+
+
+class _Job:
+    def __init__(self, func, args, callback, priority, key, error_callback=None):
+        self.func = func
+        self.args = args
+        self.callback = callback
+        self.error_callback = error_callback
+        self.priority = priority
+        self.key = key
+        self.enqueued = time.time()
+
+
+class JudgeScheduler:
+    '''
+    bounded queue in front of the judge pool: the pool only ever gets as many jobs as it has
+    workers, higher priority goes first and within one priority the keys (problem or tenant)
+    take turns
+    '''
+
+    def __init__(self, pool, workers: int, max_queue: int, queue_stage: str = 'queue'):
+        self._pool = pool
+        self.workers = workers
+        self.max_queue = max_queue
+        self.queue_stage = queue_stage  # STAGE_SECONDS label of the time spent waiting here
+        self._lock = threading.Lock()
+        self._levels = {}  # priority -> OrderedDict(key -> deque of jobs)
+        self._queued = 0
+        self._running = 0
+        self.finished = 0
+
+    def full(self) -> bool:
+        return self._queued >= self.max_queue
+
+    def submit(self, func, args, callback, priority=0, key=None, error_callback=None, admitted=False) -> None:
+        # admitted jobs come from an earlier stage and are never turned away
+        with self._lock:
+            if not admitted and self.full():
+                raise QueueFullError(f"judge queue is full ({self._queued} waiting)")
+            level = self._levels.setdefault(priority, OrderedDict())
+            level.setdefault(key, deque()).append(_Job(func, args, callback, priority, key, error_callback))
+            self._queued += 1
+            self._dispatch()
+
+    def stats(self):
+        with self._lock:
+            heads = [jobs[0].enqueued for level in self._levels.values() for jobs in level.values()]
+            return {
+                'queued': self._queued,
+                'running': self._running,
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'finished': self.finished,
+                'oldest_wait': round(time.time() - min(heads), 3) if heads else 0,
+                'priorities': {str(p): sum(len(jobs) for jobs in level.values())
+                               for p, level in self._levels.items()},
+            }
+
+    def _dispatch(self):
+        # caller holds the lock
+        while self._running < self.workers and self._queued:
+            job = self._pop()
+            self._running += 1
+            STAGE_SECONDS.observe(self.queue_stage, time.time() - job.enqueued)
+            self._pool.apply_async(job.func, job.args,
+                                   callback=partial(self._done, job),
+                                   error_callback=partial(self._failed, job))
+
+    def _pop(self):
+        priority = max(self._levels)
+        level = self._levels[priority]
+        key, jobs = next(iter(level.items()))
+        job = jobs.popleft()
+        if jobs:
+            level.move_to_end(key)
+        else:
+            del level[key]
+        if not level:
+            del self._levels[priority]
+        self._queued -= 1
+        return job
+
+    def _release(self):
+        with self._lock:
+            self._running -= 1
+            self.finished += 1
+            self._dispatch()
+
+    def _done(self, job, result):
+        self._release()
+        job.callback(result)
+
+    def _failed(self, job, error):
+        logging.error(f"judge job failed: {error}")
+        self._release()
+        if job.error_callback is not None:
+            job.error_callback(error)
+
+
+class JudgePipeline:
+    '''
+    a compile stage and a run stage, each a JudgeScheduler with its own pool: a compiled submission
+    moves on to the run stage, a result of the compile stage (compile error, cached verdict) is final.
+    a submission is only admitted while neither stage is full
+    '''
+
+    def __init__(self, compile_stage: JudgeScheduler, run_stage: JudgeScheduler):
+        self.compile = compile_stage
+        self.run = run_stage
+        self.settled = 0  # submissions finished in the compile stage
+
+    @property
+    def workers(self) -> int:
+        return self.compile.workers + self.run.workers
+
+    def full(self) -> bool:
+        return self.compile.full() or self.run.full()
+
+    def submit(self, compile_job, run_job, callback, priority=0, key=None, error_callback=None,
+               on_compiled=None) -> None:
+        # compile_job and run_job are (func, args); compile_job returns None to go on to run_job,
+        # on_compiled() is called right before that
+        if self.run.full():
+            raise QueueFullError(f"judge queue is full ({self.run.max_queue} compiled submissions waiting)")
+
+        def compiled(result):
+            if result is not None:
+                self.settled += 1
+                return callback(result)
+            try:
+                if on_compiled is not None:
+                    on_compiled()
+                self.run.submit(*run_job, callback, priority, key, error_callback, admitted=True)
+            except Exception as e:
+                logging.error(f"can not start run stage: {e}")
+                if error_callback is not None:
+                    error_callback(e)
+
+        self.compile.submit(*compile_job, compiled, priority, key, error_callback)
+
+    def stats(self):
+        stages = {'compile': self.compile.stats(), 'run': self.run.stats()}
+        return {
+            'queued': sum(stage['queued'] for stage in stages.values()),
+            'running': sum(stage['running'] for stage in stages.values()),
+            'workers': self.workers,
+            'max_queue': self.run.max_queue,
+            'finished': stages['run']['finished'] + self.settled,
+            'oldest_wait': max(stage['oldest_wait'] for stage in stages.values()),
+            'stages': stages,
+        }
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import statistics
+import threading
+from collections import OrderedDict
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(filename)s %(lineno)d %(levelname)s : %(message)s')
+
+# written by upload_view, remove it after changing a problem's files by hand
+MANIFEST = "manifest.json"
+
+# optional judging policy of a problem, see "Judging policy" in the README
+POLICY = "policy.json"
+MODES = ('acm', 'subtask', 'full')
+ORDERS = ('natural', 'cheapest_first')
+
+_manifests = OrderedDict()  # data_dir -> (manifest mtime, manifest), least recently loaded first
+_manifests_lock = threading.Lock()
+# every published version is its own data dir, retired ones fall out of the memo
+MANIFEST_MEMO = 256
+
+
+def _natural_key(case_id):
+    # "2" < "10", so case order does not depend on the directory listing
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', case_id)]
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def default_policy():
+    # stop at the first case that fails, in case order
+    return {'mode': 'acm', 'order': 'natural', 'groups': None}
+
+
+def read_policy(data_dir: str, cases=None):
+    # the problem's policy.json checked against its cases, raises ValueError when it does not fit
+    path = os.path.join(data_dir, POLICY)
+    if not os.path.isfile(path):
+        return default_policy()
+    if cases is None:
+        cases = sorted((name[:-3] for name in os.listdir(data_dir) if name.endswith('.in')), key=_natural_key)
+    with open(path, encoding='utf-8') as f:
+        declared = json.load(f)
+    if not isinstance(declared, dict):
+        raise ValueError(f"{POLICY} must be an object")
+    policy = {'mode': declared.get('mode', 'acm'), 'order': declared.get('order', 'natural'), 'groups': None}
+    if policy['mode'] not in MODES:
+        raise ValueError(f"mode must be one of {', '.join(MODES)}")
+    if policy['order'] not in ORDERS:
+        raise ValueError(f"order must be one of {', '.join(ORDERS)}")
+    if declared.get('groups') is None:
+        if policy['mode'] == 'subtask':
+            raise ValueError("subtask mode needs groups")
+        return policy
+    groups = []
+    grouped = set()
+    for index, group in enumerate(declared['groups']):
+        try:
+            group_cases = [str(case_id) for case_id in group['cases']]
+            score = group.get('score', 0)
+        except (KeyError, TypeError, AttributeError):
+            raise ValueError(f"group {index + 1} needs a list of cases")
+        if isinstance(score, bool) or not isinstance(score, (int, float)):
+            raise ValueError(f"group {index + 1} needs a numeric score")
+        unknown = [case_id for case_id in group_cases if case_id not in cases]
+        if unknown:
+            raise ValueError(f"group {index + 1} has unknown cases {', '.join(unknown)}")
+        if grouped.intersection(group_cases):
+            raise ValueError(f"group {index + 1} shares cases with an earlier group")
+        grouped.update(group_cases)
+        groups.append({'name': str(group.get('name', index + 1)), 'score': score, 'cases': group_cases})
+    missing = [case_id for case_id in cases if case_id not in grouped]
+    if missing:
+        raise ValueError(f"cases in no group: {', '.join(missing)}")
+    policy['groups'] = groups
+    return policy
+
+
+def build_manifest(data_dir: str):
+    files = {}
+    for name in sorted(os.listdir(data_dir)):
+        path = os.path.join(data_dir, name)
+        if name == MANIFEST or not os.path.isfile(path):
+            continue
+        files[name] = {'size': os.path.getsize(path), 'sha256': _sha256(path)}
+    cases = sorted((name[:-3] for name in files if name.endswith('.in')), key=_natural_key)
+    spj = None
+    if 'spj' in files:
+        spj = 'binary'
+    elif 'spj.py' in files:
+        spj = 'python'
+    version = hashlib.sha256(json.dumps(files, sort_keys=True).encode('utf-8')).hexdigest()
+    try:
+        policy = read_policy(data_dir, cases)
+    except (OSError, ValueError) as e:
+        logging.warning(f"ignore {POLICY} of {data_dir}: {e}")
+        policy = default_policy()
+    return {
+        'version': version,
+        'cases': cases,
+        'files': files,
+        'spj': spj,
+        'spj_persistent': spj is not None and 'spj.persistent' in files,
+        'policy': policy,
+    }
+
+
+def write_manifest(data_dir: str):
+    manifest = build_manifest(data_dir)
+    tmp = os.path.join(data_dir, f".{MANIFEST}.{os.getpid()}")
+    with open(tmp, mode='w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.rename(tmp, os.path.join(data_dir, MANIFEST))
+    return manifest
+
+
+def load_manifest(data_dir: str):
+    path = os.path.join(data_dir, MANIFEST)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+        with _manifests_lock:
+            cached = _manifests.get(data_dir)
+            if cached is not None and cached[0] == mtime:
+                _manifests.move_to_end(data_dir)
+                return cached[1]
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        with _manifests_lock:
+            _manifests[data_dir] = (mtime, manifest)
+            _manifests.move_to_end(data_dir)
+            while len(_manifests) > MANIFEST_MEMO:
+                _manifests.popitem(last=False)
+        return manifest
+    except (OSError, ValueError):
+        pass
+    # data uploaded before manifests existed
+    if not os.path.isdir(data_dir):
+        return {'version': '', 'cases': [], 'files': {}, 'spj': None, 'spj_persistent': False,
+                'policy': default_policy()}
+    try:
+        return write_manifest(data_dir)
+    except OSError as e:
+        logging.warning(f"can not write manifest for {data_dir}: {e}")
+        return build_manifest(data_dir)
+
+
+class CaseTimings:
+    # how long each case of a data version runs, averaged over submissions, for cheapest-first order
+    ALPHA = 0.3
+
+    def __init__(self, timings_dir: str):
+        self.timings_dir = timings_dir
+
+    def _path(self, version):
+        return os.path.join(self.timings_dir, version[:32] + ".json")
+
+    def load(self, version):
+        try:
+            with open(self._path(version), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def order(self, version, cases):
+        # cases never timed are assumed average, ties keep case order
+        known = self.load(version)
+        default = statistics.mean(known.values()) if known else 0
+        return sorted(cases, key=lambda case_id: known.get(case_id, default))
+
+    def record(self, version, costs) -> None:
+        # costs: case id -> ms; concurrent judges may overwrite each other, it is only an estimate
+        if not version or not costs:
+            return
+        known = self.load(version)
+        for case_id, cost in costs.items():
+            known[case_id] = cost if case_id not in known else known[case_id] + self.ALPHA * (cost - known[case_id])
+        tmp = f"{self._path(version)}.{os.getpid()}"
+        try:
+            with open(tmp, mode='w', encoding='utf-8') as f:
+                json.dump(known, f)
+            os.rename(tmp, self._path(version))
+        except OSError as e:
+            logging.warning(f"can not record case timings: {e}")
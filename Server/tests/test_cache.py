@@ -0,0 +1,46 @@
+# the test data cache on scratch directories, no runner needed:
+#   python3 -m pytest Server/tests/test_cache.py
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from cache import DataCache  # noqa: E402
+from testdata import load_manifest, write_manifest  # noqa: E402
+
+
+def publish(tmp_path, version, answer):
+    data_dir = tmp_path / "data" / version
+    data_dir.mkdir(parents=True)
+    (data_dir / "1.in").write_text("1\n")
+    (data_dir / "1.out").write_text(answer)
+    write_manifest(str(data_dir))
+    return str(data_dir), load_manifest(str(data_dir))
+
+
+def test_version_being_read_survives_a_new_one(tmp_path):
+    cache = DataCache(str(tmp_path / "cache"), 1024 * 1024)
+    os.makedirs(cache.cache_dir)
+    old_dir, old = publish(tmp_path, "v1", "1\n")
+    new_dir, new = publish(tmp_path, "v2", "2\n")
+    with cache.resolve(old_dir, old, "7") as reading:
+        assert reading != old_dir
+        with cache.resolve(new_dir, new, "7") as fresh:
+            assert open(os.path.join(fresh, "1.out")).read() == "2\n"
+        assert open(os.path.join(reading, "1.out")).read() == "1\n"
+    # released, the next miss of the problem clears it
+    newest_dir, newest = publish(tmp_path, "v3", "3\n")
+    with cache.resolve(newest_dir, newest, "7"):
+        assert not os.path.exists(reading)
+
+
+def test_entry_over_the_limit_is_kept_while_read(tmp_path):
+    cache = DataCache(str(tmp_path / "cache"), 1024 * 1024)
+    os.makedirs(cache.cache_dir)
+    data_dir, manifest = publish(tmp_path, "v1", "1\n")
+    with cache.resolve(data_dir, manifest, "7") as reading:
+        assert reading != data_dir
+        cache.max_size = 1
+        cache._evict()
+        assert os.path.isdir(reading)
+    cache._evict()
+    assert not os.path.exists(reading)
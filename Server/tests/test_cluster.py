@@ -0,0 +1,37 @@
+# the cluster queue on a scratch database, no runner needed:
+#   python3 -m pytest Server/tests/test_cluster.py
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from cluster import ClusterNode, ClusterQueue  # noqa: E402
+
+
+class IdleScheduler:
+    def stats(self):
+        return {'workers': 1, 'running': 0, 'queued': 0}
+
+
+def test_poison_job_is_reported_once_attempts_run_out(tmp_path):
+    queue = ClusterQueue(str(tmp_path / "queue.db"), "node-1", max_attempts=3)
+    queue.submit({'submit_id': 'poison'})
+    delivered = []
+
+    def submit(data, callback, error_callback):
+        raise KeyError('source')
+
+    node = ClusterNode(queue, IdleScheduler(), submit, delivered.append, dict)
+    for _ in range(5):
+        node._tick()
+    assert delivered == [{'submit_id': 'poison', 'err': 'ERR', 'info': "'source'"}]
+    assert queue.stats()['queued'] == queue.stats()['leased'] == 0
+
+
+def test_failed_job_goes_back_until_attempts_run_out(tmp_path):
+    queue = ClusterQueue(str(tmp_path / "queue.db"), "node-1", max_attempts=2)
+    queue.submit({'submit_id': 'flaky'})
+    (job_id, _), = queue.lease(1)
+    assert queue.release(job_id) is None
+    (job_id, data), = queue.lease(1)
+    assert queue.release(job_id) == data
+    assert queue.lease(1) == []
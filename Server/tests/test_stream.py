@@ -0,0 +1,63 @@
+# verdicts of streamed output against the output file, run as root with the runner installed
+# (or JUDGER_CORE_PATH pointing at a build):
+#   python3 -m pytest Server/tests
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(1, os.path.join(HERE, "..", "..", "Judger", "bindings", "Python"))
+import _judger  # noqa: E402
+from judger import Judger  # noqa: E402
+from testdata import write_manifest  # noqa: E402
+
+pytestmark = pytest.mark.skipif(os.geteuid() != 0, reason="the runner needs root")
+
+# far more than a pipe holds, so the solution is still writing when the first line is compared
+LINES = 200000
+
+WRONG_FIRST_LINE = f'''import sys
+sys.stdout.write("2\\n")
+for _ in range({LINES}):
+    sys.stdout.write("1\\n")
+'''
+
+
+@pytest.fixture
+def problem(tmp_path):
+    data_dir = tmp_path / "data"
+    judge_dir = tmp_path / "judge"
+    data_dir.mkdir()
+    judge_dir.mkdir()
+    (data_dir / "1.in").write_text("")
+    (data_dir / "1.out").write_text("1\n" * (LINES + 1))
+    return str(data_dir), str(judge_dir), write_manifest(str(data_dir))
+
+
+def judge(problem, source, stream_output):
+    data_dir, judge_dir, manifest = problem
+    solution = os.path.join(judge_dir, "solution.py")
+    with open(solution, mode='w') as f:
+        f.write(source)
+    cwd = os.getcwd()
+    try:
+        judger = Judger(1000, 128 * 1024 * 1024, f"{sys.executable} {solution}", None, judge_dir, 0,
+                        data_dir, 0, False, manifest=manifest, stream_output=stream_output)
+        return [(r['result'], r['signal'], r['exit_code']) for r in judger()]
+    finally:
+        os.chdir(cwd)
+
+
+def test_cut_off_python_solution_is_wrong_answer(problem):
+    # CPython ignores SIGPIPE, cut off it exits 1 on BrokenPipeError instead of dying of the signal
+    assert judge(problem, WRONG_FIRST_LINE, False)[0][0] == _judger.RESULT_WRONG_ANSWER
+    assert judge(problem, WRONG_FIRST_LINE, True)[0][0] == _judger.RESULT_WRONG_ANSWER
+
+
+def test_crash_after_short_output_stays_runtime_error(problem):
+    # the server read to the end here, the solution's own failure is its verdict
+    source = 'print(1)\nraise SystemExit(3)\n'
+    assert judge(problem, source, False)[0][0] == _judger.RESULT_RUNTIME_ERROR
+    assert judge(problem, source, True)[0][0] == _judger.RESULT_RUNTIME_ERROR
@@ -0,0 +1,188 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from metrics import STAGE_SECONDS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(filename)s %(lineno)d %(levelname)s : %(message)s')
+
+# one json object per line and span:
+# {"trace_id", "span_id", "parent_id", "submit_id", "name", "start", "end", "duration_ms", "attributes"}
+
+_local = threading.local()
+
+
+def _new_id():
+    return os.urandom(8).hex()
+
+
+class Span:
+    def __init__(self, trace, name, parent_id, attributes):
+        self.trace = trace
+        self.name = name
+        self.span_id = _new_id()
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start = time.time()
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+
+class _NoSpan:
+    # what span() yields when the submission is not traced
+    def set(self, **attributes) -> None:
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Trace:
+    '''
+    the spans of one submission, picklable so it travels with the Judger into the pool; every
+    process appends to the same file with one write per span
+    '''
+
+    def __init__(self, path: str, submit_id):
+        self.path = path
+        self.submit_id = str(submit_id)
+        self.trace_id = os.urandom(16).hex()
+        self.root_id = _new_id()
+        self.start = time.time()
+        self.queued_at = None
+        self.callback_at = None
+
+    def record(self, name, start, end, parent_id=None, span_id=None, **attributes) -> None:
+        line = json.dumps({'trace_id': self.trace_id,
+                           'span_id': span_id or _new_id(),
+                           'parent_id': parent_id,
+                           'submit_id': self.submit_id,
+                           'name': name,
+                           'start': start,
+                           'end': end,
+                           'duration_ms': round((end - start) * 1000, 3),
+                           'attributes': attributes}) + "\n"
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode('utf-8'))
+            finally:
+                os.close(fd)
+        except OSError as e:
+            logging.warning(f"can not write trace: {e}")
+
+    def finish(self, **attributes) -> None:
+        # the root span, from intake to the backend accepting the result
+        self.record('submission', self.start, time.time(), span_id=self.root_id, **attributes)
+
+
+class Tracer:
+    # samples submissions and keeps the traces of those in flight in the web process
+
+    def __init__(self, path: str, sample_rate: float, max_size: int = 64 * 1024 * 1024, in_flight: int = 10000):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_size = max_size
+        self.in_flight = in_flight
+        self._lock = threading.Lock()
+        self._traces = OrderedDict()  # submit_id -> Trace
+
+    def start(self, submit_id, force=False):
+        # a Trace for a sampled submission, None for the others
+        if not force and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            return None
+        self._rotate()
+        trace = Trace(self.path, submit_id)
+        with self._lock:
+            self._traces[trace.submit_id] = trace
+            while len(self._traces) > self.in_flight:
+                self._traces.popitem(last=False)
+        return trace
+
+    def get(self, submit_id):
+        with self._lock:
+            return self._traces.get(str(submit_id))
+
+    def pop(self, submit_id):
+        with self._lock:
+            return self._traces.pop(str(submit_id), None)
+
+    def _rotate(self):
+        # the file and one older generation, spans still being written land in either
+        try:
+            if os.path.getsize(self.path) > self.max_size:
+                os.replace(self.path, self.path + ".1")
+        except OSError:
+            pass
+
+    def timeline(self, submit_id):
+        # spans of the latest trace of a submission, oldest first, None when it is not in the files
+        needle = json.dumps({'submit_id': str(submit_id)})[1:-1]
+        spans = []
+        for path in (self.path + ".1", self.path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    for line in f:
+                        if needle in line:
+                            try:
+                                spans.append(json.loads(line))
+                            except ValueError:
+                                pass  # a line being written
+            except OSError:
+                continue
+        if not spans:
+            return None
+        latest = max(spans, key=lambda span: span['start'])['trace_id']
+        spans = sorted((span for span in spans if span['trace_id'] == latest), key=lambda span: span['start'])
+        return {'trace_id': latest, 'submit_id': str(submit_id), 'spans': spans}
+
+
+def current():
+    return getattr(_local, 'context', None)
+
+
+@contextmanager
+def activate(trace, parent_id=None):
+    # spans opened in this thread belong to trace, under parent_id (the root span by default)
+    previous = current()
+    _local.context = (trace, parent_id or trace.root_id) if trace is not None else None
+    try:
+        yield
+    finally:
+        _local.context = previous
+
+
+def attach(context):
+    # carry current() into another thread
+    if context is None:
+        return activate(None)
+    return activate(*context)
+
+
+@contextmanager
+def span(name, **attributes):
+    context = current()
+    if context is None:
+        yield _NO_SPAN
+        return
+    trace, parent_id = context
+    opened = Span(trace, name, parent_id, attributes)
+    _local.context = (trace, opened.span_id)
+    try:
+        yield opened
+    finally:
+        _local.context = context
+        trace.record(name, opened.start, time.time(), parent_id, opened.span_id, **opened.attributes)
+
+
+@contextmanager
+def stage(label, **attributes):
+    # a judging stage: observed by STAGE_SECONDS, and a span when the submission is traced
+    with STAGE_SECONDS.time(label), span(label, **attributes) as opened:
+        yield opened
@@ -0,0 +1,160 @@
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from collections import defaultdict, deque
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(filename)s %(lineno)d %(levelname)s : %(message)s')
+
+RETAINED = "retained"
+
+
+def _clear(path):
+    # empty a directory but keep it, costs what is in it and nothing else
+    for entry in os.scandir(path):
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path, ignore_errors=True)
+        else:
+            try:
+                os.remove(entry.path)
+            except OSError as e:
+                logging.error(f"can not remove {entry.path}: {e}")
+
+
+def _size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class WorkspacePool:
+    '''
+    judge directories handed out from a set of slot directories, put it on a tmpfs. a slot is
+    emptied and reused once the result of its submission reached the backend; workspaces of
+    judge errors and debug submissions are kept in retained/ up to `retain_size` bytes and
+    `retain_seconds`. the pool grows to the peak number of submissions in flight, never with history
+    '''
+
+    def __init__(self, root: str, slots: int, retain_size: int = 0, retain_seconds: float = 24 * 60 * 60):
+        self.root = root
+        self.retain_size = retain_size
+        self.retain_seconds = retain_seconds
+        self._lock = threading.Lock()
+        self._free = deque()
+        self._busy = defaultdict(deque)  # submit_id -> deque of (path, debug)
+        self._slots = 0
+        self._dirty = queue.Queue()
+        self._retained = deque()  # (time, path, size), oldest first
+        self._retained_size = 0
+        self.initial_slots = slots
+
+    def start(self):
+        # anything left by an earlier run is removed, retained workspaces within the limits stay
+        retained_dir = os.path.join(self.root, RETAINED)
+        os.makedirs(retained_dir, exist_ok=True)
+        for entry in os.scandir(self.root):
+            if entry.name == RETAINED:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.remove(entry.path)
+        for entry in sorted(os.scandir(retained_dir), key=lambda e: e.stat().st_mtime):
+            self._retained.append((entry.stat().st_mtime, entry.path, _size(entry.path)))
+            self._retained_size += self._retained[-1][2]
+        self._evict()
+        for _ in range(self.initial_slots):
+            self._free.append(self._new_slot())
+        threading.Thread(target=self._clean, daemon=True).start()
+        return self
+
+    def _new_slot(self):
+        # caller holds the lock or is start
+        path = os.path.join(self.root, f"slot-{self._slots}")
+        self._slots += 1
+        os.makedirs(path)
+        return path
+
+    def acquire(self, submit_id, debug=False) -> str:
+        with self._lock:
+            path = self._free.popleft() if self._free else self._new_slot()
+            self._busy[submit_id].append((path, debug))
+        return path
+
+    def release(self, submit_id, result=None, path=None) -> None:
+        # result is what the backend got, None if the submission never got one (e.g. the queue was full)
+        with self._lock:
+            slots = self._busy.get(submit_id)
+            if not slots:
+                return  # a result replayed from the outbox after a restart
+            if path is None:
+                entry = slots.popleft()
+            else:
+                entry = next(e for e in slots if e[0] == path)
+                slots.remove(entry)
+            if not slots:
+                del self._busy[submit_id]
+        self._dirty.put((submit_id, entry[0], entry[1] or self._failed(result)))
+
+    @staticmethod
+    def _failed(result):
+        return result is not None and result.get('err') == 'ERR'
+
+    def stats(self):
+        with self._lock:
+            return {
+                'slots': self._slots,
+                'free': len(self._free),
+                'busy': sum(len(slots) for slots in self._busy.values()),
+                'dirty': self._dirty.qsize(),
+                'retained': len(self._retained),
+                'retained_size': self._retained_size,
+            }
+
+    def _clean(self):
+        while True:
+            try:
+                submit_id, path, retain = self._dirty.get(timeout=60)
+            except queue.Empty:
+                self._evict()  # retained workspaces also age out when nothing is released
+                continue
+            try:
+                if retain and self.retain_size > 0:
+                    self._retain(submit_id, path)
+                else:
+                    _clear(path)
+            except OSError as e:
+                logging.error(f"can not recycle {path}: {e}")
+                continue
+            with self._lock:
+                self._free.append(path)
+
+    def _retain(self, submit_id, path):
+        # the workspace moves to retained/ in one rename, the slot starts over empty
+        kept = os.path.join(self.root, RETAINED, f"{submit_id}-{int(time.time() * 1000)}")
+        os.rename(path, kept)
+        os.makedirs(path)
+        size = _size(kept)
+        with self._lock:
+            self._retained.append((time.time(), kept, size))
+            self._retained_size += size
+        logging.info(f"kept workspace of submit {submit_id} at {kept}")
+        self._evict()
+
+    def _evict(self):
+        now = time.time()
+        while self._retained:
+            kept_at, path, size = self._retained[0]
+            if self._retained_size <= self.retain_size and now - kept_at <= self.retain_seconds:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            with self._lock:
+                self._retained.popleft()
+                self._retained_size -= size
@@ -0,0 +1,95 @@
+# stands in for OJ_BACKEND_CALLBACK: accepts every result and remembers when it arrived
+#   python3 fake_backend.py --port 8080
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    # http.server has one only from Python 3.7 on, the image runs 3.6
+    daemon_threads = True
+
+
+class CallbackRecorder:
+
+    def __init__(self, port: int, fail_rate: float = 0.0):
+        self.fail_rate = fail_rate
+        self.received = {}  # submit_id -> (monotonic arrival, result)
+        self.posts = 0
+        self._cond = threading.Condition()
+        recorder = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like a real backend
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                answer = recorder._receive(body)
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(answer)))
+                self.end_headers()
+                self.wfile.write(answer)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('0.0.0.0', port), Handler)
+
+    def _receive(self, body):
+        now = time.monotonic()
+        # a failing backend makes the judge server retry from its outbox
+        if random.random() < self.fail_rate:
+            return b"busy"
+        payload = json.loads(body)
+        results = payload if isinstance(payload, list) else [payload]
+        with self._cond:
+            self.posts += 1
+            for result in results:
+                self.received.setdefault(result['submit_id'], (now, result))
+            self._cond.notify_all()
+        return b"success"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+
+    def wait(self, submit_ids, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not all(i in self.received for i in submit_ids):
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return False
+                self._cond.wait(left)
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    options = parser.parse_args()
+    recorder = CallbackRecorder(options.port, options.fail_rate).start()
+    print(f"listening on :{options.port}")
+    seen = 0
+    try:
+        while True:
+            time.sleep(1)
+            with recorder._cond:
+                count = len(recorder.received)
+            if count != seen:
+                print(f"{count} results")
+                seen = count
+    except KeyboardInterrupt:
+        recorder.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# writes the synthetic problems of workload.PROBLEMS in the /ojdata layout, run on the judge host:
+#   python3 gen_problems.py --base-dir /ojdata
+import argparse
+import os
+import random
+import shutil
+import subprocess
+
+from workload import PROBLEMS, import_server
+
+SPJ_C = r'''#include <stdio.h>
+/* argv[1] is the input, the user output comes on stdin */
+int main(int argc, char *argv[]) {
+    FILE *in = fopen(argv[1], "r");
+    long long a, b, c;
+    if (in == NULL) { puts("1"); return 0; }
+    while (fscanf(in, "%lld %lld", &a, &b) == 2) {
+        if (scanf("%lld", &c) != 1 || c != a + b) { puts("1"); return 0; }
+    }
+    puts(scanf("%lld", &c) == 1 ? "1" : "0");
+    return 0;
+}
+'''
+
+SPJ_PY = '''import sys
+
+
+def check(input_path, output):
+    with open(input_path) as f:
+        expected = [int(a) + int(b) for a, b in (line.split() for line in f if line.strip())]
+    try:
+        return [int(x) for x in output.split()] == expected
+    except ValueError:
+        return False
+
+
+if sys.argv[1] == "--persistent":
+    for request in sys.stdin:
+        input_path, output_path = request.split()
+        with open(output_path) as f:
+            print(0 if check(input_path, f.read()) else 1, flush=True)
+else:
+    print(0 if check(sys.argv[1], sys.stdin.read()) else 1)
+'''
+
+
+def write_case(data_dir, case_id, lines, rng):
+    pairs = [(rng.randint(-10 ** 9, 10 ** 9), rng.randint(-10 ** 9, 10 ** 9)) for _ in range(lines)]
+    with open(os.path.join(data_dir, f"{case_id}.in"), mode='w') as f:
+        f.write("".join(f"{a} {b}\n" for a, b in pairs))
+    with open(os.path.join(data_dir, f"{case_id}.out"), mode='w') as f:
+        f.write("".join(f"{a + b}\n" for a, b in pairs))
+
+
+def add_spj(data_dir, kind):
+    if kind == 'spj_c':
+        with open(os.path.join(data_dir, 'spj.c'), mode='w') as f:
+            f.write(SPJ_C)
+        # same flags as the upload page
+        subprocess.check_call(['/usr/bin/g++', '-fno-tree-ch', '-O2', '-Wall', '-std=c++14',
+                               'spj.c', '-lm', '-o', 'spj'], cwd=data_dir)
+    else:
+        with open(os.path.join(data_dir, 'spj.py'), mode='w') as f:
+            f.write(SPJ_PY)
+        subprocess.check_call(['/usr/bin/python3', '-m', 'compileall', '-q', '-b', 'spj.py'], cwd=data_dir)
+        if kind == 'spj_py_persistent':
+            open(os.path.join(data_dir, 'spj.persistent'), mode='w').close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-dir", default="/ojdata")
+    parser.add_argument("--seed", type=int, default=2020)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies the number of lines per case")
+    options = parser.parse_args()
+    import_server()
+    from testdata import write_manifest
+
+    rng = random.Random(options.seed)
+    for problem_id, problem in PROBLEMS.items():
+        data_dir = os.path.join(options.base_dir, str(problem_id))
+        shutil.rmtree(data_dir, ignore_errors=True)
+        os.makedirs(data_dir)
+        lines = max(1, int(problem['lines'] * options.scale))
+        for case in range(1, problem['cases'] + 1):
+            write_case(data_dir, case, lines, rng)
+        if problem['kind'].startswith('spj'):
+            add_spj(data_dir, problem['kind'])
+        manifest = write_manifest(data_dir)
+        size = sum(f['size'] for f in manifest['files'].values())
+        print(f"{problem_id} {problem['kind']}: {len(manifest['cases'])} cases, {size / 1024 / 1024:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
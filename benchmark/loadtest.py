@@ -0,0 +1,239 @@
+# replays a submission mix against a running judge server and reports throughput and latency.
+# the server's OJ_BACKEND_CALLBACK must point at this script, e.g. http://localhost:8080/judge/callback
+#   python3 loadtest.py --server http://localhost:5001 --rate 20 --count 1000
+# with --uploads, test data uploads run alongside, to see whether they slow /judge intake down
+import argparse
+import collections
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from fake_backend import CallbackRecorder
+from workload import DEFAULT_MIX, PROBLEMS, SUBMISSIONS, parse_mix
+
+# _judger result codes
+VERDICTS = {0: 'AC', -1: 'WA', 1: 'TLE', 2: 'TLE', 3: 'MLE', 4: 'RE', 5: 'SE'}
+
+_SAMPLE = re.compile(r'^judger_stage_seconds_(bucket|sum|count)\{stage="(\w+)"(?:,le="([^"]+)")?\} (\S+)$')
+
+
+def scrape_stages(server):
+    # stage -> {'sum', 'count', 'buckets': {le: cumulative count}}
+    stages = collections.defaultdict(lambda: {'sum': 0.0, 'count': 0.0, 'buckets': {}})
+    text = requests.get(f"{server}/metrics", timeout=10).text
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if match is None:
+            continue
+        kind, stage, le, value = match.groups()
+        if kind == 'bucket':
+            stages[stage]['buckets'][le] = float(value)
+        else:
+            stages[stage][kind] = float(value)
+    return stages
+
+
+def bucket_quantile(buckets, q):
+    # upper bound of the bucket holding the q-th observation
+    total = buckets.get('+Inf', 0)
+    if total <= 0:
+        return None
+    for le, count in sorted(buckets.items(), key=lambda item: float(item[0])):
+        if count >= q * total:
+            return float(le)
+    return float('inf')
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def verdict(result):
+    if 'err' in result:
+        return result['err']
+    if not result.get('results'):
+        return 'ERR'
+    return VERDICTS.get(result['results'][-1]['result'], 'SE')
+
+
+class LoadTest:
+
+    def __init__(self, server, mix, problems, rng):
+        self.server = server
+        self.mix = mix
+        self.problems = problems
+        self.rng = rng
+        self.sent = {}  # submit_id -> (monotonic send time, submission name)
+        self.intake = []  # seconds until /judge answered
+        self.rejected = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()  # one keep-alive session per sender thread
+
+    def submission(self, submit_id):
+        name = self.rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        data = dict(SUBMISSIONS[name], submit_id=submit_id, problem_id=self.rng.choice(self.problems),
+                    max_cpu_time=1000, max_memory=256 * 1024 * 1024)
+        return name, data
+
+    def post(self, submit_id, name, data):
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        start = time.monotonic()
+        try:
+            r = self._local.session.post(f"{self.server}/judge", json=data, timeout=30)
+        except requests.RequestException:
+            with self._lock:
+                self.errors += 1
+            return
+        with self._lock:
+            self.intake.append(time.monotonic() - start)
+            if r.status_code == 503:
+                self.rejected += 1
+            elif r.status_code != 200:
+                self.errors += 1
+            else:
+                self.sent[submit_id] = (start, name)
+
+    def run(self, rate, count, first_id):
+        # open loop: submissions leave on schedule whether or not the server keeps up
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            for i in range(count):
+                delay = start + i / rate - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                name, data = self.submission(first_id + i)
+                executor.submit(self.post, first_id + i, name, data)
+        return start
+
+
+class UploadLoad:
+    # threads putting a random file into a throwaway stage of one problem, over and over
+
+    def __init__(self, server, password, problem, size, threads):
+        self.server = server
+        self.password = password
+        self.problem = problem
+        self.blob = os.urandom(size)
+        self.threads = threads
+        self.uploaded = 0
+        self.failed = 0
+        self._stop = threading.Event()
+        self._workers = []
+
+    def _loop(self):
+        session = requests.Session()
+        session.headers['X-Password'] = self.password
+        base = f"{self.server}/data/{self.problem}/stage"
+        while not self._stop.is_set():
+            try:
+                stage = session.post(base, json={'empty': True}, timeout=30).json()['stage']
+                r = session.put(f"{base}/{stage}/upload.bin", data=self.blob, timeout=600)
+                session.delete(f"{base}/{stage}", timeout=30)
+                ok = r.status_code == 200
+            except (requests.RequestException, ValueError, KeyError):
+                ok = False
+            self.uploaded += ok
+            self.failed += not ok
+
+    def start(self):
+        self.started = time.monotonic()
+        for _ in range(self.threads):
+            worker = threading.Thread(target=self._loop, daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for worker in self._workers:
+            worker.join()
+        return time.monotonic() - self.started
+
+
+def report_stages(before, after):
+    print(f"{'stage':<14}{'count':>8}{'mean':>10}{'p50<=':>10}{'p95<=':>10}{'p99<=':>10}")
+    for stage, end in after.items():
+        begin = before.get(stage, {'sum': 0.0, 'count': 0.0, 'buckets': {}})
+        count = end['count'] - begin['count']
+        if count <= 0:
+            continue
+        buckets = {le: value - begin['buckets'].get(le, 0) for le, value in end['buckets'].items()}
+        quantiles = [bucket_quantile(buckets, q) for q in (0.5, 0.95, 0.99)]
+        print(f"{stage:<14}{int(count):>8}{(end['sum'] - begin['sum']) / count * 1000:>8.1f}ms"
+              + "".join(f"{q * 1000:>8.0f}ms" for q in quantiles))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--server", default="http://localhost:5001")
+    parser.add_argument("--callback-port", type=int, default=8080)
+    parser.add_argument("--rate", type=float, default=10, help="submissions per second")
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="name=weight,... of " + ", ".join(SUBMISSIONS))
+    parser.add_argument("--problems", default=",".join(str(p) for p in PROBLEMS))
+    parser.add_argument("--timeout", type=float, default=600, help="seconds to wait for the last result")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of callbacks answered with an error")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--uploads", type=int, default=0, help="concurrent test data uploads during the test")
+    parser.add_argument("--upload-size", type=int, default=256, help="MB per upload")
+    parser.add_argument("--upload-problem", type=int, default=9099, help="problem id the uploads go to")
+    parser.add_argument("--password", default="iAMaPASSWORD", help="the server's PASSWORD, for uploads")
+    options = parser.parse_args()
+
+    recorder = CallbackRecorder(options.callback_port, options.fail_rate).start()
+    before = scrape_stages(options.server)
+    test = LoadTest(options.server, parse_mix(options.mix),
+                    [int(p) for p in options.problems.split(',')], random.Random(options.seed))
+    # ids far from the backend's own, so judge dirs never collide
+    first_id = int(time.time()) * 1000
+    uploads = None
+    if options.uploads:
+        uploads = UploadLoad(options.server, options.password, options.upload_problem,
+                             options.upload_size * 1024 * 1024, options.uploads).start()
+    start = test.run(options.rate, options.count, first_id)
+    if uploads is not None:
+        upload_seconds = uploads.stop()
+    complete = recorder.wait(list(test.sent), options.timeout)
+    after = scrape_stages(options.server)
+    recorder.stop()
+
+    latency = collections.defaultdict(list)
+    verdicts = collections.Counter()
+    end = start
+    for submit_id, (sent, name) in test.sent.items():
+        if submit_id not in recorder.received:
+            continue
+        arrived, result = recorder.received[submit_id]
+        latency[name].append(arrived - sent)
+        verdicts[f"{name}:{verdict(result)}"] += 1
+        end = max(end, arrived)
+    done = sum(len(values) for values in latency.values())
+
+    print(f"sent {options.count}, accepted {len(test.sent)}, rejected (503) {test.rejected}, "
+          f"errors {test.errors}, judged {done}" + ("" if complete else " (timed out)"))
+    if test.intake:
+        print("intake " + ", ".join(f"p{int(q * 100)} {percentile(test.intake, q) * 1000:.1f}ms"
+                                    for q in (0.5, 0.95, 0.99)) + f", max {max(test.intake) * 1000:.1f}ms")
+    if uploads is not None:
+        print(f"uploads {uploads.uploaded} done, {uploads.failed} failed, "
+              f"{uploads.uploaded * options.upload_size / upload_seconds:.0f}MB/s")
+    if done:
+        print(f"throughput {done / (end - start):.2f} submissions/s over {end - start:.1f}s")
+        print(f"{'mix':<10}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}")
+        for name, values in sorted(latency.items()) + [('all', sum(latency.values(), []))]:
+            print(f"{name:<10}{len(values):>8}"
+                  + "".join(f"{percentile(values, q) * 1000:>8.0f}ms" for q in (0.5, 0.95, 0.99)))
+        print("verdicts " + ", ".join(f"{k} {v}" for k, v in sorted(verdicts.items())))
+    report_stages(before, after)
+
+
+if __name__ == "__main__":
+    main()
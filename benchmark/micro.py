@@ -0,0 +1,252 @@
+# micro benchmarks of the judging hot path, run as root on the judge host:
+#   python3 micro.py compare --size 64
+#   python3 micro.py case --cases 200
+#   python3 micro.py kill --limit 1000
+#   python3 micro.py jitter --cgroup-root /sys/fs/cgroup/judger
+#   python3 micro.py seccomp --repeat 2000
+# the in-process runner against the libjudger.so subprocess is Judger/bindings/Python/benchmark.py
+import argparse
+import ctypes
+import multiprocessing
+import os
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+
+from workload import import_server
+
+import_server()
+import _judger  # noqa: E402
+from cgroups import CgroupSlots  # noqa: E402
+from judger import CoreBudget, Judger, acquire_core, init_worker, release_core, slot_cgroup  # noqa: E402
+from testdata import write_manifest  # noqa: E402
+
+
+def make_judger(data_dir, judge_dir, command="/bin/sh -c cat", parallelism=1):
+    return Judger(1000, 128 * 1024 * 1024, command, None, judge_dir, 0,
+                  data_dir, 0, False, parallelism, False, write_manifest(data_dir))
+
+
+def timed(func, repeat):
+    cost = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        cost.append(time.perf_counter() - start)
+    return cost
+
+
+def bench_compare(options, workdir):
+    data_dir = os.path.join(workdir, "data")
+    judge_dir = os.path.join(workdir, "judge")
+    os.makedirs(data_dir)
+    os.makedirs(judge_dir)
+    rng = random.Random(0)
+    lines = []
+    size = 0
+    while size < options.size * 1024 * 1024:
+        line = " ".join(str(rng.randint(0, 10 ** 9)) for _ in range(8))
+        lines.append(line)
+        size += len(line) + 1
+    answer = "".join(line + "\n" for line in lines)
+    with open(os.path.join(data_dir, "1.in"), mode='w') as f:
+        f.write("")
+    with open(os.path.join(data_dir, "1.out"), mode='w') as f:
+        f.write(answer)
+    outputs = {
+        'identical': answer,
+        'trailing ws': "".join(line + " \r\n" for line in lines),
+        'last line': answer[:-2] + "x\n",
+        'first line': "x" + answer[1:],
+    }
+    judger = make_judger(data_dir, judge_dir)
+    os.chdir(judge_dir)
+    for name, output in outputs.items():
+        with open(os.path.join(judge_dir, "1.out"), mode='w') as f:
+            f.write(output)
+        cost = timed(lambda: judger.compare("1", None), options.repeat)
+        best = min(cost)
+        print(f"{name:<12} best {best * 1000:8.1f}ms  median {statistics.median(cost) * 1000:8.1f}ms  "
+              f"{size / 1024 / 1024 / best:8.1f}MB/s")
+
+
+def bench_case(options, workdir):
+    data_dir = os.path.join(workdir, "data")
+    judge_dir = os.path.join(workdir, "judge")
+    os.makedirs(data_dir)
+    os.makedirs(judge_dir)
+    for case in range(1, options.cases + 1):
+        for suffix in (".in", ".out"):
+            with open(os.path.join(data_dir, f"{case}{suffix}"), mode='w') as f:
+                f.write(f"{case}\n")
+    # the cores a pool worker could borrow for parallel cases
+    init_worker(CoreBudget(options.parallelism))
+    for parallelism in sorted({1, options.parallelism}):
+        judger = make_judger(data_dir, judge_dir, parallelism=parallelism)
+        results = []
+        cost = timed(lambda: results.extend(judger()), options.repeat)
+        assert all(r['result'] == 0 for r in results), results[:3]
+        per_case = [c / options.cases for c in cost]
+        print(f"parallelism {parallelism}: {min(per_case) * 1000:.2f}ms per case best, "
+              f"{statistics.median(per_case) * 1000:.2f}ms median ({options.cases} cases)")
+
+
+SPIN = "int main() { volatile unsigned long x = 0; for (;;) x++; }\n"
+IDLE = "#include <unistd.h>\nint main() { for (;;) pause(); }\n"
+
+
+def bench_kill(options, workdir):
+    # how long past its limit a runaway child lives: real time for a sleeper, cpu time for a spinner
+    exes = {}
+    for name, source in (('spin', SPIN), ('idle', IDLE)):
+        with open(os.path.join(workdir, name + ".c"), mode='w') as f:
+            f.write(source)
+        subprocess.check_call(['gcc', '-O0', name + '.c', '-o', name], cwd=workdir)
+        exes[name] = os.path.join(workdir, name)
+    cases = [
+        ("real time", exes['idle'], 0, _judger.RESULT_REAL_TIME_LIMIT_EXCEEDED),
+        ("cpu rlimit", exes['spin'], 0, _judger.RESULT_CPU_TIME_LIMIT_EXCEEDED),
+        ("cpu watchdog", exes['spin'], 1, _judger.RESULT_CPU_TIME_LIMIT_EXCEEDED),
+    ]
+    for name, exe, watchdog, expected in cases:
+        late = []
+        for _ in range(options.repeat):
+            result = _judger.run(max_cpu_time=options.limit,
+                                 max_real_time=options.limit * 3 if exe == exes['spin'] else options.limit,
+                                 max_memory=_judger.UNLIMITED,
+                                 max_stack=32 * 1024 * 1024,
+                                 max_output_size=_judger.UNLIMITED,
+                                 max_process_number=_judger.UNLIMITED,
+                                 exe_path=exe,
+                                 input_path="/dev/null",
+                                 output_path="/dev/null",
+                                 error_path="/dev/null",
+                                 args=[],
+                                 env=[],
+                                 log_path=os.path.join(workdir, "judger.log"),
+                                 seccomp_rule_name=None,
+                                 uid=0,
+                                 gid=0,
+                                 cpu_time_watchdog=watchdog)
+            assert result['result'] == expected, result
+            late.append(result['real_time'] - options.limit)
+        print(f"{name:<13} killed {statistics.median(late):6.0f}ms past the {options.limit}ms limit (median), "
+              f"{max(late)}ms worst")
+
+
+BURN = "int main() {{ volatile unsigned long x = 0; for (unsigned long i = 0; i < {n}UL; i++) x++; }}\n"
+
+
+def _burn(exe, log_path):
+    # one fixed amount of work on a slot of the pool's budget, in its cgroup if there are any
+    slot = acquire_core()
+    try:
+        return _judger.run(max_cpu_time=60000,
+                           max_real_time=180000,
+                           max_memory=64 * 1024 * 1024,
+                           max_stack=32 * 1024 * 1024,
+                           max_output_size=_judger.UNLIMITED,
+                           max_process_number=_judger.UNLIMITED,
+                           exe_path=exe,
+                           input_path="/dev/null",
+                           output_path="/dev/null",
+                           error_path="/dev/null",
+                           args=[],
+                           env=[],
+                           log_path=log_path,
+                           seccomp_rule_name=None,
+                           uid=0,
+                           gid=0,
+                           cgroup=slot_cgroup())
+    finally:
+        release_core(slot)
+
+
+def bench_jitter(options, workdir):
+    # spread of the cpu time one program is charged, alone and with every slot busy, per backend
+    with open(os.path.join(workdir, "burn.c"), mode='w') as f:
+        f.write(BURN.format(n=options.iterations))
+    subprocess.check_call(['gcc', '-O0', 'burn.c', '-o', 'burn'], cwd=workdir)
+    exe = os.path.join(workdir, "burn")
+    cpus = sorted(os.sched_getaffinity(0))
+    backends = [("rlimit", None)]
+    if options.cgroup_root:
+        slots = CgroupSlots(options.cgroup_root, cpus)
+        if slots.setup():
+            backends.append(("cgroup", slots))
+    for name, slots in backends:
+        # what app.py runs: one slot per cpu when pinned, one extra otherwise
+        budget = len(cpus) if slots is not None else len(cpus) + 1
+        for load, workers in (("alone", 1), ("loaded", budget)):
+            with multiprocessing.Pool(workers, initializer=init_worker,
+                                      initargs=(CoreBudget(budget), slots)) as pool:
+                jobs = [(exe, os.path.join(workdir, "judger.log"))] * (options.repeat * workers)
+                results = pool.starmap(_burn, jobs)
+            assert all(r['result'] == _judger.RESULT_SUCCESS for r in results), results[:3]
+            cpu = [r['cpu_time'] for r in results]
+            real = [r['real_time'] for r in results]
+            print(f"{name:<7}{load:<7} {len(cpu):>4} runs  cpu median {statistics.median(cpu):6.0f}ms  "
+                  f"stdev {statistics.pstdev(cpu):5.1f}ms  cv {statistics.pstdev(cpu) / statistics.mean(cpu) * 100:5.2f}%  "
+                  f"max/min {max(cpu) / max(min(cpu), 1):5.3f}  real median {statistics.median(real):6.0f}ms")
+
+
+SECCOMP_RULES = ("c_cpp", "c_cpp_file_io", "general")
+BPF_MAXINSNS = 4096
+
+
+def _seccomp_program(rule, exe, cached, program):
+    # the program a child of the runner installs, compiled by libseccomp or patched from the cache
+    length = _judger._core.seccomp_program(rule.encode(), exe, cached, program, BPF_MAXINSNS)
+    assert length > 0, f"no program for {rule}"
+    return bytes(program)[:length * ctypes.sizeof(ctypes.c_uint64)]
+
+
+def bench_seccomp(options, workdir):
+    # what each case spends on its filter before execve, and that the cache installs the same policy
+    if _judger._core is None:
+        print(f"in-process runner not available: {_judger.JUDGER_CORE_PATH}")
+        return
+    program = (ctypes.c_uint64 * BPF_MAXINSNS)()
+    # execve is allowed for the address of exe_path only, each of these gets its own
+    exes = [ctypes.create_string_buffer(b"/usr/bin/true") for _ in range(3)]
+    for rule in SECCOMP_RULES:
+        for exe in exes:
+            compiled = _seccomp_program(rule, exe, 0, program)
+            assert _seccomp_program(rule, exe, 1, program) == compiled, f"{rule}: the cached program differs"
+        fresh = timed(lambda: _seccomp_program(rule, exes[0], 0, program), options.repeat)
+        cached = timed(lambda: _seccomp_program(rule, exes[0], 1, program), options.repeat)
+        print(f"{rule:<14} {len(compiled) // 8:4} instructions, identical  "
+              f"compiled {statistics.median(fresh) * 1e6:7.1f}us  cached {statistics.median(cached) * 1e6:6.1f}us  "
+              f"saved {(statistics.median(fresh) - statistics.median(cached)) * 1e6:7.1f}us per case")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="bench")
+    sub.required = True  # add_subparsers(required=...) is Python 3.7
+    compare = sub.add_parser("compare", help="Judger.compare on a large output")
+    compare.add_argument("--size", type=int, default=64, help="MB")
+    compare.add_argument("--repeat", type=int, default=5)
+    case = sub.add_parser("case", help="run and compare overhead of one tiny case")
+    case.add_argument("--cases", type=int, default=200)
+    case.add_argument("--parallelism", type=int, default=4)
+    case.add_argument("--repeat", type=int, default=3)
+    kill = sub.add_parser("kill", help="how late runaway solutions are killed")
+    kill.add_argument("--limit", type=int, default=1000, help="ms")
+    kill.add_argument("--repeat", type=int, default=5)
+    jitter = sub.add_parser("jitter", help="how stable cpu times are with every core judging")
+    jitter.add_argument("--iterations", type=int, default=300000000, help="loop count of the program")
+    jitter.add_argument("--repeat", type=int, default=5, help="runs per worker")
+    jitter.add_argument("--cgroup-root", default=None, help="also measure cgroup slots made here")
+    seccomp = sub.add_parser("seccomp", help="filter setup per case, compiled vs. cached")
+    seccomp.add_argument("--repeat", type=int, default=2000)
+    options = parser.parse_args()
+    with tempfile.TemporaryDirectory() as workdir:
+        {'compare': bench_compare, 'case': bench_case, 'kill': bench_kill,
+         'jitter': bench_jitter, 'seccomp': bench_seccomp}[options.bench](options, workdir)
+
+
+if __name__ == "__main__":
+    main()
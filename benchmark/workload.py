@@ -0,0 +1,70 @@
+# problems written by gen_problems.py and the submissions loadtest.py replays against them
+import os
+import sys
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Server')
+
+# every problem is "sum each line's two integers", so one solution fits all of them
+PROBLEMS = {
+    9001: {'kind': 'tiny', 'cases': 500, 'lines': 1},
+    9002: {'kind': 'huge', 'cases': 3, 'lines': 2000000},
+    9003: {'kind': 'spj_c', 'cases': 20, 'lines': 1000},
+    9004: {'kind': 'spj_py', 'cases': 20, 'lines': 1000},
+    9005: {'kind': 'spj_py_persistent', 'cases': 20, 'lines': 1000},
+}
+
+CPP_AC = r'''#include <stdio.h>
+int main() {
+    long long a, b;
+    while (scanf("%lld %lld", &a, &b) == 2) printf("%lld\n", a + b);
+    return 0;
+}
+'''
+
+CPP_WA = CPP_AC.replace('a + b', 'a - b')
+
+CPP_TLE = r'''int main() {
+    volatile unsigned long x = 0;
+    for (;;) x++;
+}
+'''
+
+CPP_CE = CPP_AC.replace('return 0;', 'return 0')
+
+PY_AC = '''import sys
+out = sys.stdout
+for line in sys.stdin:
+    a, b = line.split()
+    out.write(str(int(a) + int(b)) + "\\n")
+'''
+
+CPP = {'src': 'main.cpp', 'seccomp_rule': 'c_cpp', 'run_command': './main',
+       'compile_command': '/usr/bin/g++ -O2 main.cpp -o main'}
+PY = {'src': 'main.py', 'seccomp_rule': 'general', 'run_command': '/usr/bin/python3 main.py',
+      'compile_command': '/usr/bin/python3 -m py_compile main.py'}
+
+SUBMISSIONS = {
+    'cpp_ac': dict(CPP, source=CPP_AC),
+    'cpp_wa': dict(CPP, source=CPP_WA),
+    'cpp_tle': dict(CPP, source=CPP_TLE),
+    'cpp_ce': dict(CPP, source=CPP_CE),
+    'py_ac': dict(PY, source=PY_AC),
+}
+
+DEFAULT_MIX = 'cpp_ac=6,py_ac=2,cpp_wa=1,cpp_tle=1,cpp_ce=1'
+
+
+def parse_mix(text: str):
+    mix = {}
+    for part in text.split(','):
+        name, weight = part.split('=')
+        if name not in SUBMISSIONS:
+            raise ValueError(f"unknown submission {name}, choose from {', '.join(SUBMISSIONS)}")
+        mix[name] = float(weight)
+    return mix
+
+
+def import_server():
+    # the generator and micro benchmarks reuse the server's own modules
+    if SERVER_DIR not in sys.path:
+        sys.path.insert(0, SERVER_DIR)